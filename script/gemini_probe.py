@@ -24,6 +24,9 @@ API Key 解析顺序（任一来源即可）
 2) 文件：.githooks/.gemini_api_key（第一行）
 3) Git 配置：gemini.apiKey（本地配置优先）
 
+提供方
+- 环境变量 LLM_PROVIDER：gemini（默认）/ fake / http（见 llm_providers.py，可离线验证）
+
 模型解析顺序
 1) 环境变量：GEMINI_MODEL
 2) 文件：.githooks/.gemini_model（第一行）
@@ -33,7 +36,7 @@ API Key 解析顺序（任一来源即可）
 退出码
  0 正常（输出长度 >= 200）
  2 无 API Key
- 3 未安装 google-generativeai
+ 3 提供方不可用（如未安装 google-generativeai；输出其原因）
  5 其它错误
 """
 
@@ -44,6 +47,8 @@ import sys
 import subprocess
 from typing import Optional
 
+from llm_providers import ProviderUnavailable, get_provider
+
 
 def _run(cmd: list[str]) -> str:
     try:
@@ -102,18 +107,18 @@ def main() -> int:
         pass
 
     key = _load_key()
-    if not key:
+    provider = get_provider(api_key=key)
+    if provider.name == "gemini" and not key:
         print("[probe] no api key", file=sys.stderr)
         return 2
     model = _load_model()
 
     try:
-        import google.generativeai as genai  # type: ignore
-    except Exception as e:
-        print(f"[probe] missing google-generativeai: {e}", file=sys.stderr)
+        provider.ensure_ready()
+    except ProviderUnavailable as e:
+        print(f"[probe] provider {provider.name} unavailable: {e}", file=sys.stderr)
         return 3
 
-    genai.configure(api_key=key)
     prompt = (
         "请用简体中文输出约800~1200字的连续段落，"
         "主题为“系统设计中的一致性与可用性权衡（CAP）”，"
@@ -122,19 +127,9 @@ def main() -> int:
 
     try:
         generation_config = {"max_output_tokens": 2048, "temperature": 0.7}
-        model_obj = genai.GenerativeModel(model)
-        resp = model_obj.generate_content(prompt, generation_config=generation_config)
-        text = getattr(resp, "text", None)
-        if not text and getattr(resp, "candidates", None):
-            parts = []
-            for c in resp.candidates:
-                try:
-                    parts.append(c.content.parts[0].text)
-                except Exception:
-                    pass
-            text = "\n".join([p for p in parts if p])
+        text = provider.generate(prompt, model, generation_config=generation_config)
         text = (text or "").strip()
-        print(f"[probe] model={model}", file=sys.stderr)
+        print(f"[probe] provider={provider.name} model={model}", file=sys.stderr)
         print(f"[probe] chars={len(text)}", file=sys.stderr)
         print(text)
         return 0 if len(text) >= 200 else 5
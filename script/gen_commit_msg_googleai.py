@@ -21,6 +21,7 @@
 
 环境变量：
 - GEMINI_API_KEY 或 GOOGLE_API_KEY：Google AI Studio API 密钥
+- LLM_PROVIDER：gemini（默认）/ fake / http，见 llm_providers.py
 
 依赖：
 - python -m pip install google-generativeai
@@ -37,6 +38,7 @@ import subprocess
 import sys
 from typing import Optional
 from commit_filters import collect_diff_filtered
+from llm_providers import get_provider
 
 
 def run(cmd: list[str]) -> str:
@@ -88,28 +90,16 @@ def build_prompt(stat: str, patch: str, lang: str) -> str:
 
 
 def generate_with_gemini(prompt: str) -> Optional[str]:
-    api_key = os.environ.get("GEMINI_API_KEY") or os.environ.get("GOOGLE_API_KEY")
-    if not api_key:
-        return None
+    # 提供方默认 gemini；设置 LLM_PROVIDER=fake/http 可离线验证
     try:
-        import google.generativeai as genai  # type: ignore
+        provider = get_provider()
+        provider.ensure_ready()
     except Exception:
         return None
     try:
-        genai.configure(api_key=api_key)
         # 选用速度较快且上下文足够的模型
         model_name = os.environ.get("GEMINI_MODEL", "gemini-1.5-flash")
-        model = genai.GenerativeModel(model_name)
-        resp = model.generate_content(prompt)
-        text = getattr(resp, "text", None)
-        if not text and hasattr(resp, "candidates") and resp.candidates:
-            parts = []
-            for c in resp.candidates:
-                try:
-                    parts.append(c.content.parts[0].text)
-                except Exception:
-                    continue
-            text = "\n".join([p for p in parts if p])
+        text = provider.generate(prompt, model_name)
         if text:
             return text.strip()
         return None
@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: GPL-3.0-only
+# Copyright (C) 2025 GaoZheng
+
+"""
+可插拔的 LLM 提供方（供 `merge_md/merge_md_by_timestamp.py`、`gen_commit_msg_googleai.py`、
+`gemini_probe.py` 使用）。
+
+提供方（`get_provider(name)`；name 缺省时取环境变量 `LLM_PROVIDER`，再缺省为 `gemini`）：
+- `gemini`：google-generativeai（需 GEMINI_API_KEY/GOOGLE_API_KEY）。
+- `fake`：进程内离线替身，可配置延迟、错误率、空返回率与响应模板；无需网络与密钥。
+- `http`：调用本地替身服务（`python script/llm_providers.py serve`），
+  用于在断网环境下对并发、重试与缓存进行压测。
+
+会话：`get_provider` 按 (名称, 选项) 在进程内复用同一实例；`gemini` 的导入与 `configure` 只执行一次
+（耗时记录在 `setup_seconds`），各模型的 `GenerativeModel` 按名称缓存，可被多个线程并发使用。
+
+接口：`provider.ensure_ready()` 在依赖/密钥缺失时抛出 `ProviderUnavailable`（中文原因）；
+`provider.generate(prompt, model, generation_config=None)` 返回文本，无文本时返回 None，
+请求失败时抛出异常（HTTP 错误为 `LLMHTTPError`，含状态码与 Retry-After）。
+
+环境变量（`fake`/`http`）：
+- LLM_FAKE_LATENCY（秒）、LLM_FAKE_JITTER（秒）、LLM_FAKE_SLOW_RATE 与 LLM_FAKE_SLOW_LATENCY（秒；
+  按比例附加的长尾延迟）、LLM_FAKE_ERROR_RATE、LLM_FAKE_EMPTY_RATE、LLM_FAKE_TEMPLATE、LLM_FAKE_SEED；LLM_HTTP_URL（默认 http://127.0.0.1:8765）。
+
+本地替身服务：
+- python script/llm_providers.py serve --port 8765 --latency 0.2 --error-rate 0.05
+- POST /v1/generate  {"model": "...", "prompt": "...", "generation_config": {...}} -> {"text": "..."}
+- 模拟错误时返回 503 或 429（带 Retry-After）；GET /healthz 返回 ok。
+"""
+
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Union
+
+
+DEFAULT_HTTP_URL = 'http://127.0.0.1:8765'
+DEFAULT_TEMPLATE = '（离线摘要）{model}；{chars} 字；{head}'
+
+_PACK_DOC_RE = re.compile(r"^<<<DOC (\d+)>>>$", re.M)
+
+
+class ProviderUnavailable(RuntimeError):
+    """提供方不可用（缺少密钥或依赖）。"""
+
+
+class LLMProviderError(RuntimeError):
+    """请求失败（含替身模拟的错误）。"""
+
+
+class LLMHTTPError(LLMProviderError):
+    def __init__(self, status: int, message: str, retry_after: Optional[float] = None) -> None:
+        super().__init__(f'HTTP {status}：{message}')
+        self.status = status
+        self.retry_after = retry_after
+
+
+def response_text(resp: Any) -> Optional[str]:
+    """从 google-generativeai 的响应中取文本（`text` 为空时拼接各候选的首段）。"""
+    out = getattr(resp, 'text', None)
+    if not out and getattr(resp, 'candidates', None):
+        parts = []
+        for c in resp.candidates:
+            try:
+                parts.append(c.content.parts[0].text)
+            except Exception:
+                continue
+        out = '\n'.join([p for p in parts if p])
+    return out or None
+
+
+class LLMProvider:
+    name = 'base'
+    setup_seconds: Optional[float] = None  # 首次初始化（导入/鉴权）耗时；无需初始化时为 None
+
+    def ensure_ready(self) -> None:
+        """检查密钥/依赖；不可用时抛出 ProviderUnavailable。"""
+
+    def generate(self, prompt: str, model: str, generation_config: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        raise NotImplementedError
+
+
+class GeminiProvider(LLMProvider):
+    name = 'gemini'
+
+    def __init__(self, api_key: Optional[str] = None) -> None:
+        self.api_key = api_key
+        self._genai: Any = None
+        self._models: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def ensure_ready(self) -> None:
+        if self._genai is not None:
+            return
+        with self._lock:
+            if self._genai is not None:
+                return
+            key = self.api_key or os.environ.get('GEMINI_API_KEY') or os.environ.get('GOOGLE_API_KEY')
+            if not key:
+                raise ProviderUnavailable('未检测到 GEMINI_API_KEY/GOOGLE_API_KEY 环境变量')
+            t0 = time.perf_counter()
+            try:
+                import google.generativeai as genai  # type: ignore
+            except Exception as e:
+                raise ProviderUnavailable(f'缺少 google-generativeai 依赖：{e!s}') from e
+            genai.configure(api_key=key)
+            self.setup_seconds = time.perf_counter() - t0
+            self._genai = genai
+
+    def _model(self, model: str) -> Any:
+        m = self._models.get(model)
+        if m is None:
+            with self._lock:
+                m = self._models.get(model)
+                if m is None:
+                    m = self._genai.GenerativeModel(model)
+                    self._models[model] = m
+        return m
+
+    def generate(self, prompt: str, model: str, generation_config: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        self.ensure_ready()
+        m = self._model(model)
+        if generation_config:
+            resp = m.generate_content(prompt, generation_config=generation_config)
+        else:
+            resp = m.generate_content(prompt)
+        return response_text(resp)
+
+
+class FakeProvider(LLMProvider):
+    """进程内离线替身：按模板生成确定性的响应，可模拟延迟（含长尾）、错误与空返回。
+
+    模板占位符：{model}、{chars}（提示字数）、{tokens}（粗略 token 数）、{head}（提示末段前 30 字）、{n}（调用序号）。
+    打包提示（`<<<DOC i>>>`）返回逐篇 JSON 数组；主题检测提示返回 {"hit": false, ...}。
+    """
+
+    name = 'fake'
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        slow_rate: float = 0.0,
+        slow_latency: float = 0.0,
+        error_rate: float = 0.0,
+        empty_rate: float = 0.0,
+        templates: Optional[Union[str, List[str]]] = None,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.latency = max(0.0, float(latency))
+        self.jitter = max(0.0, float(jitter))
+        self.slow_rate = min(1.0, max(0.0, float(slow_rate)))
+        self.slow_latency = max(0.0, float(slow_latency))
+        self.error_rate = min(1.0, max(0.0, float(error_rate)))
+        self.empty_rate = min(1.0, max(0.0, float(empty_rate)))
+        if isinstance(templates, str):
+            templates = [templates]
+        self.templates = list(templates or [DEFAULT_TEMPLATE])
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+
+    def _roll(self) -> tuple:
+        with self._lock:
+            self.calls += 1
+            return self.calls, self._rng.random(), self._rng.random(), self._rng.random(), self._rng.random()
+
+    def render(self, prompt: str, model: str, n: int) -> str:
+        tail = prompt.rstrip().rsplit('\n', 1)[-1]
+        t = self.templates[(n - 1) % len(self.templates)]
+        return t.format(model=model, chars=len(prompt), tokens=len(prompt) // 2, head=tail[:30], n=n)
+
+    def generate(self, prompt: str, model: str, generation_config: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        n, r_err, r_empty, r_jit, r_slow = self._roll()
+        delay = self.latency + self.jitter * r_jit
+        if r_slow < self.slow_rate:
+            delay += self.slow_latency
+        if delay > 0:
+            time.sleep(delay)
+        if r_err < self.error_rate:
+            with self._lock:
+                self.errors += 1
+            raise LLMProviderError('模拟错误：503 Service Unavailable')
+        if r_empty < self.empty_rate:
+            return None
+        ids = _PACK_DOC_RE.findall(prompt)
+        if ids:
+            return json.dumps(
+                [{'id': int(i), 'excluded': False, 'summary': self.render(prompt, model, n) + f'#{i}'} for i in ids],
+                ensure_ascii=False,
+            )
+        if '"hit"' in prompt:
+            return json.dumps({'hit': False, 'matched': [], 'reason': '离线替身'}, ensure_ascii=False)
+        return self.render(prompt, model, n)
+
+
+class HTTPProvider(LLMProvider):
+    """调用本地替身服务（或任何实现同一 JSON 接口的服务）；每个线程复用一条 HTTP/1.1 长连接。"""
+
+    name = 'http'
+
+    def __init__(self, url: Optional[str] = None, timeout: float = 120.0) -> None:
+        self.url = (url or os.environ.get('LLM_HTTP_URL') or DEFAULT_HTTP_URL).rstrip('/')
+        self.timeout = float(timeout)
+        parts = urllib.parse.urlsplit(self.url)
+        self._https = parts.scheme == 'https'
+        self._netloc = parts.netloc
+        self._path = (parts.path or '') + '/v1/generate'
+        self._local = threading.local()
+
+    def _conn(self) -> http.client.HTTPConnection:
+        c = getattr(self._local, 'conn', None)
+        if c is None:
+            cls = http.client.HTTPSConnection if self._https else http.client.HTTPConnection
+            c = cls(self._netloc, timeout=self.timeout)
+            self._local.conn = c
+        return c
+
+    def _drop(self) -> None:
+        c = getattr(self._local, 'conn', None)
+        self._local.conn = None
+        if c is not None:
+            c.close()
+
+    def generate(self, prompt: str, model: str, generation_config: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        body = json.dumps(
+            {'model': model, 'prompt': prompt, 'generation_config': generation_config or {}},
+            ensure_ascii=False,
+        ).encode('utf-8')
+        headers = {'Content-Type': 'application/json; charset=utf-8'}
+        for attempt in (0, 1):
+            try:
+                conn = self._conn()
+                conn.request('POST', self._path, body=body, headers=headers)
+                resp = conn.getresponse()
+                raw = resp.read()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # 服务端关闭了空闲长连接：重连一次
+                self._drop()
+                if attempt:
+                    raise
+            except Exception:
+                self._drop()
+                raise
+        if resp.status >= 400:
+            retry_after: Optional[float] = None
+            try:
+                ra = resp.getheader('Retry-After')
+                retry_after = float(ra) if ra else None
+            except Exception:
+                retry_after = None
+            try:
+                msg = json.loads(raw.decode('utf-8')).get('error') or resp.reason
+            except Exception:
+                msg = str(resp.reason)
+            raise LLMHTTPError(resp.status, str(msg), retry_after)
+        data = json.loads(raw.decode('utf-8'))
+        text = data.get('text') if isinstance(data, dict) else None
+        return text or None
+
+
+def _env_float(name: str, default: float = 0.0) -> float:
+    try:
+        return float(os.environ.get(name, '') or default)
+    except ValueError:
+        return default
+
+
+def _fake_from_env(**options: Any) -> FakeProvider:
+    seed = os.environ.get('LLM_FAKE_SEED')
+    return FakeProvider(
+        latency=options.get('latency', _env_float('LLM_FAKE_LATENCY')),
+        jitter=options.get('jitter', _env_float('LLM_FAKE_JITTER')),
+        slow_rate=options.get('slow_rate', _env_float('LLM_FAKE_SLOW_RATE')),
+        slow_latency=options.get('slow_latency', _env_float('LLM_FAKE_SLOW_LATENCY')),
+        error_rate=options.get('error_rate', _env_float('LLM_FAKE_ERROR_RATE')),
+        empty_rate=options.get('empty_rate', _env_float('LLM_FAKE_EMPTY_RATE')),
+        templates=options.get('templates', os.environ.get('LLM_FAKE_TEMPLATE') or None),
+        seed=options.get('seed', int(seed) if seed else None),
+    )
+
+
+_SHARED: Dict[str, LLMProvider] = {}
+_SHARED_LOCK = threading.Lock()
+
+
+def get_provider(name: Optional[str] = None, shared: bool = True, **options: Any) -> LLMProvider:
+    """按名称获取提供方；环境变量 LLM_PROVIDER 优先于传入的 name（便于临时切到离线替身）。
+
+    shared=True 时同一 (名称, 选项) 在进程内只构造一次，后续调用复用已初始化的会话。
+    """
+    name = (os.environ.get('LLM_PROVIDER') or name or 'gemini').strip().lower()
+    if not shared:
+        return _make_provider(name, options)
+    key = name + '\n' + json.dumps(options, sort_keys=True, ensure_ascii=False, default=str)
+    with _SHARED_LOCK:
+        p = _SHARED.get(key)
+        if p is None:
+            p = _make_provider(name, options)
+            _SHARED[key] = p
+        return p
+
+
+def _make_provider(name: str, options: Dict[str, Any]) -> LLMProvider:
+    if name == 'gemini':
+        return GeminiProvider(api_key=options.get('api_key'))
+    if name == 'fake':
+        return _fake_from_env(**options)
+    if name == 'http':
+        return HTTPProvider(url=options.get('url'), timeout=options.get('timeout', 120.0))
+    raise ValueError(f'未知的 LLM 提供方：{name}')
+
+
+def make_server(host: str, port: int, fake: FakeProvider, throttle_rate: float = 0.0) -> ThreadingHTTPServer:
+    """构造本地替身服务；模拟错误中 throttle_rate 比例返回 429（带 Retry-After），其余返回 503。"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # 支持客户端长连接
+        disable_nagle_algorithm = True  # 头部与正文分两次写出，长连接下避免 Nagle/延迟 ACK 叠加的 ~40ms 停顿
+
+        def _send(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self) -> None:  # noqa: N802
+            if self.path == '/healthz':
+                self._send(200, {'ok': True, 'calls': fake.calls, 'errors': fake.errors})
+            else:
+                self._send(404, {'error': 'not found'})
+
+        def do_POST(self) -> None:  # noqa: N802
+            if self.path != '/v1/generate':
+                self._send(404, {'error': 'not found'})
+                return
+            try:
+                n = int(self.headers.get('Content-Length') or 0)
+                req = json.loads(self.rfile.read(n).decode('utf-8'))
+                prompt = str(req.get('prompt') or '')
+                model = str(req.get('model') or '')
+            except Exception as e:
+                self._send(400, {'error': f'bad request: {e!s}'})
+                return
+            try:
+                text = fake.generate(prompt, model, req.get('generation_config') or None)
+            except LLMProviderError as e:
+                if throttle_rate and random.random() < throttle_rate:
+                    self._send(429, {'error': 'rate limited'}, {'Retry-After': '1'})
+                else:
+                    self._send(503, {'error': str(e)})
+                return
+            self._send(200, {'text': text or ''})
+
+        def log_message(self, format: str, *args: Any) -> None:  # 静默访问日志
+            pass
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description='LLM 提供方工具：启动本地离线替身服务')
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    sp = sub.add_parser('serve', help='启动本地替身 HTTP 服务')
+    sp.add_argument('--host', default='127.0.0.1')
+    sp.add_argument('--port', type=int, default=8765)
+    sp.add_argument('--latency', type=float, default=0.0, help='每次请求的固定延迟（秒）')
+    sp.add_argument('--jitter', type=float, default=0.0, help='附加的随机延迟上限（秒）')
+    sp.add_argument('--slow-rate', type=float, default=0.0, help='附加长尾延迟的请求比例（0~1）')
+    sp.add_argument('--slow-latency', type=float, default=0.0, help='长尾请求附加的延迟（秒）')
+    sp.add_argument('--error-rate', type=float, default=0.0, help='模拟错误比例（0~1）')
+    sp.add_argument('--throttle-rate', type=float, default=0.5, help='模拟错误中返回 429 的比例（其余为 503）')
+    sp.add_argument('--empty-rate', type=float, default=0.0, help='返回空文本的比例（0~1）')
+    sp.add_argument('--template', action='append', default=None, help='响应模板，可多次指定（轮流使用）')
+    sp.add_argument('--seed', type=int, default=None)
+    args = ap.parse_args(argv)
+
+    fake = FakeProvider(
+        latency=args.latency, jitter=args.jitter, slow_rate=args.slow_rate, slow_latency=args.slow_latency,
+        error_rate=args.error_rate,
+        empty_rate=args.empty_rate, templates=args.template, seed=args.seed,
+    )
+    server = make_server(args.host, args.port, fake, throttle_rate=args.throttle_rate)
+    print(f'[llm] 本地替身服务：http://{args.host}:{server.server_address[1]}（Ctrl+C 退出）', file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
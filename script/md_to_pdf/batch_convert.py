@@ -1,18 +1,26 @@
 # SPDX-License-Identifier: GPL-3.0-only
 # Copyright (C) 2025 GaoZheng
 
+import argparse
 import glob
 import os
 import re
 import subprocess
+import sys
 import json
 import hashlib
 from pathlib import Path
 
+# 按日期范围选取文档的时间戳索引位于上级目录 script/
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from ts_index import TimestampIndex, parse_time_bound  # noqa: E402
+
 # 根路径与默认输入/输出（kernel_reference 专用）
 ROOT_DIRECTORY = str(Path(__file__).resolve().parents[2])
 INPUT_DIRECTORY = os.path.join(ROOT_DIRECTORY, 'src', 'kernel_reference')
 OUTPUT_DIRECTORY = os.path.join(ROOT_DIRECTORY, 'src', 'kernel_reference_pdf')
+# 时间戳索引存放于 out/（不写入受版本控制的 PDF 输出目录）；每个输入目录一份
+TS_INDEX_DIRECTORY = os.path.join(ROOT_DIRECTORY, 'out', 'ts_index')
 
 
 def _sha256_of_file(path):
@@ -112,7 +120,35 @@ def _cleanup_stale_md_entries_and_pdfs(hash_map: dict, hash_map_path: str, outpu
     return hash_map
 
 
-def batch_convert_md_to_pdf(input_dir, output_dir):
+def parse_window_args(argv=None):
+    """解析 --since/--until（UNIX 秒或 ISO 日期/时间），返回 (since, until)，未给出的为 None。"""
+    parser = argparse.ArgumentParser(
+        description='批量将 Markdown 转为 PDF（可按文件名时间戳限定日期范围）。'
+        '给定 --since/--until 时只转换 <UNIX秒>_*.md，不以时间戳命名的文件（如 INDEX.md、README.md）不在范围内。'
+    )
+    parser.add_argument('--since', default=None, help='仅转换时间戳不早于该时间的 <UNIX秒>_*.md（跳过非时间戳命名的 .md）')
+    parser.add_argument('--until', default=None, help='仅转换时间戳不晚于该时间的 <UNIX秒>_*.md（含；跳过非时间戳命名的 .md）')
+    args = parser.parse_args(argv)
+    try:
+        since = parse_time_bound(args.since) if args.since else None
+        until = parse_time_bound(args.until, upper=True) if args.until else None
+    except ValueError as e:
+        parser.error(str(e))
+    return since, until
+
+
+def select_markdown_files(input_dir, output_dir, since=None, until=None):
+    """递归收集 .md 文件；给定日期范围时经 `out/ts_index/<输入目录>.json` 二分选取（仅 <UNIX秒>_*.md）。"""
+    if since is None and until is None:
+        return glob.glob(os.path.join(input_dir, '**', '*.md'), recursive=True)
+    name = _to_rel_under_root(os.path.abspath(input_dir)).replace(os.sep, '/').strip('./').replace('/', '__') or 'root'
+    idx_path = Path(TS_INDEX_DIRECTORY) / f'{name}.json'
+    idx = TimestampIndex(idx_path, Path(ROOT_DIRECTORY)).refresh([Path(input_dir)])
+    idx.save()
+    return [str(p) for p in idx.select_paths(since, until)]
+
+
+def batch_convert_md_to_pdf(input_dir, output_dir, since=None, until=None):
     # 校验与准备目录
     if not os.path.isdir(input_dir):
         print(f"警告: 输入目录 '{input_dir}' 不存在或无效。")
@@ -120,8 +156,8 @@ def batch_convert_md_to_pdf(input_dir, output_dir):
 
     os.makedirs(output_dir, exist_ok=True)
 
-    # 递归收集 .md 文件
-    markdown_files = glob.glob(os.path.join(input_dir, '**', '*.md'), recursive=True)
+    # 递归收集 .md 文件（可按日期范围选取）
+    markdown_files = select_markdown_files(input_dir, output_dir, since, until)
     if not markdown_files:
         print(f"目录 '{input_dir}' 下未找到任何 Markdown 文件。")
         return
@@ -280,4 +316,4 @@ def batch_convert_md_to_pdf(input_dir, output_dir):
 
 
 if __name__ == '__main__':
-    batch_convert_md_to_pdf(INPUT_DIRECTORY, OUTPUT_DIRECTORY)
+    batch_convert_md_to_pdf(INPUT_DIRECTORY, OUTPUT_DIRECTORY, *parse_window_args())
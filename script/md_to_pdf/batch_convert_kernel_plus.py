@@ -4,7 +4,7 @@
 import os
 from pathlib import Path
 
-from batch_convert import batch_convert_md_to_pdf
+from batch_convert import batch_convert_md_to_pdf, parse_window_args
 
 
 ROOT_DIRECTORY = str(Path(__file__).resolve().parents[2])
@@ -13,5 +13,5 @@ OUTPUT_DIRECTORY = os.path.join(ROOT_DIRECTORY, 'src', 'kernel_plus_pdf')
 
 
 if __name__ == '__main__':
-    batch_convert_md_to_pdf(INPUT_DIRECTORY, OUTPUT_DIRECTORY)
+    batch_convert_md_to_pdf(INPUT_DIRECTORY, OUTPUT_DIRECTORY, *parse_window_args())
 
@@ -1,7 +1,6 @@
 # SPDX-License-Identifier: GPL-3.0-only
 # Copyright ( C ) 2025 GaoZheng
 
-import glob
 import os
 import re
 import subprocess
@@ -9,6 +8,8 @@ import json
 import hashlib
 from pathlib import Path
 
+from batch_convert import parse_window_args, select_markdown_files
+
 
 # 仓库根目录
 ROOT_DIRECTORY = str(Path(__file__).resolve().parents[2])
@@ -121,7 +122,7 @@ def _cleanup_stale_md_entries_and_pdfs(hash_map: dict, hash_map_path: str):
     return hash_map
 
 
-def _process_one_subproject(sub_dir_name: str, output_sub_dir_name: str, hash_map: dict):
+def _process_one_subproject(sub_dir_name: str, output_sub_dir_name: str, hash_map: dict, since=None, until=None):
     input_dir = os.path.join(SUB_DOCS_ROOT, sub_dir_name)
     output_dir = os.path.join(SUB_DOCS_PDF_ROOT, output_sub_dir_name)
 
@@ -131,8 +132,8 @@ def _process_one_subproject(sub_dir_name: str, output_sub_dir_name: str, hash_ma
 
     os.makedirs(output_dir, exist_ok=True)
 
-    # 收集 .md 文件
-    markdown_files = glob.glob(os.path.join(input_dir, '**', '*.md'), recursive=True)
+    # 收集 .md 文件（可按日期范围选取）
+    markdown_files = select_markdown_files(input_dir, output_dir, since, until)
     if not markdown_files:
         print(f"[INFO] 未找到 Markdown 文件: {input_dir}")
         return
@@ -404,13 +405,20 @@ def _process_specific_files(md_files: list, output_dir: str, hash_map: dict):
 
 
 def main():
+    since, until = parse_window_args()
     os.makedirs(SUB_DOCS_PDF_ROOT, exist_ok=True)
     hash_map = _load_hash_map(HASH_MAP_PATH)
     # 在处理前清理“源 md 已删除”的 pdf 与映射项（全局映射）
     hash_map = _cleanup_stale_md_entries_and_pdfs(hash_map, HASH_MAP_PATH)
 
     for sub, out_sub in SUBPROJECTS.items():
-        _process_one_subproject(sub, out_sub, hash_map)
+        _process_one_subproject(sub, out_sub, hash_map, since, until)
+
+    if since is not None or until is not None:
+        # 按日期范围转换时不处理根目录的 README.md/LICENSE.md（无时间戳）
+        _save_hash_map(HASH_MAP_PATH, _sanitize_paths_in_hash_map(hash_map, ROOT_DIRECTORY))
+        print("\n所选日期范围内的子项目文档处理完成，映射已更新：", _to_rel_under_root(HASH_MAP_PATH))
+        return
 
     # 处理根目录特定文件：README.md 与 LICENSE.md
     root_md_files = [
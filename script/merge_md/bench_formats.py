@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: GPL-3.0-only
+# Copyright (C) 2025 GaoZheng
+
+"""
+比较完整合并结果各输出格式（`--format`）的写出耗时、读取耗时与文件大小。
+
+- 语料：按 `merge_md_by_timestamp.json`（或 `--config`）的 `source_dirs` 读取真实的 `src/` 文档，
+  记录与 `merge_md_by_timestamp_all.*` 完全相同。
+- 写出：`write_records` 写入临时目录（计入序列化、压缩与写入，不含 fsync）；读取：`load_records` 逐条解码全部记录。
+- 每种格式重复 `--repeat` 次取最小值；缺少可选依赖的格式跳过并注明原因。
+- 只读源文件，不改动 `out/`。
+
+用法：
+    python3 script/merge_md/bench_formats.py [--repeat 3] [--formats json,jsonl.zst] [--json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from merge_md_by_timestamp import _all_record, guess_repo_root, iter_md_files, load_config, parse_entries
+from record_formats import FORMATS, load_records, missing_dependency, write_records
+
+
+def bench_format(
+    fmt: str, records: List[Dict[str, Any]], head: List[Tuple[str, Any]], work_dir: Path, repeat: int,
+) -> Dict[str, Any]:
+    path = work_dir / f"bench_all.{fmt}"
+    write_s, read_s = [], []
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        with path.open('wb') as raw:
+            write_records(raw, fmt, head, iter(records))
+        write_s.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        _, it = load_records(path, fmt)
+        n = sum(1 for _ in it)
+        read_s.append(time.perf_counter() - t0)
+        if n != len(records):
+            raise RuntimeError(f"{fmt}: 读回 {n} 条，应为 {len(records)} 条")
+    return {'format': fmt, 'bytes': path.stat().st_size, 'write_s': round(min(write_s), 4), 'read_s': round(min(read_s), 4)}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    script_path = Path(__file__).resolve()
+    parser = argparse.ArgumentParser(description='比较完整合并结果各输出格式的写出/读取耗时与大小（真实语料）。')
+    parser.add_argument('--config', type=Path, default=script_path.with_name('merge_md_by_timestamp.json'),
+                        help='合并脚本配置（取其 source_dirs）')
+    parser.add_argument('--formats', default=','.join(FORMATS), help=f"逗号分隔的格式（默认全部：{','.join(FORMATS)}）")
+    parser.add_argument('--repeat', type=int, default=3, help='每种格式重复次数，取最小值（默认 3）')
+    parser.add_argument('--json', action='store_true', help='以 JSON 输出结果')
+    args = parser.parse_args(argv)
+
+    formats = [f.strip() for f in args.formats.split(',') if f.strip()]
+    unknown = [f for f in formats if f not in FORMATS]
+    if unknown:
+        parser.error(f"未知格式：{', '.join(unknown)}")
+
+    cfg = load_config(args.config)
+    repo_root = guess_repo_root(script_path.parent)
+    src_dirs = [(repo_root / d).resolve() for d in cfg.get('source_dirs', [])]
+    entries = parse_entries(repo_root, iter_md_files(src_dirs))
+    records = [_all_record(e) for e in entries]
+    head: List[Tuple[str, Any]] = [
+        ('generated_at', datetime.now(timezone.utc).isoformat()),
+        ('source_dirs', cfg.get('source_dirs', [])),
+        ('total_files', len(records)),
+    ]
+
+    results: List[Dict[str, Any]] = []
+    with tempfile.TemporaryDirectory(prefix='bench_formats_') as tmp:
+        for fmt in formats:
+            err = missing_dependency(fmt)
+            if err:
+                results.append({'format': fmt, 'skipped': err})
+                continue
+            results.append(bench_format(fmt, records, head, Path(tmp), args.repeat))
+
+    base = next((r for r in results if r.get('format') == 'json' and 'bytes' in r), None)
+    for r in results:
+        if base is not None and 'bytes' in r:
+            r['size_ratio'] = round(r['bytes'] / base['bytes'], 3)
+    if args.json:
+        print(json.dumps({'files': len(records), 'repeat': args.repeat, 'results': results}, ensure_ascii=False, indent=2))
+        return 0
+    print(f"语料：{len(records)} 篇（{', '.join(cfg.get('source_dirs', []))}），每种格式取 {args.repeat} 次最小值")
+    print(f"{'格式':<10} {'大小(字节)':>12} {'相对json':>9} {'写出(s)':>9} {'读取(s)':>9}")
+    for r in results:
+        if 'skipped' in r:
+            print(f"{r['format']:<10} 跳过：{r['skipped']}")
+            continue
+        ratio = f"{r['size_ratio']:.3f}" if 'size_ratio' in r else '-'
+        print(f"{r['format']:<10} {r['bytes']:>12} {ratio:>9} {r['write_s']:>9.4f} {r['read_s']:>9.4f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: GPL-3.0-only
+# Copyright (C) 2025 GaoZheng
+
+"""
+合并与摘要流水线（`merge_md_by_timestamp.py`）的合成语料基准。
+
+- 语料：`generate_corpus` 按固定随机种子生成 `<10位时间戳>_<标题>.md`，分布于与默认配置同名的来源目录；
+  正文为中文段落 + 行内/独立 LaTeX 公式 + 标题/列表，大小按真实 `src/` 语料拟合的对数正态分布
+  （中位约 6.8 KB，p90 约 11 KB），另含少量超长文档（触发分块摘要）、近似重复副本与不匹配命名的文件。
+- 每个规模（`--sizes`，默认 1k/10k/100k 篇）计时：`iter_md_files`、`parse_entries`、`build_markdown_text`、
+  `write_json`（各取 `--repeat` 次最小值；文件已在页缓存中）；以及完整 `main`（离线替身 `fake` 提供方，不限速）的
+  三种情形：首次全量运行（cold）、语料未变的重跑（warm）、按请求上限中断后的续跑（resume），
+  并附各次运行 metrics 中的阶段耗时（`resume` 阶段即断点定位与日志重写）。
+- 语料与输出位于仓库 `out/bench_pipeline/` 下的临时目录（`main` 要求来源目录位于仓库根内），结束后删除（`--keep` 保留）。
+  100k 篇约占 0.8 GB 磁盘；`build_markdown_text` 需在内存中拼接全部正文。
+- 结果以 JSON 输出（`--output` 另写入文件），带提交号与环境信息，便于跨提交比较。
+- `--memory`：改为在 tracemalloc 下测量各流式阶段（`parse_entries` 含近似重复签名、`write_json`、`write_markdown`）
+  的瞬时峰值（阶段内峰值减去阶段结束时仍保留的内存），并单独报告保留部分（条目元数据与签名，随篇数线性增长）；
+  多个规模时比较最小与最大规模的瞬时峰值之比，超过 `--memory-max-growth` 则退出码为 1
+  （正文逐篇读取、用后即弃，瞬时峰值应与语料规模无关）。
+
+用法：
+    python3 script/merge_md/bench_pipeline.py [--sizes 1000,10000,100000] [--repeat 3] [--output bench.json]
+    python3 script/merge_md/bench_pipeline.py --memory --sizes 1000,10000
+    python3 script/merge_md/bench_pipeline.py --generate-only 目录 --sizes 1000
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import merge_md_by_timestamp as mm
+from near_dup import NearDupIndex
+
+
+BENCH_VERSION = 1
+SOURCE_DIRS = ('kernel_plus', 'app_docs', 'kernel_reference', 'sub_projects_docs/haca', 'sub_projects_docs/lbopb')
+SIZE_MEDIAN = 6800      # 字节；真实语料中位数
+SIZE_SIGMA = 0.4        # 对数正态形状参数（p90 约 11 KB，p99 约 17 KB）
+SIZE_MIN = 600
+LONG_DOC_RATE = 0.002   # 超长文档比例（200~400 KB，超出单次请求 token 预算）
+DUP_RATE = 0.02         # 近似重复副本比例
+STRAY_RATE = 0.01       # 不匹配命名模式的 .md 文件比例
+TS_START = 1700000000
+MEMORY_STAGES = ('parse_entries', 'write_json', 'write_markdown')
+
+_TERMS = (
+    '逻辑压强', '吸引子', '路径积分', '偏序集', '拓扑空间', '算子代数', '泛函', '谱分解', '测度', '范畴',
+    '同构', '演化路径', '价值基准', '广义集合', '公理系统', '动力学系统', '希尔伯特空间', '李群', '纤维丛',
+    '度量张量', '不动点', '生成元', '格结构', '约束条件', '可能性空间', '逻辑性度量', '观测算子', '塌缩',
+)
+_VERBS = ('定义了', '刻画了', '诱导出', '等价于', '蕴含', '约束了', '决定了', '对应于', '作用于', '收敛到')
+_LEADS = ('', '', '因此，', '进一步地，', '在此基础上，', '换言之，', '注意到', '由此可见，', '特别地，')
+_EN = ('Definition', 'Axiom', 'Lemma', 'Operator', 'Metric', 'Attractor', 'Path Integral', 'Spectrum')
+_INLINE = (
+    r'$\gamma^*$', r'$L(\gamma; w)$', r'$\mathcal{H}$', r'$\int_S e^{iS[\gamma]}\,\mathcal{D}\gamma$',
+    r'$x \preceq y$', r'$\nabla_\mu T^{\mu\nu} = 0$', r'$\sigma(A) \subset \mathbb{R}$', r'$f: X \to Y$',
+    r'$w \in \mathbb{R}^n$', r'$\|\psi\|_2 = 1$',
+)
+_DISPLAY = (
+    '$$\n\\gamma^* = \\arg\\max_{\\gamma \\in S} L(\\gamma; w)\n$$',
+    '$$\n\\begin{aligned}\nZ &= \\int \\mathcal{D}\\gamma\\, e^{-\\beta L(\\gamma; w)} \\\\\n'
+    'P(\\gamma) &= \\frac{1}{Z} e^{-\\beta L(\\gamma; w)}\n\\end{aligned}\n$$',
+    '$$\n\\forall x, y \\in S:\\; x \\preceq y \\Rightarrow L(x; w) \\le L(y; w)\n$$',
+    '$$\nA = \\sum_{k} \\lambda_k \\, |e_k\\rangle\\langle e_k|\n$$',
+)
+
+
+def _sentence(rng: random.Random) -> str:
+    s = rng.choice(_LEADS) + rng.choice(_TERMS)
+    if rng.random() < 0.4:
+        s += f" {rng.choice(_INLINE)} "
+    s += rng.choice(_VERBS) + rng.choice(_TERMS)
+    if rng.random() < 0.25:
+        s += f"（{rng.choice(_EN)}）"
+    if rng.random() < 0.3:
+        s += f"，其中 {rng.choice(_INLINE)} 满足{rng.choice(_TERMS)}的{rng.choice(_TERMS)}"
+    return s + '。'
+
+
+def _paragraph(rng: random.Random) -> str:
+    return ''.join(_sentence(rng) for _ in range(rng.randint(2, 6)))
+
+
+def make_document(rng: random.Random, title: str, ts: int, target_bytes: int) -> str:
+    """生成约 target_bytes 字节（UTF-8）的文档：标题、元信息、可选 `## 摘要`，其后为编号小节。"""
+    day = datetime.fromtimestamp(ts, tz=timezone.utc).date().isoformat()
+    parts = [f"# **{title}**", '', '- 作者：GaoZheng', f"- 日期：{day}", '- 版本：v1.0.0', '', '---', '']
+    if rng.random() < 0.5:
+        parts += ['## 摘要', '', _paragraph(rng), '']
+    size = sum(len(p.encode('utf-8')) + 1 for p in parts)
+    sec = 0
+    while size < target_bytes:
+        sec += 1
+        block = [f"### {sec}. {rng.choice(_TERMS)}与{rng.choice(_TERMS)} ({rng.choice(_EN)})", '']
+        for _ in range(rng.randint(1, 4)):
+            r = rng.random()
+            if r < 0.15:
+                block += [rng.choice(_DISPLAY), '']
+            elif r < 0.3:
+                block += [f"{i}.  **{rng.choice(_TERMS)}**：{_sentence(rng)}" for i in range(1, rng.randint(2, 5))] + ['']
+            else:
+                block += [_paragraph(rng), '']
+        parts += block
+        size += sum(len(p.encode('utf-8')) + 1 for p in block)
+    return '\n'.join(parts)
+
+
+def _target_size(rng: random.Random) -> int:
+    if rng.random() < LONG_DOC_RATE:
+        return rng.randint(200_000, 400_000)
+    return max(SIZE_MIN, int(SIZE_MEDIAN * math.exp(rng.gauss(0.0, SIZE_SIGMA))))
+
+
+def generate_corpus(root: Path, n_files: int, seed: int = 0) -> Dict[str, Any]:
+    """在 root 下的 `SOURCE_DIRS` 中生成 n_files 篇匹配命名的文档（另加少量不匹配的文件）；返回统计。"""
+    rng = random.Random(seed)
+    dirs = [root / d for d in SOURCE_DIRS]
+    for d in dirs:
+        d.mkdir(parents=True, exist_ok=True)
+    ts = TS_START
+    total_bytes = 0
+    dups = strays = 0
+    recent: List[str] = []  # 近似重复的取材窗口
+    for i in range(n_files):
+        ts += rng.randint(1, 1800)
+        title = f"{rng.choice(_TERMS)}的{rng.choice(_TERMS)}与{rng.choice(_TERMS)}_{i}"
+        if recent and rng.random() < DUP_RATE:
+            # 近似重复：复制较早的一篇，只改动末尾一段
+            text = rng.choice(recent) + '\n' + _paragraph(rng) + '\n'
+            dups += 1
+        else:
+            text = make_document(rng, title, ts, _target_size(rng))
+            if len(text) < 50_000:
+                recent.append(text)
+                if len(recent) > 64:
+                    recent.pop(rng.randrange(len(recent)))
+        data = text.encode('utf-8')
+        d = dirs[i % len(dirs)]
+        (d / f"{ts}_{title}.md").write_bytes(data)
+        total_bytes += len(data)
+        if rng.random() < STRAY_RATE:
+            (d / f"notes_{i}.md").write_text('# 说明\n\n不匹配命名模式，应被跳过。\n', encoding='utf-8', newline='\n')
+            strays += 1
+    return {'files': n_files, 'bytes': total_bytes, 'near_duplicates': dups, 'stray_files': strays, 'seed': seed}
+
+
+def _best(fn: Callable[[], Any], repeat: int) -> Tuple[float, Any]:
+    best = math.inf
+    result: Any = None
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+@contextlib.contextmanager
+def _quiet():
+    """丢弃流水线逐项输出的进度行（仍计入格式化与 print 的开销）。"""
+    with open(os.devnull, 'w', encoding='utf-8') as null, contextlib.redirect_stdout(null):
+        yield
+
+
+def _bench_config(base: Dict[str, Any], source_dirs: List[str], llm_latency: float, cap: int = 0) -> Dict[str, Any]:
+    cfg = json.loads(json.dumps(base))
+    cfg['source_dirs'] = source_dirs
+    cfg.pop('output_dir', None)
+    cfg['metrics'] = {'enabled': True, 'trace': False}
+    comp = cfg.setdefault('compression', {})
+    comp.update({
+        'enabled': True,
+        'provider': 'fake',
+        'provider_options': {'latency': llm_latency},
+        'request_interval_seconds': 0,
+        'max_requests_per_run': cap,
+        'rate_limit': {'requests_per_minute': 0, 'tokens_per_minute': 0},
+    })
+    return cfg
+
+
+def _run_main(cfg: Dict[str, Any], cfg_path: Path, out_dir: Path) -> Dict[str, Any]:
+    cfg_path.write_text(json.dumps(cfg, ensure_ascii=False, indent=2), encoding='utf-8')
+    t0 = time.perf_counter()
+    with _quiet():
+        rc = mm.main(['--config', str(cfg_path), '--out-dir', str(out_dir)])
+    wall = time.perf_counter() - t0
+    m = mm.METRICS.to_dict()
+    return {
+        'rc': rc,
+        'wall_s': round(wall, 4),
+        'stages': {k: v['total_s'] for k, v in m['stages'].items() if k in (
+            'scan', 'read', 'dedupe', 'write_all', 'resume', 'summarize', 'compact')},
+        'requests_made': m['gauges'].get('requests_made'),
+        'resumed_entries': m['gauges'].get('resumed_entries'),
+        'committed_entries': m['gauges'].get('committed_entries'),
+    }
+
+
+def bench_size(
+    n_files: int, work: Path, repo_root: Path, base_cfg: Dict[str, Any], args: argparse.Namespace,
+) -> Dict[str, Any]:
+    corpus = work / f"corpus_{n_files}"
+    t0 = time.perf_counter()
+    gen = generate_corpus(corpus, n_files, seed=args.seed)
+    res: Dict[str, Any] = {'files': n_files, 'corpus': gen, 'generate_s': round(time.perf_counter() - t0, 4)}
+    src_dirs = [corpus / d for d in SOURCE_DIRS]
+    rep = args.repeat
+
+    t, files = _best(lambda: list(mm.iter_md_files(src_dirs)), rep)
+    res['iter_md_files_s'] = round(t, 4)
+    t, entries = _best(lambda: mm.parse_entries(repo_root, files), rep)
+    res['parse_entries_s'] = round(t, 4)
+    with _quiet():
+        t, text = _best(lambda: mm.build_markdown_text(entries), rep)
+    res['build_markdown_text_s'] = round(t, 4)
+    res['markdown_bytes'] = len(text.encode('utf-8'))
+    del text
+    all_path = work / f"all_{n_files}.json"
+    rel_dirs = [d.relative_to(repo_root).as_posix() for d in src_dirs]
+    t, _ = _best(lambda: mm.write_json(all_path, entries, rel_dirs), rep)
+    res['write_json_s'] = round(t, 4)
+    res['all_json_bytes'] = all_path.stat().st_size
+    del entries, files
+
+    main_res: Dict[str, Any] = {}
+    # cold：全新输出目录的全量运行；warm：语料未变的重跑（增量扫描 + 全部续跑 + 缓存命中）
+    out = work / f"out_{n_files}"
+    cfg = _bench_config(base_cfg, rel_dirs, args.llm_latency)
+    main_res['cold'] = _run_main(cfg, work / 'bench_config.json', out)
+    main_res['warm'] = _run_main(cfg, work / 'bench_config.json', out)
+    # resume：另一输出目录先按请求上限中断，再计时完成剩余部分的续跑
+    out_r = work / f"out_{n_files}_resume"
+    cap = max(1, n_files // 8)
+    main_res['resume_cap'] = cap
+    _run_main(_bench_config(base_cfg, rel_dirs, args.llm_latency, cap=cap), work / 'bench_config.json', out_r)
+    main_res['resume'] = _run_main(cfg, work / 'bench_config.json', out_r)
+    res['main'] = main_res
+    shutil.rmtree(out, ignore_errors=True)
+    shutil.rmtree(out_r, ignore_errors=True)
+    return res
+
+
+def _traced(fn: Callable[[], Any]) -> Tuple[int, int, Any]:
+    """在已启动的 tracemalloc 下运行 fn；返回 (瞬时峰值字节, 保留字节, 结果)。
+
+    瞬时峰值为阶段内峰值减去阶段结束时的占用，保留字节为阶段前后占用之差（如返回的条目列表）。
+    """
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    result = fn()
+    after, peak = tracemalloc.get_traced_memory()
+    return peak - after, after - before, result
+
+
+def bench_memory(n_files: int, work: Path, repo_root: Path, args: argparse.Namespace) -> Dict[str, Any]:
+    corpus = work / f"corpus_{n_files}"
+    gen = generate_corpus(corpus, n_files, seed=args.seed)
+    src_dirs = [corpus / d for d in SOURCE_DIRS]
+    rel_dirs = [d.relative_to(repo_root).as_posix() for d in src_dirs]
+    files = list(mm.iter_md_files(src_dirs))
+    res: Dict[str, Any] = {'files': n_files, 'corpus': gen}
+    peaks: Dict[str, int] = {}
+    tracemalloc.start()
+    try:
+        near_dup = NearDupIndex(None)
+        peaks['parse_entries'], retained, entries = _traced(
+            lambda: mm.parse_entries(repo_root, files, near_dup=near_dup))
+        before = tracemalloc.get_traced_memory()[0]
+        del near_dup
+        res['signatures_bytes'] = before - tracemalloc.get_traced_memory()[0]
+        res['entries_bytes'] = retained - res['signatures_bytes']
+        peaks['write_json'], _, _ = _traced(lambda: mm.write_json(work / f"all_{n_files}.json", entries, rel_dirs))
+        with _quiet():
+            peaks['write_markdown'], _, _ = _traced(lambda: mm.write_markdown(work / f"all_{n_files}.md", entries))
+    finally:
+        tracemalloc.stop()
+    res['entries_bytes_per_file'] = round(res['entries_bytes'] / max(1, len(entries)), 1)
+    res['peak_bytes'] = peaks
+    return res
+
+
+def _memory_check(results: List[Dict[str, Any]], max_growth: float) -> Dict[str, Any]:
+    lo = min(results, key=lambda r: r['files'])
+    hi = max(results, key=lambda r: r['files'])
+    growth = {k: round(hi['peak_bytes'][k] / max(1, lo['peak_bytes'][k]), 3) for k in MEMORY_STAGES}
+    return {
+        'files': [lo['files'], hi['files']],
+        'corpus_growth': round(hi['corpus']['bytes'] / max(1, lo['corpus']['bytes']), 3),
+        'peak_growth': growth,
+        'max_growth': max_growth,
+        'ok': all(g <= max_growth for g in growth.values()),
+    }
+
+
+def _git_commit(repo_root: Path) -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=repo_root, capture_output=True, text=True, timeout=30, check=True,
+        )
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    script_path = Path(__file__).resolve()
+    parser = argparse.ArgumentParser(description='以合成语料对合并与摘要流水线计时（离线替身提供方），输出 JSON。')
+    parser.add_argument('--sizes', default='1000,10000,100000', help='逗号分隔的语料规模（篇数，默认 1000,10000,100000）')
+    parser.add_argument('--repeat', type=int, default=3, help='各函数级计时重复次数，取最小值（默认 3）')
+    parser.add_argument('--llm-latency', type=float, default=0.0, help='替身提供方每次请求的模拟延迟（秒，默认 0）')
+    parser.add_argument('--seed', type=int, default=0, help='语料随机种子（默认 0）')
+    parser.add_argument('--config', type=Path, default=script_path.with_name('merge_md_by_timestamp.json'),
+                        help='作为基准的合并配置（来源目录、提供方与限速会被覆盖）')
+    parser.add_argument('--output', type=Path, default=None, help='另将结果 JSON 写入该文件')
+    parser.add_argument('--keep', action='store_true', help='保留临时语料与输出目录')
+    parser.add_argument('--memory', action='store_true',
+                        help='只以 tracemalloc 测量各流式阶段的峰值内存（不计时、不运行完整 main）')
+    parser.add_argument('--memory-max-growth', type=float, default=2.0,
+                        help='--memory 下最大与最小规模的阶段峰值之比上限，超过则退出码为 1（默认 2.0）')
+    parser.add_argument('--generate-only', type=Path, default=None, metavar='DIR',
+                        help='只在 DIR 下生成语料（每个规模一个子目录）后退出')
+    args = parser.parse_args(argv)
+    try:
+        sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+    except ValueError:
+        parser.error(f"无效的 --sizes：{args.sizes}")
+    if not sizes or min(sizes) <= 0:
+        parser.error('--sizes 须为正整数列表')
+
+    if args.generate_only is not None:
+        for n in sizes:
+            print(json.dumps(generate_corpus(args.generate_only / f"corpus_{n}", n, seed=args.seed), ensure_ascii=False))
+        return 0
+
+    repo_root = mm.guess_repo_root(script_path.parent)
+    base_cfg = mm.load_config(args.config)
+    bench_root = repo_root / 'out' / 'bench_pipeline'
+    bench_root.mkdir(parents=True, exist_ok=True)
+    work = Path(tempfile.mkdtemp(prefix='run_', dir=bench_root))
+    results: List[Dict[str, Any]] = []
+    try:
+        for n in sizes:
+            print(f"[基准] {n} 篇…", file=sys.stderr)
+            if args.memory:
+                results.append(bench_memory(n, work, repo_root, args))
+            else:
+                results.append(bench_size(n, work, repo_root, base_cfg, args))
+            if not args.keep:
+                shutil.rmtree(work / f"corpus_{n}", ignore_errors=True)  # 逐规模释放磁盘
+    finally:
+        if not args.keep:
+            shutil.rmtree(work, ignore_errors=True)
+        else:
+            print(f"[基准] 已保留：{work}", file=sys.stderr)
+
+    report = {
+        'version': BENCH_VERSION,
+        'generated_at': datetime.now(timezone.utc).isoformat(),
+        'commit': _git_commit(repo_root),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'repeat': args.repeat,
+        'llm_latency_s': args.llm_latency,
+        'results': results,
+    }
+    check: Optional[Dict[str, Any]] = None
+    if args.memory and len(sizes) > 1:
+        check = _memory_check(results, args.memory_max_growth)
+        report['memory_check'] = check
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output is not None:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(text + '\n', encoding='utf-8')
+    print(text)
+    if check is not None and not check['ok']:
+        print(f"[基准] 峰值内存随规模增长超过 {args.memory_max_growth:g} 倍：{check['peak_growth']}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: GPL-3.0-only
+# Copyright (C) 2025 GaoZheng
+
+"""
+按章节差异的增量重摘要（供 `merge_md_by_timestamp.py` 的 `compression.incremental` 使用）。
+
+- 章节：按 Markdown 标题切分（复用 md_chunker.split_blocks，代码/数学块不会被切开）；首个标题之前的内容
+  （文首元信息）为首节。每节记 (标题行, 正文 sha256, token 估算)。
+- 基线：`out/<script_stem>.delta_base.json` 按路径记录上次成功摘要时的正文 sha256、摘要参数指纹、章节指纹与摘要；
+  只保存章节指纹，不保存源文本——变化章节的新文本取自本次读取的正文，删除的章节只需标题。
+- 差异：以 difflib.SequenceMatcher 对齐新旧 (标题, sha256) 序列；差异比 =
+  （新版中新增/修改章节的 token + 旧版中被删除章节的 token）/ max(新旧全文 token)。
+- `plan_update` 给出可增量更新的差异：文档不少于 `min_tokens`、差异比不超过 `max_diff_ratio`、
+  连续增量次数未达 `max_chain`（防止多次修补后摘要漂移）、变化章节不超过单次请求预算；否则返回 None，由调用方完整重摘要。
+"""
+
+from __future__ import annotations
+
+import difflib
+import json
+import os
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from md_chunker import split_blocks
+from summary_cache import sha256_text
+
+
+BASE_VERSION = 1
+MAX_HEADING_CHARS = 120
+HEAD_SECTION = '（文首）'  # 首个标题之前的内容在提示中的名称
+
+
+@dataclass
+class Section:
+    heading: str  # 标题行（去首尾空白，截断至 MAX_HEADING_CHARS）；首节为 ''
+    sha256: str
+    tokens: int
+    text: str = field(repr=False, default='')
+
+    def fingerprint(self) -> List[Any]:
+        return [self.heading, self.sha256, self.tokens]
+
+
+def split_sections(text: str) -> List[Section]:
+    """按标题切分为章节（各节原文拼接即为全文）。"""
+    sections: List[Section] = []
+    buf: List[str] = []
+    tokens = 0
+    heading = ''
+
+    def _emit() -> None:
+        nonlocal buf, tokens
+        if buf:
+            s = ''.join(buf)
+            sections.append(Section(heading, sha256_text(s), tokens, s))
+        buf, tokens = [], 0
+
+    for b in split_blocks(text):
+        if b.heading:
+            _emit()
+            heading = b.text.strip().splitlines()[0].strip()[:MAX_HEADING_CHARS]
+        buf.append(b.text)
+        tokens += b.tokens
+    _emit()
+    return sections
+
+
+@dataclass
+class SectionDiff:
+    changed: List[Section]  # 新版中新增或修改的章节（按文中顺序）
+    removed: List[str]      # 旧版中被删除的章节标题（同名章节被修改时不计入）
+    changed_tokens: int
+    removed_tokens: int
+    total_tokens: int       # max(新版, 旧版) 全文 token
+
+    @property
+    def ratio(self) -> float:
+        return (self.changed_tokens + self.removed_tokens) / max(1, self.total_tokens)
+
+    @property
+    def empty(self) -> bool:
+        return not self.changed and not self.removed
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            'changed_sections': len(self.changed),
+            'removed_sections': len(self.removed),
+            'diff_ratio': round(self.ratio, 4),
+        }
+
+
+def diff_sections(old: List[List[Any]], new: List[Section]) -> SectionDiff:
+    """old 为基线中的章节指纹列表 [[标题, sha256, tokens], …]。"""
+    sm = difflib.SequenceMatcher(None, [(h, s) for h, s, _ in old], [(s.heading, s.sha256) for s in new], autojunk=False)
+    changed: List[Section] = []
+    removed: List[str] = []
+    removed_tokens = 0
+    for tag, i1, i2, j1, j2 in sm.get_opcodes():
+        if tag == 'equal':
+            continue
+        changed.extend(new[j1:j2])
+        new_heads = {s.heading for s in new[j1:j2]}
+        for h, _, t in old[i1:i2]:
+            if h not in new_heads:
+                removed.append(h or HEAD_SECTION)
+                removed_tokens += int(t)
+    total = max(sum(s.tokens for s in new), sum(int(t) for _, _, t in old))
+    return SectionDiff(changed, removed, sum(s.tokens for s in changed), removed_tokens, total)
+
+
+def plan_update(
+    base: Optional[Dict[str, Any]],
+    sections: List[Section],
+    params: str,
+    max_diff_ratio: float,
+    max_chain: int,
+    max_tokens: int,
+) -> Optional[SectionDiff]:
+    """基线可用且差异足够小时返回差异（可能为空：正文未变），否则返回 None（完整重摘要）。"""
+    if not base or base.get('params') != params or not base.get('summary'):
+        return None
+    if max_chain > 0 and int(base.get('chain') or 0) >= max_chain:
+        return None
+    d = diff_sections(base.get('sections') or [], sections)
+    if d.ratio > max_diff_ratio or d.changed_tokens > max_tokens:
+        return None
+    return d
+
+
+class DeltaBase:
+    """按路径持久化的增量摘要基线。只在主线程（生产/提交阶段）读写。"""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._items: Dict[str, Dict[str, Any]] = {}
+        self._dirty = False
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            if not self.path.exists():
+                return
+            with self.path.open('r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception:
+            return
+        if not isinstance(data, dict) or data.get('version') != BASE_VERSION:
+            return
+        items = data.get('items')
+        if isinstance(items, dict):
+            self._items = {k: v for k, v in items.items() if isinstance(v, dict)}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, rel: str) -> Optional[Dict[str, Any]]:
+        return self._items.get(rel)
+
+    def put(self, rel: str, content_sha: str, params: str, sections: List[Section], summary: str, chain: int = 0) -> None:
+        self._items[rel] = {
+            'sha256': content_sha,
+            'params': params,
+            'sections': [s.fingerprint() for s in sections],
+            'summary': summary,
+            'chain': int(chain),
+        }
+        self._dirty = True
+
+    def discard(self, rel: str) -> None:
+        if self._items.pop(rel, None) is not None:
+            self._dirty = True
+
+    def retain(self, paths: Iterable[str]) -> None:
+        """移除不在 paths 中的基线（源文件已删除或改名）。"""
+        keep = set(paths)
+        for k in [k for k in self._items if k not in keep]:
+            del self._items[k]
+            self._dirty = True
+
+    def save(self) -> None:
+        if not self._dirty:
+            return
+        payload = {
+            'version': BASE_VERSION,
+            'saved_at': datetime.now(timezone.utc).isoformat(),
+            'items': self._items,
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        with tmp.open('w', encoding='utf-8', newline='\n') as f:
+            json.dump(payload, f, ensure_ascii=False, separators=(',', ':'))
+            f.write('\n')
+        os.replace(tmp, self.path)
+        self._dirty = False
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: GPL-3.0-only
+# Copyright (C) 2025 GaoZheng
+
+"""
+离线抽取式摘要（供 `merge_md_by_timestamp.py` 在未启用压缩或请求失败时替代截断）。
+
+- 预处理：去掉元信息行（作者/日期/版本）、许可声明、代码块与独立公式块、表格与分隔线；
+  存在“摘要/Abstract”小节时只在该小节内抽取。
+- 中文分句：按 。！？；!? 与换行切分，英文句点后接空白亦视为句末；过短的句子不参与排序。
+- 句向量：字符 n-gram（默认 2~3 元，不含行内公式）TF-IDF，L2 归一化；相似度矩阵为余弦相似度。
+- TextRank：在相似度图上做带阻尼的幂迭代（随机跳转偏向靠前的句子）；按得分贪心选句（跳过与已选句高度相似者），
+  以原文顺序拼接，总长度不超过 max_chars。
+- 依赖：NumPy 可用时整段向量化计算；否则退回纯 Python 实现；超长文档只取前若干句参与排序。
+"""
+
+from __future__ import annotations
+
+import math
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:  # 可选依赖：未安装时使用纯 Python 实现
+    import numpy as np  # type: ignore
+except Exception:  # pragma: no cover - 取决于环境
+    np = None  # type: ignore
+
+
+NGRAM_RANGE = (2, 3)
+DAMPING = 0.85
+MAX_ITER = 60
+TOL = 1e-6
+MIN_SENT_CHARS = 8
+REDUNDANCY = 0.75          # 与已选句余弦相似度超过该值则跳过
+MAX_SENTS = 600            # 参与排序的句子数上限（超长文档只取前若干句；相似度矩阵为 n×n）
+PURE_PY_MAX_SENTS = 160    # 纯 Python 实现的句子数上限
+
+_META_RE = re.compile(r"^\s*[-*]\s*(作者|日期|版本|Author|Date|Version)\s*[:：]", re.I)
+_LICENSE_RE = re.compile(r"许可声明|许可协议|Copyright \(C\)|SPDX-License-Identifier|creativecommons\.org", re.I)
+_HEADING_RE = re.compile(r"^\s{0,3}(#{1,6})\s+(.*)$")
+_FENCE_RE = re.compile(r"^\s*(```|~~~)")
+_ABSTRACT_RE = re.compile(r"^(摘要|内容摘要|概要|abstract|summary)\b", re.I)
+_SENT_RE = re.compile(r"[^。！？；!?\n]+(?:[。！？；!?]+|(?<=[A-Za-z0-9)\]])\.(?=\s)|$)")
+_MD_INLINE_RE = re.compile(r"\*\*|__|`|^\s*(?:[-*+]|\d+[.)])\s+|^\s*>\s*")
+_LINK_RE = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+_INLINE_MATH_RE = re.compile(r"\$[^$]*\$")
+
+
+def _heading_title(m: 're.Match[str]') -> str:
+    return re.sub(r"[*_`#\s]+", ' ', m.group(2)).strip()
+
+
+def _clean_lines(text: str) -> List[Tuple[int, str, bool]]:
+    """返回 (标题级别, 文本, 是否为标题) 序列；去掉不参与摘要的块。"""
+    out: List[Tuple[int, str, bool]] = []
+    fence = ''
+    math = False
+    for line in text.splitlines():
+        s = line.strip()
+        if fence:
+            if s.startswith(fence):
+                fence = ''
+            continue
+        fm = _FENCE_RE.match(line)
+        if fm:
+            fence = fm.group(1)
+            continue
+        if math:
+            if '$$' in s or s.startswith('\\]'):
+                math = False
+            continue
+        if s.startswith('$$') or s == '\\[':
+            math = not (s.count('$$') >= 2 and len(s) > 2)
+            continue
+        if _LICENSE_RE.search(s):
+            break  # 许可声明通常位于文末，其后内容一并丢弃
+        if not s or s.startswith('|') or re.fullmatch(r"[-*_=\s]{3,}", s) or _META_RE.match(s):
+            out.append((0, '', False))
+            continue
+        hm = _HEADING_RE.match(line)
+        if hm:
+            out.append((len(hm.group(1)), _heading_title(hm), True))
+            continue
+        s = _LINK_RE.sub(r"\1", s)
+        s = _MD_INLINE_RE.sub('', s).strip()
+        out.append((0, s, False))
+    return out
+
+
+def _abstract_section(lines: List[Tuple[int, str, bool]]) -> Optional[List[Tuple[int, str, bool]]]:
+    for i, (level, title, is_h) in enumerate(lines):
+        if is_h and _ABSTRACT_RE.match(title):
+            body: List[Tuple[int, str, bool]] = []
+            for item in lines[i + 1:]:
+                if item[2] and item[0] <= level:
+                    break
+                body.append(item)
+            if any(t for _, t, h in body if not h):
+                return body
+    return None
+
+
+def split_sentences(text: str) -> List[str]:
+    """中文分句（保留句末标点，无标点的行补“；”）；标题、空行与过短片段不返回。"""
+    lines = _clean_lines(text)
+    section = _abstract_section(lines)
+    if section is not None:
+        lines = section
+    sents: List[str] = []
+    for _, s, is_h in lines:
+        if is_h or not s:
+            continue
+        for m in _SENT_RE.finditer(s):
+            t = m.group(0).strip()
+            if len(re.sub(r"\s", '', t)) >= MIN_SENT_CHARS:
+                # 列表项/无标点行补分号，拼接后仍可断句
+                sents.append(t if t[-1] in '。！？；!?.：:' else t + '；')
+    return sents
+
+
+def _ngrams(s: str) -> Dict[str, int]:
+    """字符 n-gram 计数；行内公式不参与（符号 n-gram 在公式密集的文档中会主导相似度）。"""
+    s = re.sub(r"\s+", ' ', _INLINE_MATH_RE.sub(' ', s).lower())
+    lo, hi = NGRAM_RANGE
+    c: Dict[str, int] = {}
+    for n in range(lo, hi + 1):
+        for i in range(len(s) - n + 1):
+            g = s[i:i + n]
+            if g.strip():
+                c[g] = c.get(g, 0) + 1
+    return c
+
+
+def _teleport(n: int) -> List[float]:
+    """位置先验：随机跳转偏向靠前的句子（首段通常是引言/摘要）。"""
+    w = [1.0 / math.sqrt(i + 1.0) for i in range(n)]
+    total = sum(w)
+    return [x / total for x in w]
+
+
+def _textrank_numpy(counts: Sequence[Dict[str, int]]) -> Tuple[List[float], 'np.ndarray']:
+    n = len(counts)
+    vocab: Dict[str, int] = {}
+    rows: List[int] = []
+    cols: List[int] = []
+    vals: List[int] = []
+    for r, c in enumerate(counts):
+        for g, v in c.items():
+            rows.append(r)
+            cols.append(vocab.setdefault(g, len(vocab)))
+            vals.append(v)
+    r_a = np.asarray(rows, dtype=np.int64)
+    c_a = np.asarray(cols, dtype=np.int64)
+    df = np.bincount(c_a, minlength=len(vocab))
+    w = (1.0 + np.log(np.asarray(vals, dtype=np.float64))) * (np.log((1.0 + n) / (1.0 + df[c_a])) + 1.0)
+    norm = np.sqrt(np.bincount(r_a, weights=w * w, minlength=n))
+    w /= np.where(norm > 0, norm, 1.0)[r_a]
+    # 只出现在一个句子中的 n-gram 不影响句间相似度：稠密矩阵只保留 df >= 2 的列
+    keep = df[c_a] >= 2
+    shared = np.flatnonzero(df >= 2)
+    remap = np.full(len(vocab), -1, dtype=np.int64)
+    remap[shared] = np.arange(len(shared))
+    x = np.zeros((n, max(1, len(shared))), dtype=np.float64)
+    x[r_a[keep], remap[c_a[keep]]] = w[keep]
+    sim = x @ x.T
+    np.fill_diagonal(sim, 0.0)
+    row = sim.sum(axis=1, keepdims=True)
+    m = np.divide(sim, row, out=np.zeros_like(sim), where=row > 0)
+    tele = np.asarray(_teleport(n))
+    scores = np.full(n, 1.0 / n)
+    for _ in range(MAX_ITER):
+        nxt = (1.0 - DAMPING) * tele + DAMPING * (m.T @ scores)
+        delta = float(np.abs(nxt - scores).sum())
+        scores = nxt
+        if delta < TOL:
+            break
+    return [float(v) for v in scores], sim
+
+
+def _textrank_python(counts: Sequence[Dict[str, int]]) -> Tuple[List[float], List[Dict[int, float]]]:
+    n = len(counts)
+    df: Dict[str, int] = {}
+    for c in counts:
+        for g in c:
+            df[g] = df.get(g, 0) + 1
+    vecs: List[Dict[str, float]] = []
+    for c in counts:
+        v = {g: (1.0 + math.log(k)) * (math.log((1.0 + n) / (1.0 + df[g])) + 1.0) for g, k in c.items()}
+        norm = math.sqrt(sum(x * x for x in v.values())) or 1.0
+        vecs.append({g: x / norm for g, x in v.items() if df[g] >= 2})
+    # 倒排索引累加点积
+    postings: Dict[str, List[Tuple[int, float]]] = {}
+    for i, v in enumerate(vecs):
+        for g, x in v.items():
+            postings.setdefault(g, []).append((i, x))
+    sim: List[Dict[int, float]] = [dict() for _ in range(n)]
+    for plist in postings.values():
+        for a in range(len(plist)):
+            i, wi = plist[a]
+            si = sim[i]
+            for b in range(a + 1, len(plist)):
+                j, wj = plist[b]
+                si[j] = si.get(j, 0.0) + wi * wj
+    for i in range(n):
+        for j, x in list(sim[i].items()):
+            if j > i:
+                sim[j][i] = x
+    out_w = [sum(d.values()) for d in sim]
+    tele = _teleport(n)
+    scores = [1.0 / n] * n
+    for _ in range(MAX_ITER):
+        nxt = [(1.0 - DAMPING) * t for t in tele]
+        for i in range(n):
+            if out_w[i] <= 0:
+                continue
+            share = DAMPING * scores[i] / out_w[i]
+            for j, x in sim[i].items():
+                nxt[j] += share * x
+        delta = sum(abs(a - b) for a, b in zip(nxt, scores))
+        scores = nxt
+        if delta < TOL:
+            break
+    return scores, sim
+
+
+def extractive_summary(text: str, max_chars: int) -> str:
+    """抽取式摘要；结果长度不超过 max_chars（单句超长时截断并追加“……”）。"""
+    max_chars = max(1, int(max_chars))
+    sents = split_sentences(text)
+    if not sents:
+        flat = re.sub(r"\s+", ' ', text or '').strip()
+        return flat[:max_chars]
+    if sum(len(s) for s in sents) <= max_chars:
+        return ''.join(sents)
+    sents = sents[:MAX_SENTS if np is not None else PURE_PY_MAX_SENTS]
+    counts = [_ngrams(s) for s in sents]
+    if np is not None:
+        scores, sim_m = _textrank_numpy(counts)
+
+        def _sim(i: int, j: int) -> float:
+            return float(sim_m[i, j])
+    else:
+        scores, sim_d = _textrank_python(counts)
+
+        def _sim(i: int, j: int) -> float:
+            return sim_d[i].get(j, 0.0)
+
+    order = sorted(range(len(sents)), key=lambda i: (-scores[i], i))
+    chosen: List[int] = []
+    used = 0
+    for i in order:
+        s = sents[i]
+        if used + len(s) > max_chars or s.endswith(('：', ':')):
+            continue  # 以冒号结尾的句子通常引出公式/列表，单独摘出语义不完整
+        if any(_sim(i, j) > REDUNDANCY for j in chosen):
+            continue
+        chosen.append(i)
+        used += len(s)
+    if not chosen:
+        top = sents[order[0]]
+        return top[:max(0, max_chars - 2)] + '……' if max_chars > 2 else top[:max_chars]
+    return ''.join(sents[i] for i in sorted(chosen))
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: GPL-3.0-only
+# Copyright (C) 2025 GaoZheng
+
+"""
+结构感知、按 token 预算分块的 Markdown 切分器（供 `run_gemini_summary` 使用）。
+
+- 先按结构切为“块”：标题行开启新块；空行结束段落；围栏代码（``` / ~~~）、
+  `$$ … $$`、`\\[ … \\]` 与 `\\begin{…} … \\end{…}` 数学环境整体视为一个块，绝不从中间切开。
+- 再按 `estimate_tokens` 的离线估算贪心装箱到 `budget`；当前分块已过半且下一块为标题时提前换块，
+  尽量让每个分块从标题开始。
+- 超出预算的普通段落按句末标点（。！？；.!?;）再切，仍超出时按字符硬切；
+  段落内的行内数学（`$…$`、`$$…$$`、`\\(…\\)`、`\\[…\\]`）视为整体，其中的标点不作断点、硬切也不落在其中，
+  仅当单个行内公式本身超出预算时才切开。代码/数学块即使超出预算也保持完整。
+"""
+
+from __future__ import annotations
+
+import re
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import List, Tuple
+
+from rate_limiter import estimate_tokens
+
+
+_HEADING_RE = re.compile(r"^#{1,6}\s")
+_FENCE_RE = re.compile(r"^\s*(```|~~~)")
+_BEGIN_ENV_RE = re.compile(r"\\begin\{([A-Za-z*]+)\}")
+_SENTENCE_RE = re.compile(r"[^。！？；.!?;\n]*(?:[。！？；.!?;]+|\n|$)")
+_INLINE_MATH_RE = re.compile(r"\$\$.+?\$\$|\$[^$\n]+?\$|\\\(.+?\\\)|\\\[.+?\\\]", re.S)
+
+
+@dataclass
+class Block:
+    text: str
+    tokens: int
+    heading: bool = False
+    atomic: bool = False  # 代码/数学块：不可切分
+
+
+def split_blocks(text: str) -> List[Block]:
+    """按 Markdown 结构切分为块（块内保留原始换行，块之间的空行不丢失）。"""
+    blocks: List[Block] = []
+    buf: List[str] = []
+    atomic = False
+    heading = False
+    fence = ''       # 当前代码围栏标记
+    math = ''        # 当前数学环境的结束标记：'$$'、'\\]' 或 '\\end{env}'
+
+    def _flush() -> None:
+        nonlocal buf, atomic, heading
+        if buf:
+            s = ''.join(buf)
+            blocks.append(Block(s, estimate_tokens(s), heading=heading, atomic=atomic))
+        buf, atomic, heading = [], False, False
+
+    for line in text.splitlines(keepends=True):
+        stripped = line.strip()
+        if fence:
+            buf.append(line)
+            if stripped.startswith(fence):
+                fence = ''
+                _flush()
+            continue
+        if math:
+            buf.append(line)
+            closed = (line.count('$$') % 2 == 1) if math == '$$' else (math in line)
+            if closed:
+                math = ''
+                _flush()
+            continue
+        fm = _FENCE_RE.match(line)
+        if fm:
+            _flush()
+            buf.append(line)
+            fence, atomic = fm.group(1), True
+            continue
+        if line.count('$$') % 2 == 1:
+            _flush()
+            buf.append(line)
+            math, atomic = '$$', True
+            continue
+        if stripped.startswith('\\[') and '\\]' not in stripped:
+            _flush()
+            buf.append(line)
+            math, atomic = '\\]', True
+            continue
+        env = _BEGIN_ENV_RE.search(line)
+        if env and f"\\end{{{env.group(1)}}}" not in line:
+            _flush()
+            buf.append(line)
+            math, atomic = f"\\end{{{env.group(1)}}}", True
+            continue
+        if _HEADING_RE.match(line):
+            _flush()
+            buf.append(line)
+            heading = True
+            continue
+        if not stripped:
+            buf.append(line)
+            _flush()
+            continue
+        buf.append(line)
+    _flush()
+    return blocks
+
+
+def _math_spans(text: str) -> List[Tuple[int, int]]:
+    return [m.span() for m in _INLINE_MATH_RE.finditer(text)]
+
+
+def _sentences(text: str) -> List[str]:
+    """按句末标点切句；落在行内数学之中的标点不作为断点。"""
+    spans = _math_spans(text)
+    starts = [a for a, _ in spans]
+    out: List[str] = []
+    cur = ''
+    for m in _SENTENCE_RE.finditer(text):
+        if not m.group():
+            continue
+        cur += m.group()
+        i = bisect_right(starts, m.end() - 1) - 1
+        if i >= 0 and spans[i][1] > m.end():
+            continue  # 断点位于公式内部：与下一句合并
+        out.append(cur)
+        cur = ''
+    if cur:
+        out.append(cur)
+    return out
+
+
+def _hard_split(sent: str, budget: int, tokens: int) -> List[str]:
+    """按字符硬切单个超长句子；行内公式整体保留，除非公式本身超出预算。"""
+    step = max(1, len(sent) * budget // max(1, tokens))
+    atoms: List[str] = []
+    pos = 0
+    for a, b in _math_spans(sent):
+        atoms.extend(sent[i:min(i + step, a)] for i in range(pos, a, step))
+        span = sent[a:b]
+        if estimate_tokens(span) > budget:
+            atoms.extend(span[i:i + step] for i in range(0, len(span), step))
+        else:
+            atoms.append(span)
+        pos = b
+    atoms.extend(sent[i:i + step] for i in range(pos, len(sent), step))
+    parts: List[str] = []
+    cur, cur_tok = '', 0
+    for atom in atoms:
+        t = estimate_tokens(atom)
+        if cur and cur_tok + t > budget:
+            parts.append(cur)
+            cur, cur_tok = '', 0
+        cur += atom
+        cur_tok += t
+    if cur:
+        parts.append(cur)
+    return parts
+
+
+def _split_oversized(block: Block, budget: int) -> List[str]:
+    """将超出预算的普通段落按句子（必要时按字符）切成不超过预算的片段。"""
+    parts: List[str] = []
+    cur, cur_tok = '', 0
+    for sent in _sentences(block.text):
+        t = estimate_tokens(sent)
+        if t > budget:
+            if cur:
+                parts.append(cur)
+                cur, cur_tok = '', 0
+            parts.extend(_hard_split(sent, budget, t))
+            continue
+        if cur and cur_tok + t > budget:
+            parts.append(cur)
+            cur, cur_tok = '', 0
+        cur += sent
+        cur_tok += t
+    if cur:
+        parts.append(cur)
+    return parts
+
+
+def chunk_markdown(text: str, budget: int) -> List[str]:
+    """将文本按结构切分并装箱为若干分块，每块估算 token 数尽量不超过 `budget`。"""
+    budget = max(1, int(budget))
+    if estimate_tokens(text) <= budget:
+        return [text]
+    chunks: List[str] = []
+    cur: List[str] = []
+    cur_tok = 0
+
+    def _emit() -> None:
+        nonlocal cur, cur_tok
+        if cur:
+            s = ''.join(cur)
+            if s.strip():
+                chunks.append(s)
+        cur, cur_tok = [], 0
+
+    for b in split_blocks(text):
+        if b.tokens > budget and not b.atomic:
+            _emit()
+            for piece in _split_oversized(b, budget):
+                chunks.append(piece)
+            continue
+        if cur and (cur_tok + b.tokens > budget or (b.heading and cur_tok * 2 >= budget)):
+            _emit()
+        cur.append(b.text)
+        cur_tok += b.tokens
+    _emit()
+    return chunks
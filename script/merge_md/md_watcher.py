@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: GPL-3.0-only
+# Copyright (C) 2025 GaoZheng
+
+"""
+源目录变化监视（供 `merge_md_by_timestamp.py --watch` 使用）。
+
+- Linux：经 ctypes 调用 inotify（无第三方依赖），递归监视各目录；新建/移入的子目录自动加入监视。
+  只关心写入完成（IN_CLOSE_WRITE）、创建、删除与移入/移出，编辑器逐块写入的 IN_MODIFY 不触发。
+- 其他平台，或 inotify 不可用（如达到 `fs.inotify.max_user_watches` 上限）时：按间隔轮询
+  `*.md` 的 (size, mtime_ns) 快照并比较。
+- `wait_for_changes` 去抖：阻塞至首个事件，之后持续收集，直到静默 `quiet` 秒或累计 `max_delay` 秒，
+  一批编辑（如批量替换、版本库切换）只触发一次重跑。
+- 返回的是变化的 `.md` 路径（及事件不明确时的目录），仅作提示；调用方仍以扫描清单核对实际变化。
+"""
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+WATCH_MODES = ('auto', 'inotify', 'poll')
+
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_MASK = (
+    IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+)
+_EVENT = struct.Struct('iIII')  # struct inotify_event: wd, mask, cookie, len（其后为 name[len]）
+
+
+def _subdirs(root: Path) -> Iterable[Path]:
+    yield root
+    for cur, dirnames, _ in os.walk(root):
+        for name in dirnames:
+            yield Path(cur) / name
+
+
+class InotifyWatcher:
+    """基于 inotify 的递归目录监视。"""
+
+    kind = 'inotify'
+
+    def __init__(self, dirs: Iterable[Path]) -> None:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+        for fn in ('inotify_init1', 'inotify_add_watch'):
+            if not hasattr(libc, fn):
+                raise OSError(errno.ENOSYS, f"libc 不提供 {fn}")
+        self._libc = libc
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, f"inotify_init1 失败：{os.strerror(err)}")
+        self._fd = fd
+        self._wd: Dict[int, Path] = {}
+        try:
+            for d in dirs:
+                if d.is_dir():
+                    self._add_tree(d)
+        except OSError:
+            self.close()
+            raise
+
+    @property
+    def watched(self) -> int:
+        return len(self._wd)
+
+    def _add(self, d: Path) -> None:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(str(d)), _MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err == errno.ENOSPC:
+                raise OSError(err, '监视数量达到 fs.inotify.max_user_watches 上限')
+            return  # 目录已被删除等：忽略
+        self._wd[wd] = d
+
+    def _add_tree(self, d: Path) -> None:
+        for sub in _subdirs(d):
+            self._add(sub)
+
+    def _read(self) -> bytes:
+        chunks: List[bytes] = []
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            if not data:
+                break
+            chunks.append(data)
+        return b''.join(chunks)
+
+    def poll(self, timeout: Optional[float]) -> Set[Path]:
+        """等待至多 timeout 秒（None 为一直等待），返回期间变化的路径；无事件时为空集。"""
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return set()
+        data = self._read()
+        changed: Set[Path] = set()
+        pos = 0
+        while pos + _EVENT.size <= len(data):
+            wd, mask, _cookie, length = _EVENT.unpack_from(data, pos)
+            raw = data[pos + _EVENT.size:pos + _EVENT.size + length]
+            pos += _EVENT.size + length
+            name = os.fsdecode(raw.split(b'\0', 1)[0])
+            if mask & IN_Q_OVERFLOW:
+                # 事件队列溢出：无法确定具体文件，报告全部监视根（调用方本就会核对清单）
+                changed.update(self._wd.values())
+                continue
+            base = self._wd.get(wd)
+            if base is None:
+                continue
+            if mask & IN_IGNORED:
+                self._wd.pop(wd, None)
+                continue
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                changed.add(base)
+                continue
+            p = base / name if name else base
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self._add_tree(p)  # 新目录中可能已有文件（如整目录移入）
+                changed.add(p)
+            elif name.endswith('.md'):
+                changed.add(p)
+        return changed
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class PollingWatcher:
+    """按间隔比较 `*.md` 的 (size, mtime_ns) 快照。"""
+
+    kind = 'poll'
+
+    def __init__(self, dirs: Iterable[Path], interval: float = 1.0) -> None:
+        self.dirs = [d for d in dirs]
+        self.interval = max(0.05, float(interval))
+        self._snap = self._snapshot()
+
+    @property
+    def watched(self) -> int:
+        return len(self._snap)
+
+    def _snapshot(self) -> Dict[Path, Tuple[int, int]]:
+        snap: Dict[Path, Tuple[int, int]] = {}
+        stack = [d for d in self.dirs if d.is_dir()]
+        while stack:
+            d = stack.pop()
+            try:
+                with os.scandir(d) as it:
+                    for de in it:
+                        try:
+                            if de.is_dir(follow_symlinks=False):
+                                stack.append(Path(de.path))
+                            elif de.name.endswith('.md') and de.is_file():
+                                st = de.stat()
+                                snap[Path(de.path)] = (st.st_size, st.st_mtime_ns)
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+        return snap
+
+    def poll(self, timeout: Optional[float]) -> Set[Path]:
+        deadline = None if timeout is None else time.monotonic() + max(0.0, timeout)
+        while True:
+            wait = self.interval if deadline is None else min(self.interval, max(0.0, deadline - time.monotonic()))
+            time.sleep(wait)
+            snap = self._snapshot()
+            old = self._snap
+            self._snap = snap
+            changed = {p for p in snap.keys() | old.keys() if snap.get(p) != old.get(p)}
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+    def close(self) -> None:
+        pass
+
+
+def open_watcher(dirs: Iterable[Path], mode: str = 'auto', poll_interval: float = 1.0):
+    """mode='auto' 时 Linux 优先 inotify、失败回退轮询；'inotify' 不可用时抛出 OSError；'poll' 总是轮询。"""
+    dirs = list(dirs)
+    if mode not in WATCH_MODES:
+        raise ValueError(f"未知监视方式：{mode}（可选：{'/'.join(WATCH_MODES)}）")
+    if mode in ('auto', 'inotify') and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(dirs)
+        except OSError:
+            if mode == 'inotify':
+                raise
+    elif mode == 'inotify':
+        raise OSError(errno.ENOSYS, 'inotify 仅在 Linux 上可用')
+    return PollingWatcher(dirs, interval=poll_interval)
+
+
+def wait_for_changes(watcher, quiet: float = 0.2, max_delay: float = 2.0) -> Set[Path]:
+    """阻塞至有变化，再去抖：直到静默 quiet 秒或自首个事件起累计 max_delay 秒。"""
+    changed: Set[Path] = set()
+    while not changed:
+        changed |= watcher.poll(None)
+    first = time.monotonic()
+    while True:
+        remaining = max_delay - (time.monotonic() - first)
+        if remaining <= 0:
+            break
+        more = watcher.poll(min(quiet, remaining))
+        if not more:
+            break
+        changed |= more
+    return changed
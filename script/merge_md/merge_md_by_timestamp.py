@@ -22,6 +22,64 @@ Optional Gemini compression summary:
   compress the merged content into a concise Chinese summary (<= max_chars,
   default 500). Model alias 'flash2.5' maps to 'gemini-2.5-flash'.
 - Env override: if env var 'GEMINI_MODEL' is set, it overrides the model alias.
+- Provider: 'compression.provider' selects gemini / fake / http (offline
+  stand-ins in script/llm_providers.py); env var 'LLM_PROVIDER' overrides it.
+- Concurrency: 'compression.concurrency' requests run in a thread pool, throttled
+  by a token bucket ('compression.rate_limit': requests/minute, tokens/minute).
+  Results are committed in timestamp order, so outputs stay deterministic.
+- Retries: request errors are classified (empty, rate_limit, quota, server,
+  network, bad_request, auth); retryable ones back off with full jitter or
+  honour retry-after ('compression.retry'). A circuit breaker persisted in
+  '<script_basename>.breaker.json' pauses all requests after repeated
+  failures ('compression.circuit_breaker'); see retry_policy.py.
+- Incremental: with 'compression.incremental', documents of at least
+  'min_tokens' keep per-section fingerprints and their last summary in
+  '<script_basename>.delta_base.json'. When such a document changes by no
+  more than 'max_diff_ratio' of its tokens, only the old summary, removed
+  headings and changed sections are sent and the model updates the summary;
+  every 'max_chain' updates a full re-summary is forced (delta_summary.py).
+- Hedging: with 'compression.hedging', a request still outstanding after the
+  'percentile' of recent latencies gets one duplicate and the first answer
+  wins. Hedges stay within 'max_extra_percent' of requests, count against
+  'max_requests_per_run' and the rate limit; the metrics report the hedge
+  rate and the p99 with and without hedging (request_hedger.py).
+- Watch: '--watch' stays resident after the first run and re-runs on source
+  changes (inotify via ctypes on Linux, polling elsewhere; debounced, see
+  md_watcher.py). Unchanged documents are served from the in-memory entry
+  index, so only edited files are reread and the full merge is updated within
+  tens of milliseconds; only changed entries reach the LLM.
+- Memory: entries carry metadata only (__slots__); document text is read on
+  demand, one file at a time, by each stage (dedupe signatures, full merge,
+  Markdown, summaries) and dropped right after, so peak memory does not grow
+  with the corpus. Per-directory listings are already in timestamp order and
+  are combined with heapq.merge instead of a global sort.
+- Metrics: each run writes '<script_basename>.metrics.json' with monotonic
+  per-stage timings (scan/read/write_all/resume/summarize/compact, rate-limit
+  and retry waits), counters (requests, retries, exclusions, cache hits) and
+  latency histograms with p50/p95/p99; '--trace' adds a Chrome trace-event
+  file (see run_metrics.py).
+- Formats: '--format' writes the full merge as json (default), jsonl,
+  jsonl.gz, jsonl.zst (needs zstandard) or length-prefixed msgpack frames
+  (needs msgpack); see record_formats.py and bench_formats.py.
+- Random access: the full merge (and each shard) gets a '<data file>.idx.json'
+  sidecar of (path, ts, byte offset, length) unless the format is compressed;
+  merged_reader.MergedReader reads single records or ts ranges through mmap
+  without parsing the whole file.
+- Sharding: with 'sharding.enabled', the full merge is written as time shards
+  (by UTC month or by max bytes) under '<script_basename>_all/' with a
+  'manifest.json'; only shards whose documents changed are rewritten.
+- Time window: '--since/--until' (UNIX seconds or ISO date/time) select files
+  from a persisted sorted timestamp index (script/ts_index.py) by bisect; files
+  outside the window are never opened. Windowed runs write to
+  '<script_basename>_<since>-<until>.*' so full outputs stay untouched.
+- Near-duplicates: with 'dedupe.enabled', copies whose estimated Jaccard
+  similarity to an earlier entry reaches 'dedupe.threshold' reuse that entry's
+  summary (MinHash-LSH, see near_dup.py); 'dedupe.collapse_markdown' folds them
+  into the representative's section.
+- Fallback: entries without a model summary (compression disabled, request
+  failed or not requested) get an offline extractive summary (TextRank over
+  sentences, see extractive.py); 'compression.fallback' = "truncate" restores
+  plain truncation.
 - Principles (configurable via 'compression.principles'):
   - 信息无损（不遗漏关键事实与结论，不引入新信息）
   - 不重复（合并同类项，去除赘述）
@@ -33,22 +91,65 @@ Optional Gemini compression summary:
 from __future__ import annotations
 
 import argparse
+import hashlib
+import heapq
 import json
 import os
 import re
+import signal
 import sys
 import time
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Iterable, List, Optional, Tuple, Dict, Any
+from typing import Iterable, Iterator, List, Optional, Tuple, Dict, Any, Callable
 import logging
 import contextlib
 import io
+import mmap
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from rate_limiter import TokenBucket, estimate_tokens
+from summary_cache import SummaryCache, make_summary_key, sha256_text
+from scan_manifest import ScanManifest
+from stream_writers import write_json_streaming, write_lines
+from summary_journal import SummaryJournal
+from md_chunker import chunk_markdown
+from topic_guard import CLEAR as GUARD_CLEAR, EXCLUDE as GUARD_EXCLUDE, GuardVerdict, TopicGuard
+from extractive import extractive_summary
+from near_dup import NearDupIndex
+from delta_summary import DeltaBase, SectionDiff, plan_update, split_sections
+from shard_writer import ShardedWriter
+from merged_reader import index_path_for, write_index
+from run_metrics import RunMetrics
+from md_watcher import WATCH_MODES, open_watcher, wait_for_changes
+from retry_policy import (
+    RETRYABLE_KINDS, FATAL_KINDS, CAP_KIND, CircuitOpenError, ErrorInfo, RetryPolicy, classify_error, error_kind,
+    error_text,
+)
+from record_formats import FORMATS, INDEXED_FORMATS, missing_dependency, record_encoding, write_records
+
+# 共享的 LLM 提供方位于上级目录 script/
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from llm_providers import LLMProvider, ProviderUnavailable, get_provider  # noqa: E402
+from ts_index import TimestampIndex, parse_time_bound  # noqa: E402
+from request_hedger import HedgedProvider  # noqa: E402
 
 
 TIMESTAMP_BASENAME_RE = re.compile(r"^(?P<ts>\d{10})_.+\.md$")
 
+NO_TEXT_ERROR = 'Gemini 无返回文本'
+MAX_RETRY = 5
+DEFAULT_CHUNK_TOKENS = 60000  # 单次请求正文的 token 预算（离线估算）
+FALLBACK_MODES = ('extractive', 'truncate')
+# 摘要/分块/判定缓存在提交阶段按批落盘（每次为整文件重写）：每提交 N 项或每隔 T 秒一次，退出时必定落盘
+CACHE_FLUSH_ENTRIES = 100
+CACHE_FLUSH_SECONDS = 30.0
+METRICS = RunMetrics()  # 本次运行的阶段计时/计数器/延迟直方图（main 开始时重置，结束时写出）
+DEFAULT_RETRY = RetryPolicy(max_retries=MAX_RETRY)  # 未传入重试策略时使用（不启用熔断）
+
 
 def _supports_color() -> bool:
     try:
@@ -69,13 +170,66 @@ def _debug_print(msg: str, color: str = '36') -> None:
         print(msg)
 
 
-@dataclass
+class SourceChangedError(OSError):
+    """源文件在解析之后被修改：重读字节的 sha256 与解析时记录的不符。"""
+
+
 class Entry:
-    ts: int
-    path: Path  # absolute path
-    rel: Path   # relative to repo root
-    name: str   # basename
-    content: str
+    """单篇源文档的元数据；正文默认不常驻内存，每次访问 `content` 时从源文件读取。
+
+    各阶段逐篇取用正文、用后即弃，峰值内存与语料规模无关；`pin()` 令正文常驻（--watch 的条目索引）。
+    重读时核对 sha256：文件在运行中被修改则抛出 SourceChangedError，被删除则抛出 FileNotFoundError
+    （均为 OSError），各阶段据此跳过该条目，保证完整 JSON、Markdown 与摘要所用的正文与记录的哈希一致。
+    """
+
+    __slots__ = ('ts', 'path', 'rel', 'name', 'sha256', '_content')
+
+    def __init__(
+        self,
+        ts: int,
+        path: Path,  # absolute path
+        rel: Path,   # relative to repo root
+        name: str,   # basename
+        content: Optional[str] = None,
+        sha256: Optional[str] = None,  # 源文件原始字节的 sha256（本次读取时计算，或取自扫描清单）
+    ) -> None:
+        self.ts = ts
+        self.path = path
+        self.rel = rel
+        self.name = name
+        self.sha256 = sha256
+        self._content = content
+
+    @property
+    def content(self) -> str:
+        if self._content is not None:
+            return self._content
+        text, sha = read_text_once(self.path)
+        if self.sha256 is not None and sha != self.sha256:
+            raise SourceChangedError(f"源文件在本次运行中已被修改：{self.rel.as_posix()}")
+        return text
+
+    @property
+    def pinned(self) -> bool:
+        return self._content is not None
+
+    def pin(self, content: Optional[str] = None) -> None:
+        """令正文常驻；未给出 content 时立即读取一次。已常驻时不变。"""
+        if self._content is None:
+            self._content = content if content is not None else self.content
+
+    def __repr__(self) -> str:
+        return f"Entry(ts={self.ts}, rel={self.rel.as_posix()!r}, pinned={self.pinned})"
+
+
+def _read_entry(e: Entry, stage: str) -> Optional[str]:
+    """读取条目正文；源文件已被删除或修改时告警并返回 None，由调用方跳过该条目。"""
+    try:
+        return e.content
+    except OSError as ex:
+        METRICS.count('read.skipped')
+        _debug_print(f"[跳过] {stage}：{e.rel.as_posix()}（{ex}）", '33')
+        return None
 
 
 def load_config(config_path: Path) -> dict:
@@ -92,8 +246,75 @@ def iter_md_files(dirs: Iterable[Path]) -> Iterable[Path]:
         yield from d.rglob('*.md')
 
 
-def parse_entries(repo_root: Path, files: Iterable[Path]) -> List[Entry]:
-    entries: List[Entry] = []
+MMAP_THRESHOLD = 4 * 1024 * 1024  # 大于该字节数的文件经 mmap 读取，避免额外复制
+
+
+def read_text_once(p: Path) -> Tuple[str, str]:
+    """一次性读取原始字节并解码为文本；返回 (正文, 原始字节 sha256)。
+
+    解码失败时在同一份字节上以 errors='replace' 回退，不重复读取；
+    换行按 `Path.read_text` 的通用换行规则归一化为 LF。
+    """
+    with p.open('rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size >= MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                sha = hashlib.sha256(mm).hexdigest()
+                try:
+                    text = str(mm, 'utf-8')
+                except UnicodeDecodeError:
+                    text = str(mm, 'utf-8', 'replace')
+        else:
+            raw = f.read()
+            sha = hashlib.sha256(raw).hexdigest()
+            try:
+                text = raw.decode('utf-8')
+            except UnicodeDecodeError:
+                # Fallback: decode the same bytes with errors replaced to avoid aborting.
+                text = raw.decode('utf-8', errors='replace')
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text, sha
+
+
+def _prefetch(fn: Callable[[Any], Any], items: Iterable[Any], workers: int, depth: int = 0) -> Iterator[Any]:
+    """按 items 顺序产出 fn(item)；线程池中在途至多 depth 项（默认 2×workers），内存只随 depth 增长。"""
+    if workers <= 1:
+        yield from map(fn, items)
+        return
+    depth = depth if depth > 0 else 2 * workers
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        inflight: deque = deque()
+        for item in items:
+            inflight.append(pool.submit(fn, item))
+            if len(inflight) >= depth:
+                yield inflight.popleft().result()
+        while inflight:
+            yield inflight.popleft().result()
+
+
+def _entry_order(e: Entry) -> Tuple[int, str]:
+    return e.ts, str(e.rel)
+
+
+def parse_entries(
+    repo_root: Path,
+    files: Iterable[Path],
+    known: Optional[Dict[str, str]] = None,
+    workers: int = 0,
+    near_dup: Optional[NearDupIndex] = None,
+    keep_content: bool = False,
+) -> List[Entry]:
+    """将匹配文件整理为按时间戳升序的 Entry 列表；Entry 只含元数据，正文按需读取（见 Entry）。
+
+    同一目录内的文件名（时间戳前缀）本已有序：按目录分组后以 heapq.merge 逐个归并，不做全局排序。
+    known 若提供（相对路径 -> 源文件 sha256，即扫描清单中 size/mtime 未变的文件），命中的文件不读取；
+    其余文件由线程池按序预读（在途至多 2×workers 篇；workers <= 0 时按 CPU 数自动选择），
+    只用于计算 sha256 与 near_dup 签名，随即释放正文；keep_content=True 时正文常驻于 Entry。
+    near_dup 若提供，以全部条目更新近似重复索引（sha256 未变的条目复用已存签名，不读正文）。
+    """
+    root = repo_root.resolve()
+    by_dir: Dict[Path, List[Entry]] = {}
     for p in files:
         name = p.name
         m = TIMESTAMP_BASENAME_RE.match(name)
@@ -103,19 +324,36 @@ def parse_entries(repo_root: Path, files: Iterable[Path]) -> List[Entry]:
             ts = int(m.group('ts'))
         except Exception:
             continue
-        try:
-            content = p.read_text(encoding='utf-8')
-        except UnicodeDecodeError:
-            # Fallback: try utf-8 with errors replaced to avoid aborting.
-            content = p.read_text(encoding='utf-8', errors='replace')
-        entries.append(Entry(
-            ts=ts,
-            path=p.resolve(),
-            rel=p.resolve().relative_to(repo_root.resolve()),
-            name=name,
-            content=content,
-        ))
-    entries.sort(key=lambda e: (e.ts, str(e.rel)))
+        rp = p.resolve()
+        rel = rp.relative_to(root)
+        sha = known.get(rel.as_posix()) if known is not None else None
+        by_dir.setdefault(rp.parent, []).append(Entry(ts=ts, path=rp, rel=rel, name=name, sha256=sha))
+    for group in by_dir.values():
+        group.sort(key=_entry_order)  # 目录列表已按名称排序时为线性时间
+    entries = list(heapq.merge(*by_dir.values(), key=_entry_order))
+
+    todo = [e for e in entries if e.sha256 is None]
+    n_workers = workers if workers > 0 else min(32, (os.cpu_count() or 1) + 4)
+    loaded = _prefetch(read_text_once, (e.path for e in todo), n_workers if len(todo) > 1 else 1)
+
+    def _docs() -> Iterator[Tuple[str, str, Callable[[], str]]]:
+        pending = iter(todo)
+        nxt = next(pending, None)
+        for e in entries:
+            if e is nxt:
+                text, e.sha256 = next(loaded)
+                if keep_content:
+                    e.pin(text)
+                nxt = next(pending, None)
+                yield e.rel.as_posix(), e.sha256, (lambda t=text: t)
+            else:
+                yield e.rel.as_posix(), e.sha256, (lambda e=e: _read_entry(e, '近似重复签名') or '')
+
+    if near_dup is not None:
+        near_dup.update_hashed(_docs())
+    else:
+        for _ in _docs():
+            pass
     return entries
 
 
@@ -123,28 +361,72 @@ def ensure_out_dir(out_dir: Path) -> None:
     out_dir.mkdir(parents=True, exist_ok=True)
 
 
-def write_json(out_path: Path, entries: List[Entry], source_dirs: List[str], compression: Optional[dict] = None) -> None:
-    payload = {
-        'generated_at': datetime.now(timezone.utc).isoformat(),
-        'source_dirs': source_dirs,
-        'total_files': len(entries),
-        'files': [
-            {
-                'path': str(e.rel).replace('\\', '/'),
-                'filename': e.name,
-                'timestamp': e.ts,
-                'datetime_utc': datetime.fromtimestamp(e.ts, tz=timezone.utc).isoformat(),
-                'content': e.content,
-            }
-            for e in entries
-        ],
+def _all_record(e: Entry, content: str) -> Dict[str, Any]:
+    return {
+        'path': str(e.rel).replace('\\', '/'),
+        'filename': e.name,
+        'timestamp': e.ts,
+        'datetime_utc': datetime.fromtimestamp(e.ts, tz=timezone.utc).isoformat(),
+        'content': content,
     }
-    if compression is not None:
-        payload['compression'] = compression
-    # 保证 LF 换行
-    with out_path.open('w', encoding='utf-8', newline='\n') as f:
-        json.dump(payload, f, ensure_ascii=False, indent=2)
-        f.write('\n')  # newline at EOF
+
+
+def _load_all_record(e: Entry) -> Optional[Dict[str, Any]]:
+    content = _read_entry(e, '完整 JSON')
+    return _all_record(e, content) if content is not None else None
+
+
+def _all_stub(e: Entry) -> Dict[str, Any]:
+    # 分片划分与内容指纹所需的轻量记录（不含正文，见 ShardedWriter.write）
+    try:
+        size = e.path.stat().st_size
+    except OSError:
+        size = 0
+    return {'path': e.rel.as_posix(), 'timestamp': e.ts, 'sha256': e.sha256, 'bytes': size}
+
+
+def write_json(
+    out_path: Path,
+    entries: List[Entry],
+    source_dirs: List[str],
+    compression: Optional[dict] = None,
+    fmt: str = 'json',
+) -> int:
+    """逐条流式写出完整合并结果（含全文）；未压缩格式同时写出按字节偏移随机读取的旁路索引（见 merged_reader.py）。
+
+    fmt='json' 与既往 `json.dump(indent=2)` 输出逐字节一致；其余格式见 record_formats.py。
+    返回实际写出的篇数：源文件在运行中被删除或修改的条目跳过，头部 `total_files` 与之一致。
+    """
+    tail: List[Tuple[str, Any]] = [('compression', compression)] if compression is not None else []
+    todo = entries
+    while True:
+        head: List[Tuple[str, Any]] = [
+            ('generated_at', datetime.now(timezone.utc).isoformat()),
+            ('source_dirs', source_dirs),
+            ('total_files', len(todo)),
+        ]
+        written: List[Entry] = []  # 实际写出的条目，与 spans 一一对应
+
+        def _records() -> Iterator[Dict[str, Any]]:
+            for e in todo:
+                rec = _load_all_record(e)
+                if rec is not None:
+                    written.append(e)
+                    yield rec
+
+        spans: List[Tuple[int, int]] = []
+        # 二进制写出（UTF-8 + LF），同时累计每条记录的字节区间
+        with out_path.open('wb') as raw:
+            n = write_records(raw, fmt, head, _records(), tail, spans=spans)
+        if len(written) == len(todo):
+            break
+        # 头部先于记录写出：有条目被跳过时按实际可读的条目重写一次，使 total_files 与内容一致（罕见）
+        todo = written
+    if fmt in INDEXED_FORMATS:
+        write_index(out_path, [(e.rel.as_posix(), e.ts) for e in written], spans, n, encoding=record_encoding(fmt))
+    else:
+        index_path_for(out_path).unlink(missing_ok=True)
+    return len(written)
 
 
 def write_json_summaries(
@@ -153,52 +435,55 @@ def write_json_summaries(
     source_dirs: List[str],
     compression: Optional[dict] = None,
 ) -> None:
-    payload = {
-        'generated_at': datetime.now(timezone.utc).isoformat(),
-        'source_dirs': source_dirs,
-        'total_files': len(summaries),
-        'files': summaries,
-    }
-    if compression is not None:
-        payload['compression'] = compression
+    head: List[Tuple[str, Any]] = [
+        ('generated_at', datetime.now(timezone.utc).isoformat()),
+        ('source_dirs', source_dirs),
+        ('total_files', len(summaries)),
+    ]
+    tail: List[Tuple[str, Any]] = [('compression', compression)] if compression is not None else []
     with out_path.open('w', encoding='utf-8', newline='\n') as f:
-        json.dump(payload, f, ensure_ascii=False, indent=2)
+        write_json_streaming(f, head, 'files', summaries, tail)
         f.write('\n')
 
 
-def build_markdown_text(entries: List[Entry], title: Optional[str] = None) -> str:
+def iter_markdown_lines(entries: List[Entry], title: Optional[str] = None) -> Iterator[str]:
+    """逐行产出合并 Markdown（行间以 LF 连接即为完整文本）。"""
     if title is None:
         title = '按时间戳合并的 Markdown 文档'
-    lines: List[str] = []
     total = len(entries)
-    lines.append(f"# {title}")
-    lines.append("")
-    lines.append(f"生成时间（UTC）：{datetime.now(timezone.utc).isoformat()}")
-    lines.append(f"合计文件：{total}")
-    lines.append("")
+    yield f"# {title}"
+    yield ""
+    yield f"生成时间（UTC）：{datetime.now(timezone.utc).isoformat()}"
+    yield f"合计文件：{total}"
+    yield ""
     for idx, e in enumerate(entries, start=1):
+        text = _read_entry(e, 'Markdown')  # 按需读取，逐篇产出后即释放
+        if text is None:
+            continue
         dt_utc = datetime.fromtimestamp(e.ts, tz=timezone.utc).isoformat()
-        lines.append('---')
-        lines.append("")
-        lines.append(f"## [{idx}/{total}] {e.name}")
-        lines.append("")
+        yield '---'
+        yield ""
+        yield f"## [{idx}/{total}] {e.name}"
+        yield ""
         rel_posix = e.rel.as_posix()
-        lines.append(f"- 源路径：`{rel_posix}`")
-        lines.append(f"- 时间戳：`{e.ts}`；UTC：`{dt_utc}`")
-        lines.append("")
-        if e.content and not e.content.endswith('\n'):
-            lines.append(e.content + '\n')
+        yield f"- 源路径：`{rel_posix}`"
+        yield f"- 时间戳：`{e.ts}`；UTC：`{dt_utc}`"
+        yield ""
+        if text and not text.endswith('\n'):
+            yield text + '\n'
         else:
-            lines.append(e.content)
+            yield text
         # 控制台同步输出进度：x/总数 + 文件名
         _debug_print(f"[进度] {idx}/{total}：{e.name}", '36')
-    return '\n'.join(lines)
+
+
+def build_markdown_text(entries: List[Entry], title: Optional[str] = None) -> str:
+    return '\n'.join(iter_markdown_lines(entries, title))
 
 
 def write_markdown(out_path: Path, entries: List[Entry], title: Optional[str] = None) -> None:
-    text = build_markdown_text(entries, title)
     with out_path.open('w', encoding='utf-8', newline='\n') as f:
-        f.write(text)
+        write_lines(f, iter_markdown_lines(entries, title))
 
 
 def _gemini_model_from_alias(alias: str) -> str:
@@ -212,8 +497,17 @@ def _gemini_model_from_alias(alias: str) -> str:
     return mapping.get(alias, alias or 'gemini-2.5-flash')
 
 
+_LOGS_QUIETED = False
+_WARM_LOCK = threading.Lock()
+_WARMED: set = set()  # 已完成首个请求（底层连接已建立）的提供方 id
+
+
 def _quiet_gemini_logs() -> None:
-    """尽量抑制 google-generativeai/grpc/absl 的噪声日志（跨平台最佳努力）。"""
+    """尽量抑制 google-generativeai/grpc/absl 的噪声日志（跨平台最佳努力；每进程一次）。"""
+    global _LOGS_QUIETED
+    if _LOGS_QUIETED:
+        return
+    _LOGS_QUIETED = True
     # 环境变量（仅在未设置时提供较严的默认）
     os.environ.setdefault('GLOG_minloglevel', '3')  # 仅 FATAL
     os.environ.setdefault('GRPC_VERBOSITY', 'ERROR')
@@ -228,28 +522,116 @@ def _quiet_gemini_logs() -> None:
 
 @contextlib.contextmanager
 def _suppress_stderr_fd():
-    """在 with 区块内暂时重定向底层 fd=2 到空设备，抑制 C/C++ 层日志。"""
+    """在 with 区块内暂时重定向底层 fd=2 到空设备，抑制 C/C++ 层日志；区块内的异常照常抛出。"""
+    orig_fd: Optional[int] = None
     try:
         orig_fd = os.dup(2)
         devnull = os.open(os.devnull, os.O_WRONLY)
         os.dup2(devnull, 2)
         os.close(devnull)
-        yield
     except Exception:
         # 若重定向失败，直接执行，不中断流程
+        pass
+    try:
         yield
     finally:
         try:
-            if 'orig_fd' in locals():
+            if orig_fd is not None:
                 os.dup2(orig_fd, 2)
                 os.close(orig_fd)
         except Exception:
             pass
 
+
+def _llm_generate(llm: LLMProvider, prompt: str, model_name: str) -> Optional[str]:
+    """经共享会话发起请求。
+
+    C/C++ 层（grpc/absl）的噪声日志只在建立连接时输出，因此仅对每个提供方的首个请求
+    重定向 fd=2（加锁串行）；此后请求直接发出，不再 dup 文件描述符，也避免并发线程互相还原 fd。
+    """
+    start = time.perf_counter()
+    out: Optional[str] = None
+    try:
+        if id(llm) not in _WARMED:
+            with _WARM_LOCK:
+                if id(llm) not in _WARMED:
+                    try:
+                        with _suppress_stderr_fd():
+                            out = llm.generate(prompt, model_name)
+                    finally:
+                        _WARMED.add(id(llm))  # 首个请求失败也已建立过连接
+                    return out
+        out = llm.generate(prompt, model_name)
+        return out
+    finally:
+        METRICS.observe('llm_latency_s', METRICS.add_time('llm.generate', start, cat='llm'))
+        METRICS.count('llm.calls')
+        if not out:
+            METRICS.count('llm.no_text')  # 异常或空返回
+
+
+def _request(
+    llm: LLMProvider,
+    prompt: str,
+    model_name: str,
+    rate_limiter: Optional[TokenBucket] = None,
+    retry: Optional[RetryPolicy] = None,
+) -> Tuple[Optional[str], Optional[ErrorInfo]]:
+    """一次逻辑请求：熔断检查 → 请求额度 → 限速 → 调用；可重试的错误按全抖动指数退避重试（遵循服务端 retry-after）。
+
+    每次实际调用（含重试）各占一次 `policy.budget` 额度。
+    返回 (去除首尾空白的文本, None) 或 (None, 最后一次的错误)；熔断等待超出上限时错误类型为 circuit_open，
+    额度用尽（请求未发出）时为 request_cap。
+    """
+    policy = retry or DEFAULT_RETRY
+    attempt = 0
+    while True:
+        try:
+            policy.breaker.before_request()
+        except CircuitOpenError as ex:
+            METRICS.count('llm.error.circuit_open')
+            return None, ErrorInfo('circuit_open', str(ex), ex.wait)
+        if not policy.budget.try_take():
+            METRICS.count('llm.error.request_cap')
+            return None, ErrorInfo(CAP_KIND, f"已达到每次运行请求上限：{policy.budget.limit}")
+        if rate_limiter is not None:
+            _throttle(rate_limiter, prompt)
+        try:
+            out = _llm_generate(llm, prompt, model_name)
+            err = None if out and out.strip() else classify_error(None)
+        except Exception as ex:
+            out, err = None, classify_error(ex)
+        if err is None:
+            policy.breaker.record_success()
+            return out.strip(), None
+        policy.breaker.record_failure(err)
+        METRICS.count(f'llm.error.{err.kind}')
+        if not err.retryable or attempt >= policy.max_retries:
+            return None, err
+        # 熔断打开或全局暂停时由 before_request 统一等待，不再叠加本线程的退避
+        delay = 0.0 if policy.breaker.is_open() else policy.delay(attempt, err)
+        attempt += 1
+        METRICS.count('llm.retries')
+        _debug_print(f"[Gemini] {error_text(err)[:80]}；{delay:.1f}s 后重试（{attempt}/{policy.max_retries}）…", '33')
+        if delay > 0:
+            with METRICS.stage('retry.sleep', cat='wait'):
+                time.sleep(delay)
+
+
+def _throttle(rate_limiter: TokenBucket, prompt: str) -> None:
+    """按离线 token 估算取得限速额度；实际等待计入指标。"""
+    start = time.perf_counter()
+    waited = rate_limiter.acquire(estimate_tokens(prompt))
+    if waited > 0:
+        METRICS.add_time('rate_limit.wait', start, cat='wait')
+        METRICS.observe('rate_limit_wait_s', waited)
+
+
 def run_gemini_topic_check(
     text: str,
     model_alias: str,
     blocked_topics: List[str],
+    provider: Optional[LLMProvider] = None,
 ) -> Tuple[bool, Optional[Dict[str, Any]], Optional[str]]:
     """使用 Gemini 对文本进行主题检测：是否涉及任一 `blocked_topics`。
 
@@ -257,19 +639,15 @@ def run_gemini_topic_check(
     - ok=True 时，result 形如 {"hit": bool, "matched": [...], "reason": str}
     - 若无可用 API/依赖，返回 (False, None, 错误信息)
     """
-    api_key = os.environ.get('GEMINI_API_KEY') or os.environ.get('GOOGLE_API_KEY')
-    if not api_key:
-        return False, None, '未检测到 GEMINI_API_KEY/GOOGLE_API_KEY 环境变量'
+    llm = provider or get_provider()
     try:
         _quiet_gemini_logs()
-        import google.generativeai as genai  # type: ignore
-    except Exception as e:
-        return False, None, f'缺少 google-generativeai 依赖：{e!s}'
+        llm.ensure_ready()
+    except ProviderUnavailable as e:
+        return False, None, str(e)
 
     try:
-        genai.configure(api_key=api_key)
         model_name = _gemini_model_from_alias(model_alias)
-        model = genai.GenerativeModel(model_name)
 
         topics_str = '、'.join(blocked_topics)
         sys_prompt = (
@@ -283,19 +661,9 @@ def run_gemini_topic_check(
             "【文本】\n"
         )
 
-        with _suppress_stderr_fd():
-            resp = model.generate_content(sys_prompt + text)
-        out = getattr(resp, 'text', None)
-        if not out and hasattr(resp, 'candidates') and resp.candidates:
-            parts = []
-            for c in resp.candidates:
-                try:
-                    parts.append(c.content.parts[0].text)
-                except Exception:
-                    continue
-            out = '\n'.join([p for p in parts if p])
+        out = _llm_generate(llm, sys_prompt + text, model_name)
         if not out:
-            return False, None, 'Gemini 无返回文本'
+            return False, None, NO_TEXT_ERROR
         s = out.strip()
         j = None
         try:
@@ -321,6 +689,30 @@ def run_gemini_topic_check(
         return False, None, f'Gemini 异常：{e!s}'
 
 
+def _parse_exclusion(s: str) -> Optional[Dict[str, Any]]:
+    """模型按排除规则返回的 JSON（`{"excluded": true, …}`）解析为排除 dict；不是排除结论时返回 None。"""
+    try:
+        j = json.loads(s)
+    except Exception:
+        try:
+            start = s.find('{')
+            end = s.rfind('}')
+            if start != -1 and end != -1 and end > start:
+                j = json.loads(s[start:end+1])
+            else:
+                return None
+        except Exception:
+            return None
+    if isinstance(j, dict) and bool(j.get('excluded')):
+        matched = j.get('matched')
+        if not isinstance(matched, list):
+            matched = []
+        matched = [str(x).strip() for x in matched if str(x).strip()]
+        reason = str(j.get('reason') or '').strip()
+        return {'excluded': True, 'matched': matched, 'reason': reason}
+    return None
+
+
 def run_gemini_summary(
     text: str,
     model_alias: str,
@@ -329,73 +721,56 @@ def run_gemini_summary(
     on_progress: Optional[callable] = None,
     principles: Optional[List[str]] = None,
     blocked_topics: Optional[List[str]] = None,
+    rate_limiter: Optional[TokenBucket] = None,
+    chunk_tokens: int = DEFAULT_CHUNK_TOKENS,
+    reduce_fan_in: int = 8,
+    map_workers: int = 4,
+    digest_cache: Optional[SummaryCache] = None,
+    provider: Optional[LLMProvider] = None,
+    retry: Optional[RetryPolicy] = None,
 ) -> Tuple[bool, Optional[Any], Optional[str]]:
-    """调用 Gemini 压缩文本；当文本过长时分块请求后再二次汇总，尽量信息无损。
+    """调用 Gemini 压缩文本；当文本过长时分块请求后再树形归并汇总，尽量信息无损。
+
+    分块按 Markdown 结构（标题/段落/数学块）切分，并按 chunk_tokens 的离线 token 估算装箱；
+    分块摘要以 map_workers 路并发，再按 reduce_fan_in 逐层归并；digest_cache 若提供，则缓存每个树节点的摘要。
 
     on_progress(i, n, chunk_summary) 若提供，则在每个分块摘要完成后被调用（i 从 1 开始）。
+    rate_limiter 若提供，则每次实际发起请求前按 requests/minute 与 tokens/minute 取得额度。
+    retry 为单次请求的重试/熔断策略（见 retry_policy.py），缺省时仅按 MAX_RETRY 退避重试；
+    失败时 error 为 `retry_policy.error_text` 的结果（无返回文本仍为 NO_TEXT_ERROR）。
+    provider 缺省时按环境变量 LLM_PROVIDER 构造（默认 gemini），见 `script/llm_providers.py`。
     """
-    api_key = os.environ.get('GEMINI_API_KEY') or os.environ.get('GOOGLE_API_KEY')
-    if not api_key:
-        return False, None, '未检测到 GEMINI_API_KEY/GOOGLE_API_KEY 环境变量'
+    llm = provider or get_provider()
     try:
         _quiet_gemini_logs()
-        import google.generativeai as genai  # type: ignore
-    except Exception as e:
-        return False, None, f'缺少 google-generativeai 依赖：{e!s}'
+        llm.ensure_ready()
+    except ProviderUnavailable as e:
+        return False, None, str(e)
 
     try:
-        genai.configure(api_key=api_key)
         model_name = _gemini_model_from_alias(model_alias)
-        model = genai.GenerativeModel(model_name)
+
+        last_err: List[ErrorInfo] = []  # 最近一次（重试耗尽后）的请求错误
 
         def _call(prompt: str) -> Tuple[bool, Optional[str]]:
             if interval_sec and interval_sec > 0:
                 _debug_print(f"[Gemini] 等待 {interval_sec}s 后发起请求…", '33')
-                time.sleep(interval_sec)
+                with METRICS.stage('interval.wait', cat='wait'):
+                    time.sleep(interval_sec)
             _debug_print("[Gemini] 正在请求…", '33')
-            try:
-                with _suppress_stderr_fd():
-                    resp = model.generate_content(prompt)
-                out = getattr(resp, 'text', None)
-                if not out and hasattr(resp, 'candidates') and resp.candidates:
-                    parts = []
-                    for c in resp.candidates:
-                        try:
-                            parts.append(c.content.parts[0].text)
-                        except Exception:
-                            continue
-                    out = '\n'.join([p for p in parts if p])
-                if out:
-                    return True, out.strip()
-                return False, None
-            except Exception:
+            out, err = _request(llm, prompt, model_name, rate_limiter, retry)
+            if err is not None:
+                last_err.append(err)
                 return False, None
+            return True, out
+
+        def _failure(default: str = NO_TEXT_ERROR) -> Tuple[bool, None, str]:
+            return False, None, error_text(last_err[-1]) if last_err else default
 
-        chunk_size = 60000  # 粗略按字符长度限制输入规模
+        chunks = chunk_markdown(text, chunk_tokens)
         topics_str = '、'.join(blocked_topics) if blocked_topics else ''
 
-        def _try_parse_exclusion(s: str) -> Optional[Dict[str, Any]]:
-            try:
-                j = json.loads(s)
-            except Exception:
-                try:
-                    start = s.find('{')
-                    end = s.rfind('}')
-                    if start != -1 and end != -1 and end > start:
-                        j = json.loads(s[start:end+1])
-                    else:
-                        return None
-                except Exception:
-                    return None
-            if isinstance(j, dict) and bool(j.get('excluded')):
-                matched = j.get('matched')
-                if not isinstance(matched, list):
-                    matched = []
-                matched = [str(x).strip() for x in matched if str(x).strip()]
-                reason = str(j.get('reason') or '').strip()
-                return {'excluded': True, 'matched': matched, 'reason': reason}
-            return None
-        if len(text) <= chunk_size:
+        if len(chunks) <= 1:
             principles_lines = []
             if principles:
                 for p in principles:
@@ -428,62 +803,93 @@ def run_gemini_summary(
             if ok and out:
                 s = out.strip()
                 if blocked_topics:
-                    ex = _try_parse_exclusion(s)
+                    ex = _parse_exclusion(s)
                     if ex is not None:
                         return True, ex, None
                 return True, s, None
-            return False, None, 'Gemini 无返回文本'
-
-        # 分块摘要阶段
-        chunks = [text[i:i+chunk_size] for i in range(0, len(text), chunk_size)]
-        digests: List[str] = []
-        for i, ch in enumerate(chunks, 1):
-            _debug_print(f"[Gemini] 分块 {i}/{len(chunks)} 摘要…", '33')
-            prompt_part_lines = []
-            if principles:
-                for p in principles:
-                    p = str(p).strip()
-                    if p:
-                        prompt_part_lines.append(f"- {p}")
-            prompt_part_fixed = [
-                "- 去重、不赘述、合并同类项；",
-                "- 仅用简体中文输出，严格限制在 400 字以内；",
-                "- 术语/定义/符号前后一致，尽量符号化表达；",
-            ]
-            exclude_block2 = ''
-            if blocked_topics:
-                exclude_block2 = (
-                    '【排除规则】\n'
-                    f"- 若该部分文本涉及任一主题：{topics_str}；\n"
-                    '- 则不要摘要；仅输出严格JSON：{"excluded": true, "matched": ["<命中主题原词>"], "reason": "<=60字"}；\n'
-                    '- 仅输出上述JSON，不要包含其他文字或代码块围栏。\n\n'
-                )
-            prompt_part = (
-                '以下是合并文档的一部分。若未命中排除主题，请提炼“信息无损”的关键要点：\n\n' +
-                "\n".join(prompt_part_lines + prompt_part_fixed) +
-                "\n\n" + exclude_block2
+            return _failure()
+
+        # 分块摘要阶段（map）：各分块并发请求；每个树节点的摘要按“模型 + 完整提示”的内容哈希缓存，
+        # 文档小幅修改时只有受影响的分块及其到根的归并路径需要重新请求。
+        rules_lines = []
+        if principles:
+            for p in principles:
+                p = str(p).strip()
+                if p:
+                    rules_lines.append(f"- {p}")
+        prompt_part_fixed = [
+            "- 去重、不赘述、合并同类项；",
+            "- 仅用简体中文输出，严格限制在 400 字以内；",
+            "- 术语/定义/符号前后一致，尽量符号化表达；",
+        ]
+        exclude_block2 = ''
+        if blocked_topics:
+            exclude_block2 = (
+                '【排除规则】\n'
+                f"- 若该部分文本涉及任一主题：{topics_str}；\n"
+                '- 则不要摘要；仅输出严格JSON：{"excluded": true, "matched": ["<命中主题原词>"], "reason": "<=60字"}；\n'
+                '- 仅输出上述JSON，不要包含其他文字或代码块围栏。\n\n'
             )
-            ok, out = _call(prompt_part + ch)
+        prompt_part = (
+            '以下是合并文档的一部分。若未命中排除主题，请提炼“信息无损”的关键要点：\n\n' +
+            "\n".join(rules_lines + prompt_part_fixed) +
+            "\n\n" + exclude_block2
+        )
+        mid_prompt = (
+            '你将收到同一文档相邻部分的若干分块摘要，请合并为一段“信息无损”的中间摘要：\n\n' +
+            "\n".join(rules_lines + prompt_part_fixed) +
+            "\n\n" + exclude_block2 + '【分块摘要】\n'
+        )
+
+        def _node(prompt: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+            key_model = model_name if llm.name == 'gemini' else f"{llm.name}/{model_name}"
+            key = sha256_text(key_model + '\n' + prompt)
+            if digest_cache is not None:
+                hit = digest_cache.get(key)
+                if hit is not None:
+                    return (hit.get('digest') or ''), hit.get('excluded')
+            ok, out = _call(prompt)
             s = (out or '').strip()
-            if blocked_topics:
-                ex = _try_parse_exclusion(s)
+            ex = _parse_exclusion(s) if (blocked_topics and s) else None
+            if ok and s and digest_cache is not None:
+                digest_cache.put(key, {'model': model_name, 'digest': None if ex else s, 'excluded': ex})
+            return s, ex
+
+        fan_in = max(2, int(reduce_fan_in))
+        with ThreadPoolExecutor(max_workers=max(1, min(int(map_workers), len(chunks)))) as pool:
+            _debug_print(f"[Gemini] 分块摘要：{len(chunks)} 块（并发 {map_workers}）…", '33')
+            results = list(pool.map(_node, [prompt_part + ch for ch in chunks]))
+            digests: List[str] = []
+            for i, (s, ex) in enumerate(results, 1):
                 if ex is not None:
                     return True, ex, None
-            digests.append(s)
-            if on_progress:
-                try:
-                    on_progress(i, len(chunks), s)
-                except Exception:
-                    pass
+                digests.append(s)
+                if on_progress and s:
+                    try:
+                        on_progress(i, len(chunks), s)
+                    except Exception:
+                        pass
+
+            if last_err:
+                # 有分块重试后仍失败：不以残缺的分块摘要继续归并
+                return _failure()
+
+            # 树形归并（reduce）：每 fan_in 个相邻摘要合并为一个中间摘要，直至不超过 fan_in 个
+            level = 0
+            while len(digests) > fan_in:
+                level += 1
+                groups = ['\n'.join(digests[i:i + fan_in]) for i in range(0, len(digests), fan_in)]
+                _debug_print(f"[Gemini] 第 {level} 层归并：{len(digests)} → {len(groups)}…", '33')
+                results = list(pool.map(_node, [mid_prompt + g for g in groups]))
+                for s, ex in results:
+                    if ex is not None:
+                        return True, ex, None
+                if last_err:
+                    return _failure()
+                digests = [s for s, _ in results]
 
-        # 二次汇总到最终 <= max_chars
+        # 最终汇总到 <= max_chars
         joined = '\n'.join(digests)
-        final_rules_lines = []
-        if principles:
-            for p in principles:
-                p = str(p).strip()
-                if p:
-                    final_rules_lines.append(f"- {p}")
         final_rules_fixed = [
             f"- 仅用简体中文输出，严格限制在 {max_chars} 字以内；",
             "- 不逐条复述，合并同类项，去重；",
@@ -499,22 +905,247 @@ def run_gemini_summary(
             )
         final_prompt = (
             '你将收到若干分块摘要，请在“尽量信息无损”的前提下进行最终高度凝练：\n' +
-            "\n".join(final_rules_lines + final_rules_fixed) +
+            "\n".join(rules_lines + final_rules_fixed) +
             '\n\n' + exclude_block3 + '【分块摘要】\n'
         )
-        ok, out = _call(final_prompt + joined)
-        if ok and out:
-            s = out.strip()
-            if blocked_topics:
-                ex = _try_parse_exclusion(s)
-                if ex is not None:
-                    return True, ex, None
+        s, ex = _node(final_prompt + joined)
+        if ex is not None:
+            return True, ex, None
+        if s:
             return True, s, None
-        return False, None, 'Gemini 汇总失败'
+        return _failure('Gemini 汇总失败')
     except Exception as e:
         return False, None, f'Gemini 异常：{e!s}'
 
 
+PACK_OPEN = '<<<DOC {i}>>>'
+PACK_CLOSE = '<<<END DOC {i}>>>'
+
+
+def _parse_pack_response(s: str, n: int) -> List[Optional[Any]]:
+    """解析打包请求返回的 JSON 数组；返回长度为 n 的列表（摘要字符串 / 排除 dict / None=缺失）。"""
+    results: List[Optional[Any]] = [None] * n
+    j = None
+    try:
+        j = json.loads(s)
+    except Exception:
+        start = s.find('[')
+        end = s.rfind(']')
+        if start != -1 and end != -1 and end > start:
+            try:
+                j = json.loads(s[start:end+1])
+            except Exception:
+                j = None
+    if not isinstance(j, list):
+        return results
+    for item in j:
+        if not isinstance(item, dict):
+            continue
+        try:
+            i = int(item.get('id')) - 1
+        except Exception:
+            continue
+        if not (0 <= i < n) or results[i] is not None:
+            continue
+        if bool(item.get('excluded')):
+            matched = item.get('matched')
+            if not isinstance(matched, list):
+                matched = []
+            matched = [str(x).strip() for x in matched if str(x).strip()]
+            reason = str(item.get('reason') or '').strip()
+            results[i] = {'excluded': True, 'matched': matched, 'reason': reason}
+            continue
+        summary = str(item.get('summary') or '').strip()
+        if summary:
+            results[i] = summary
+    return results
+
+
+def run_gemini_pack_summary(
+    texts: List[str],
+    model_alias: str,
+    max_chars: int,
+    principles: Optional[List[str]] = None,
+    blocked_topics: Optional[List[str]] = None,
+    rate_limiter: Optional[TokenBucket] = None,
+    provider: Optional[LLMProvider] = None,
+    retry: Optional[RetryPolicy] = None,
+) -> Tuple[bool, Optional[List[Optional[Any]]], Optional[str]]:
+    """将多篇短文档打包为一次请求，要求模型按 JSON 数组逐篇返回摘要或排除结论。
+
+    每篇以 `<<<DOC i>>>` / `<<<END DOC i>>>` 分隔（i 从 1 开始）；返回 (ok, results, error)，
+    results[i] 为摘要字符串、排除 dict 或 None（模型遗漏/无法解析，由调用方逐篇补请求）。
+    """
+    llm = provider or get_provider()
+    try:
+        _quiet_gemini_logs()
+        llm.ensure_ready()
+    except ProviderUnavailable as e:
+        return False, None, str(e)
+
+    try:
+        model_name = _gemini_model_from_alias(model_alias)
+
+        rules_lines = []
+        if principles:
+            for p in principles:
+                p = str(p).strip()
+                if p:
+                    rules_lines.append(f"- {p}")
+        rules_lines += [
+            f"- 每篇仅用简体中文输出，严格限制在 {max_chars} 字以内；",
+            "- 各篇独立摘要，不要跨篇合并或互相引用；",
+            "- 只保留关键信息与结论，尽可能采用符号化表达，术语/符号前后一致。",
+        ]
+        if blocked_topics:
+            rules_lines.append(
+                f"- 若某篇涉及下列任一主题（命中即可）：{'、'.join(blocked_topics)}；"
+                "则该篇不要摘要，输出 excluded=true，matched 填命中主题原词，reason<=60字。"
+            )
+        fmt = (
+            '[{"id": 1, "excluded": false, "summary": "<摘要>"}, '
+            '{"id": 2, "excluded": true, "matched": ["<命中主题原词>"], "reason": "<=60字"}, …]'
+        )
+        parts = [
+            f'你将收到 {len(texts)} 篇相互独立的中文短文档，以 <<<DOC i>>> 与 <<<END DOC i>>> 分隔。请逐篇进行“信息无损”的高度凝练压缩：\n',
+            "\n".join(rules_lines),
+            f"\n\n【输出格式】仅输出严格 JSON 数组，每篇一项且 id 与分隔符编号一致：{fmt}\n",
+            '不要输出任何解释性文字或代码块围栏。\n\n【文档】\n',
+        ]
+        for i, t in enumerate(texts, 1):
+            parts.append(f"{PACK_OPEN.format(i=i)}\n{t}\n{PACK_CLOSE.format(i=i)}\n")
+        prompt = ''.join(parts)
+
+        _debug_print(f"[Gemini] 正在请求（打包 {len(texts)} 篇）…", '33')
+        out, err = _request(llm, prompt, model_name, rate_limiter, retry)
+        if err is not None:
+            return False, None, error_text(err)
+        return True, _parse_pack_response(out, len(texts)), None
+    except Exception as e:
+        return False, None, f'Gemini 异常：{e!s}'
+
+
+def run_gemini_update_summary(
+    prev_summary: str,
+    diff: SectionDiff,
+    model_alias: str,
+    max_chars: int,
+    principles: Optional[List[str]] = None,
+    blocked_topics: Optional[List[str]] = None,
+    rate_limiter: Optional[TokenBucket] = None,
+    provider: Optional[LLMProvider] = None,
+    retry: Optional[RetryPolicy] = None,
+) -> Tuple[bool, Optional[Any], Optional[str]]:
+    """增量重摘要：只发送上次的摘要、新增/修改章节的新文本与被删除章节的标题，请模型更新摘要。
+
+    返回值同 `run_gemini_summary`（摘要字符串或排除 dict）；差异的计算见 delta_summary.py。
+    """
+    llm = provider or get_provider()
+    try:
+        _quiet_gemini_logs()
+        llm.ensure_ready()
+    except ProviderUnavailable as e:
+        return False, None, str(e)
+
+    try:
+        model_name = _gemini_model_from_alias(model_alias)
+
+        rules_lines = []
+        if principles:
+            for p in principles:
+                p = str(p).strip()
+                if p:
+                    rules_lines.append(f"- {p}")
+        rules_lines += [
+            f"- 仅用简体中文输出更新后的完整摘要，严格限制在 {max_chars} 字以内；",
+            "- 未变章节对应的信息保持原样，不要改写措辞；",
+            "- 被删除章节的内容从摘要中移除；新增/修改的章节按新文本补充或修订；",
+            "- 尽可能采用符号化表达，术语/定义/符号与原摘要保持一致。",
+        ]
+        exclude_block = ''
+        if blocked_topics:
+            exclude_block = (
+                '【排除规则】\n'
+                f"- 若新增或修改的章节涉及下列任一主题（命中即可）：{'、'.join(blocked_topics)}；\n"
+                '- 则不要更新摘要；只输出严格JSON：{"excluded": true, "matched": ["<命中主题原词>"], "reason": "<=60字"}；\n'
+                '- 仅输出上述JSON，不要包含其他文字或代码块围栏。\n\n'
+            )
+        parts = [
+            '你将收到一篇中文文档此前的摘要，以及该文档此后发生变化的章节（其余章节未变）。请据此更新这份摘要：\n',
+            "\n".join(rules_lines),
+            '\n\n',
+            exclude_block,
+            f"【此前的摘要】\n{prev_summary.strip()}\n\n",
+        ]
+        if diff.removed:
+            parts.append('【已删除的章节】\n' + ''.join(f"- {h}\n" for h in diff.removed) + '\n')
+        if diff.changed:
+            parts.append('【新增或修改的章节】\n' + '\n'.join(sec.text.strip() for sec in diff.changed) + '\n')
+        prompt = ''.join(parts)
+
+        _debug_print(f"[Gemini] 正在请求（增量：{len(diff.changed)} 节变化，{len(diff.removed)} 节删除）…", '33')
+        out, err = _request(llm, prompt, model_name, rate_limiter, retry)
+        if err is not None:
+            return False, None, error_text(err)
+        if blocked_topics:
+            ex = _parse_exclusion(out)
+            if ex is not None:
+                return True, ex, None
+        return True, out, None
+    except Exception as e:
+        return False, None, f'Gemini 异常：{e!s}'
+
+
+@dataclass
+class SummaryOutcome:
+    """单篇摘要任务的结果（由工作线程产出，提交阶段按时间戳顺序消费）。"""
+    requested: bool = False
+    ok: Optional[bool] = None
+    text: Optional[str] = None
+    error: Optional[str] = None
+    excluded: Optional[Dict[str, Any]] = None
+    attempts: int = 0
+    fatal: bool = False  # 重试耗尽 / 熔断 / 鉴权失败：中断本次运行（见 retry_policy.FATAL_KINDS）
+    cached: bool = False  # 命中摘要缓存，未发起请求
+    packed: bool = False  # 由打包请求返回
+    fallback: bool = False  # 打包请求遗漏该篇 / 增量更新失败，已单独补请求完整摘要
+    incremental: Optional[Dict[str, Any]] = None  # 尝试按章节差异增量更新时的差异信息（applied 表示是否采用）
+    source_error: Optional[str] = None  # 源文件在解析后被删除或修改：跳过该条目（下次运行重新处理）
+
+
+def summarize_with_retry(
+    text: str,
+    model_alias: str,
+    max_chars: int,
+    principles: Optional[List[str]],
+    blocked_topics: Optional[List[str]],
+    rate_limiter: Optional[TokenBucket] = None,
+    **summary_opts: Any,
+) -> SummaryOutcome:
+    """对单篇正文调用 `run_gemini_summary`；重试与熔断在单次请求层面进行（见 `_request`）。
+
+    重试耗尽或熔断等待超出上限（及鉴权失败）时标记 fatal，由调用方中断本次运行；
+    参数错误等不可重试的失败只影响本篇（使用本地替代摘要）。
+    summary_opts 原样传给 `run_gemini_summary`（如 chunk_tokens、reduce_fan_in、digest_cache、retry）。
+    """
+    ok, res, err = run_gemini_summary(
+        text, model_alias, max_chars, 0.0, on_progress=None,
+        principles=principles,
+        blocked_topics=blocked_topics,
+        rate_limiter=rate_limiter,
+        **summary_opts,
+    )
+    if ok and res is not None:
+        if isinstance(res, dict) and res.get('excluded'):
+            return SummaryOutcome(requested=True, ok=True, excluded=res, attempts=1)
+        if isinstance(res, str):
+            return SummaryOutcome(requested=True, ok=True, text=res, attempts=1)
+    return SummaryOutcome(
+        requested=True, ok=False, error=err, attempts=1,
+        fatal=error_kind(err) in FATAL_KINDS,
+    )
+
+
 def guess_repo_root(start: Path) -> Path:
     """Ascend from start to find top-level git repo root.
     Preference order:
@@ -540,6 +1171,18 @@ def guess_repo_root(start: Path) -> Path:
     return start.resolve()
 
 
+def _fallback_summary(pure: str, max_chars: int, mode: str) -> str:
+    """无模型摘要时的本地替代：抽取式摘要（失败时退回截断）或直接截断。"""
+    if mode == 'extractive':
+        try:
+            text = extractive_summary(pure, max_chars)
+            if text:
+                return text
+        except Exception as e:
+            _debug_print(f"[摘要] 抽取式摘要失败，改为截断：{e}", '33')
+    return pure[:max_chars] + ('……' if len(pure) > max_chars else '')
+
+
 def _load_existing_summaries(out_json: Path) -> Optional[List[Dict[str, Any]]]:
     """读取先前生成的精简 JSON 的 `files` 列表，用于断点续跑。
 
@@ -558,12 +1201,27 @@ def _load_existing_summaries(out_json: Path) -> Optional[List[Dict[str, Any]]]:
     return None
 
 
-def _rewrite_md_upto(out_md: Path, entries: List[Entry], upto: int, total: int, existing_summaries: List[Dict[str, Any]], title: str) -> None:
+def _md_dup_lines(rec: Dict[str, Any]) -> str:
+    """逐项记录中近似重复信息对应的 Markdown 列表行（无则为空串）。"""
+    lines = ''
+    dup_of = rec.get('duplicate_of')
+    if isinstance(dup_of, dict):
+        lines += f"- 近似重复于：`{dup_of.get('path')}`（估计相似度 {dup_of.get('similarity')}），摘要沿用该篇\n"
+    for d in rec.get('duplicates') or []:
+        lines += f"- 近似重复：`{d.get('path')}`（估计相似度 {d.get('similarity')}）\n"
+    return lines
+
+
+def _rewrite_md_upto(
+    out_md: Path, entries: List[Entry], upto: int, total: int, existing_summaries: List[Dict[str, Any]], title: str,
+    collapse_dups: bool = False,
+) -> None:
     """用已存在的摘要（索引区间 [0, upto)）重写 Markdown 头与对应片段。
 
     - 始终重写（覆盖） `out_md`，确保格式一致；
     - 文本内容使用 `existing_summaries[i]['summary']`；
-    - 路径与时间信息取当前扫描的 `entries[i]`。
+    - 路径与时间信息取当前扫描的 `entries[i]`；
+    - collapse_dups 时近似重复的成员不单独成节（已列在代表篇一节中）。
     """
     with out_md.open('w', encoding='utf-8', newline='\n') as fmd:
         fmd.write(f"# {title}\n\n")
@@ -579,6 +1237,8 @@ def _rewrite_md_upto(out_md: Path, entries: List[Entry], upto: int, total: int,
             try:
                 if bool(existing_summaries[i].get('skipped')):
                     continue
+                if collapse_dups and existing_summaries[i].get('duplicate_of'):
+                    continue
             except Exception:
                 pass
             summary_text = ''
@@ -589,20 +1249,142 @@ def _rewrite_md_upto(out_md: Path, entries: List[Entry], upto: int, total: int,
             fmd.write('---\n\n')
             fmd.write(f"## [{i+1}/{total}] {e.name}\n\n")
             fmd.write(f"- 源路径：`{rel_posix}`\n")
-            fmd.write(f"- 时间戳：`{e.ts}`；UTC：`{dt_utc}`\n\n")
-            fmd.write(summary_text + "\n\n")
+            fmd.write(f"- 时间戳：`{e.ts}`；UTC：`{dt_utc}`\n")
+            try:
+                fmd.write(_md_dup_lines(existing_summaries[i]))
+            except Exception:
+                pass
+            fmd.write("\n" + summary_text + "\n\n")
 
 
-def main(argv: Optional[List[str]] = None) -> int:
-    script_path = Path(__file__).resolve()
-    script_stem = script_path.stem
-    default_config = script_path.with_suffix('.json')
+@dataclass
+class WatchState:
+    """`--watch` 模式在相邻两次运行之间常驻内存的状态：未变文件不再重读，也不再解析上次的完整合并输出。"""
+    entries: Dict[str, Entry] = field(default_factory=dict)  # 相对路径 -> Entry（正文常驻，见 Entry.pin）
+    all_header: Optional[Dict[str, Any]] = None  # 上次写出的完整合并头部（用于判断能否跳过重写）
+    src_dirs: List[Path] = field(default_factory=list)
+    all_written_at: Optional[float] = None  # 本轮完整合并写出完成的 perf_counter 时刻
 
+
+def _build_parser() -> argparse.ArgumentParser:
+    default_config = Path(__file__).resolve().with_suffix('.json')
     parser = argparse.ArgumentParser(description='合并文件名为 <UNIX秒>_*.md 的 Markdown（按时间戳升序），输出 JSON 与 Markdown。')
     parser.add_argument('--config', type=Path, default=default_config, help='配置文件路径（默认：与脚本同名同目录的 .json）')
     parser.add_argument('--out-dir', type=Path, default=None, help='覆盖输出目录（默认：配置中的 output_dir 或仓库 ./out）')
     parser.add_argument('--dry-run', action='store_true', help='仅扫描与计数，不写入输出文件')
+    parser.add_argument('--format', dest='all_format', choices=list(FORMATS), default='json',
+                        help='完整合并（含全文）的输出格式：json（默认，兼容既往格式）、jsonl（JSON Lines）、'
+                             'jsonl.gz / jsonl.zst（压缩的 JSON Lines）或 msgpack（长度前缀的 MessagePack 帧）')
+    parser.add_argument('--full-scan', action='store_true', help='忽略增量扫描清单，重新读取全部文件并重建完整 JSON')
+    parser.add_argument('--compact', action='store_true', help='仅由摘要日志（.journal.jsonl）重新生成逐项摘要 JSON 后退出')
+    parser.add_argument('--cache-stats', action='store_true', help='输出摘要缓存统计（JSON）后退出，不发起请求、不写入输出')
+    parser.add_argument('--since', default=None, help='仅处理时间戳不早于该时间的文件：UNIX 秒或 ISO 日期/时间（UTC）')
+    parser.add_argument('--until', default=None, help='仅处理时间戳不晚于该时间的文件（含；仅日期时含当天全天）')
+    parser.add_argument('--trace', nargs='?', const='', default=None, metavar='PATH',
+                        help='另写出 Chrome trace-event 文件（默认 out/<stem>.trace.json），可用 chrome://tracing 或 Perfetto 查看')
+    parser.add_argument('--watch', action='store_true',
+                        help='常驻监视源目录：首轮运行后，文件变化（去抖）时以内存中的条目索引增量重跑；Ctrl+C 退出')
+    parser.add_argument('--watch-mode', choices=list(WATCH_MODES), default='auto',
+                        help='监视方式：auto（默认，Linux 用 inotify，不可用时轮询）、inotify 或 poll')
+    parser.add_argument('--debounce', type=float, default=0.2, help='--watch 去抖：变化后静默该秒数再重跑（默认 0.2）')
+    parser.add_argument('--poll-interval', type=float, default=1.0, help='轮询监视的间隔秒数（默认 1.0）')
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """命令行入口；运行结束（含中断/提前退出）时写出运行指标与 trace（若已确定输出路径）。"""
+    parser = _build_parser()
     args = parser.parse_args(argv)
+    if args.watch:
+        return _watch(parser, args)
+    METRICS.reset()
+    try:
+        return _run(parser, args)
+    finally:
+        for p in METRICS.flush():
+            _debug_print(f"[指标] 已写入：{p}", '36')
+
+
+def _watch(parser: argparse.ArgumentParser, args: argparse.Namespace) -> int:
+    """`--watch`：首轮完整运行后常驻；源目录变化经去抖后增量重跑，条目索引常驻内存。"""
+    if args.since or args.until or args.dry_run or args.compact or args.cache_stats:
+        parser.error('--watch 不能与 --since/--until/--dry-run/--compact/--cache-stats 同用')
+    hot = WatchState()
+
+    def _once(label: str) -> int:
+        METRICS.reset()
+        hot.all_written_at = None
+        t0 = time.perf_counter()
+        try:
+            rc = _run(parser, args, hot)
+        except Exception as ex:
+            # 常驻进程：单轮失败不退出，等待下一次变化
+            print(f"[监视] 本轮运行异常：{ex!r}")
+            rc = 1
+        finally:
+            for p in METRICS.flush():
+                _debug_print(f"[指标] 已写入：{p}", '36')
+        took = time.perf_counter() - t0
+        if hot.all_written_at is not None:
+            took_all = f"完整合并 {hot.all_written_at - t0:.3f}s 后已更新，"
+        else:
+            took_all = ''
+        _debug_print(f"[监视] {label}完成（退出码 {rc}）：{took_all}全部输出耗时 {took:.3f}s", '32' if rc == 0 else '31')
+        return rc
+
+    rc = _once('首轮运行')
+    if not hot.src_dirs:
+        return rc
+    args.full_scan = False  # 之后的轮次总是增量扫描
+    try:
+        watcher = open_watcher(hot.src_dirs, mode=args.watch_mode, poll_interval=args.poll_interval)
+    except (OSError, ValueError) as ex:
+        print(f"[监视] 无法启动监视：{ex}")
+        return 1
+    _debug_print(
+        f"[监视] {watcher.kind}：{len(hot.src_dirs)} 个源目录（{watcher.watched} 个监视项），去抖 {args.debounce:g}s；Ctrl+C 退出",
+        '36',
+    )
+
+    def _on_term(signum: int, frame: Any) -> None:
+        raise KeyboardInterrupt
+
+    try:
+        # 作为服务运行时以 SIGTERM 停止，与 Ctrl+C 一样正常退出
+        signal.signal(signal.SIGTERM, _on_term)
+    except (ValueError, OSError):
+        pass
+    try:
+        while True:
+            changed = wait_for_changes(watcher, quiet=args.debounce)
+            # 不匹配命名模式的 .md（如 README.md、INDEX.md）不参与合并，不触发重跑
+            changed = {p for p in changed if not p.name.endswith('.md') or TIMESTAMP_BASENAME_RE.match(p.name)}
+            if not changed:
+                continue
+            shown = sorted(p.name for p in changed)
+            _debug_print(f"[监视] 检测到 {len(changed)} 处变化：{'、'.join(shown[:5])}{' …' if len(shown) > 5 else ''}", '33')
+            _once('增量运行')
+    except KeyboardInterrupt:
+        _debug_print('[监视] 已退出', '36')
+        return 0
+    finally:
+        watcher.close()
+
+
+def _run(parser: argparse.ArgumentParser, args: argparse.Namespace, hot: Optional[WatchState] = None) -> int:
+    """一次完整运行；hot 为 `--watch` 的常驻状态（首轮为空，之后复用其中未变文件的正文）。"""
+    script_path = Path(__file__).resolve()
+    script_stem = script_path.stem
+
+    try:
+        since = parse_time_bound(args.since) if args.since else None
+        until = parse_time_bound(args.until, upper=True) if args.until else None
+    except ValueError as e:
+        parser.error(str(e))
+    dep_err = missing_dependency(args.all_format)
+    if dep_err:
+        parser.error(dep_err)
+    windowed = since is not None or until is not None
 
     cfg = load_config(args.config)
     _debug_print(f"[合并] 使用配置：{args.config}", '36')
@@ -622,12 +1404,148 @@ def main(argv: Optional[List[str]] = None) -> int:
             # 回退绝对路径
             p = Path(d).expanduser().resolve()
         src_dirs.append(p)
+    if hot is not None:
+        hot.src_dirs = src_dirs
     _debug_print(f"[合并] 仓库根：{repo_root}", '36')
     _debug_print(f"[合并] 源目录：{[str(p) for p in src_dirs]}", '36')
 
-    files = list(iter_md_files(src_dirs))
-    entries = parse_entries(repo_root, files)
+    out_dir = args.out_dir if args.out_dir else (
+        Path(output_dir_cfg) if output_dir_cfg else (repo_root / 'out')
+    )
+    if not out_dir.is_absolute():
+        out_dir = (repo_root / out_dir).resolve()
+
+    # 时间窗口运行写入独立的输出（含摘要日志），缓存与去重索引仍与全量运行共用
+    out_stem = script_stem
+    if windowed:
+        out_stem = f"{script_stem}_{'' if since is None else since}-{'' if until is None else until}"
+    out_json = out_dir / f"{out_stem}.json"  # 精简版（逐项摘要）
+    out_md = out_dir / f"{out_stem}.md"      # 逐项摘要 Markdown
+    out_json_all = out_dir / f"{out_stem}_all.{args.all_format}"  # 完整合并（含全文）
+    journal = SummaryJournal(out_dir / f"{out_stem}.journal.jsonl")  # 逐项摘要追加日志
+    # 分片输出（sharding）：完整合并按时间分片写入 out/<stem>_all/，替代单文件
+    shard_cfg = cfg.get('sharding') if isinstance(cfg.get('sharding'), dict) else {}
+    sharder: Optional[ShardedWriter] = None
+    if bool(shard_cfg.get('enabled', False)):
+        try:
+            sharder = ShardedWriter(
+                out_dir / f"{out_stem}_all",
+                by=str(shard_cfg.get('by') or 'month'),
+                max_bytes=int(shard_cfg.get('max_bytes', 8 * 1024 * 1024) or 8 * 1024 * 1024),
+                fmt=args.all_format,
+                workers=int(shard_cfg.get('workers', 0) or 0),
+            )
+        except ValueError as e:
+            print(f"配置错误：{e}")
+            return 1
+        out_json_all = sharder.manifest_path
+
+    if args.compact:
+        j_header, j_records = journal.read()
+        if j_header is None:
+            print(f"未找到摘要日志：{journal.path}")
+            return 1
+        write_json_summaries(out_json, j_records, j_header.get('source_dirs') or source_dirs_raw,
+                             compression=j_header.get('compression'))
+        print(f"完成：由日志重建 JSON（摘要） -> {out_json}（{len(j_records)} 项）")
+        return 0
+
+    # 增量扫描：目录 mtime 未变则复用子项列表；文件 size/mtime 未变则沿用清单中的 sha256，不读取
+    manifest: Optional[ScanManifest] = None
+    prev_all_header: Optional[Dict[str, Any]] = None
+    reused: Dict[str, str] = {}  # 相对路径 -> sha256
+    ts_index: Optional[TimestampIndex] = None
+    t_scan = time.perf_counter()
+    if windowed:
+        # 时间窗口：由有序时间戳索引二分选取，窗口外的文件不打开、不解码
+        ts_index = TimestampIndex(out_dir / f"{script_stem}.ts_index.json", repo_root, TIMESTAMP_BASENAME_RE)
+        files = ts_index.refresh(src_dirs).select_paths(since, until)
+        _debug_print(
+            f"[窗口] {since if since is not None else '-∞'} ~ {until if until is not None else '+∞'}："
+            f"{len(files)}/{len(ts_index.entries)} 篇；目录复用 {ts_index.dirs_reused}/{ts_index.dirs_reused + ts_index.dirs_listed}",
+            '36',
+        )
+    elif args.full_scan:
+        files = list(iter_md_files(src_dirs))
+    else:
+        manifest = ScanManifest(out_dir / f"{script_stem}.manifest.json", repo_root, TIMESTAMP_BASENAME_RE)
+        files = manifest.scan(src_dirs)
+        reused = {k: manifest.files[k].sha256 for k in manifest.unchanged()}
+        if hot is not None and hot.entries:
+            prev_all_header = hot.all_header
+        elif sharder is not None:
+            prev_all_header = sharder.header()
+        else:
+            prev_all_header = manifest.old_output
+    METRICS.add_time('scan', t_scan)
+    scan_workers = int(cfg.get('scan_workers', 0) or 0)
+    # 近似重复检测（dedupe）：MinHash-LSH 索引随 parse_entries 增量更新
+    dedupe_cfg = cfg.get('dedupe') if isinstance(cfg.get('dedupe'), dict) else {}
+    near_dup: Optional[NearDupIndex] = None
+    if bool(dedupe_cfg.get('enabled', False)):
+        near_dup = NearDupIndex(
+            out_dir / f"{script_stem}.dedupe_index.json",
+            threshold=float(dedupe_cfg.get('threshold', 0.85)),
+            num_perm=int(dedupe_cfg.get('num_perm', 128) or 128),
+            shingle_chars=int(dedupe_cfg.get('shingle_chars', 5) or 5),
+        )
+    collapse_dups = near_dup is not None and bool(dedupe_cfg.get('collapse_markdown', False))
+    with METRICS.stage('read'):
+        entries = parse_entries(
+            repo_root, files, reused, workers=scan_workers, near_dup=near_dup, keep_content=hot is not None,
+        )
+    METRICS.gauge('entries', len(entries))
+    if hot is not None:
+        # 监视模式：正文常驻于条目索引；未变文件沿用上一轮的正文，不再读取
+        for e in entries:
+            old = hot.entries.get(e.rel.as_posix())
+            try:
+                e.pin(old.content if old is not None and old.pinned and old.sha256 == e.sha256 else None)
+            except OSError as ex:
+                # 不常驻：后续各阶段重读时再次核对并跳过
+                _debug_print(f"[跳过] 条目索引：{e.rel.as_posix()}（{ex}）", '33')
+        hot.entries = {e.rel.as_posix(): e for e in entries}
+    n_reused = sum(1 for e in entries if e.rel.as_posix() in reused)
+    METRICS.count('read.files_read', len(entries) - n_reused)
+    METRICS.count('read.files_reused', n_reused)
     _debug_print(f"[合并] 匹配文件数：{len(entries)}", '36')
+    # 成员路径 -> (代表路径, 估计相似度)；代表篇为组内时间戳最早者
+    dup_of: Dict[str, Tuple[str, float]] = {}
+    dup_members: Dict[str, List[Dict[str, Any]]] = {}
+    if near_dup is not None:
+        with METRICS.stage('dedupe'):
+            dup_of = near_dup.groups([e.rel.as_posix() for e in entries])
+        for member, (rep_path, sim) in dup_of.items():
+            dup_members.setdefault(rep_path, []).append({'path': member, 'similarity': sim})
+        _debug_print(
+            f"[去重] 近似重复 {len(dup_of)} 篇（{len(dup_members)} 组，阈值 {near_dup.threshold:g}，"
+            f"LSH {near_dup.bands}×{near_dup.rows}）；签名复用 {near_dup.reused}，新算 {near_dup.computed}",
+            '36',
+        )
+        for member, (rep_path, sim) in list(dup_of.items())[:20]:
+            print(f"= {member} ≈ {rep_path}（{sim}）")
+    delta: Optional[Dict[str, List[str]]] = None
+    if manifest is not None:
+        manifest.record_hashes({e.rel.as_posix(): e.sha256 for e in entries if e.sha256})
+        delta = manifest.delta()
+        _debug_print(
+            f"[增量] 目录复用 {manifest.dirs_reused}/{manifest.dirs_reused + manifest.dirs_listed}；"
+            f"未变 {n_reused} 篇（不读取）；新增 {len(delta['added'])}，变更 {len(delta['changed'])}，删除 {len(delta['removed'])}",
+            '36',
+        )
+        # 控制台仅展示每类前 20 项；完整增量写入清单的 delta 字段
+        for tag, key in (('+', 'added'), ('~', 'changed'), ('-', 'removed')):
+            for rel in delta[key][:20]:
+                print(f"{tag} {rel}")
+            if len(delta[key]) > 20:
+                print(f"{tag} …（共 {len(delta[key])} 项，详见 {manifest.path.name}）")
+
+    if near_dup is not None and not args.dry_run:
+        ensure_out_dir(out_dir)
+        near_dup.save()
+    if ts_index is not None and not args.dry_run:
+        ensure_out_dir(out_dir)
+        ts_index.save()
 
     if args.dry_run:
         total = len(entries)
@@ -636,17 +1554,14 @@ def main(argv: Optional[List[str]] = None) -> int:
             print(f"- {i}/{total} {e.ts} {e.rel}")
         return 0
 
-    out_dir = args.out_dir if args.out_dir else (
-        Path(output_dir_cfg) if output_dir_cfg else (repo_root / 'out')
-    )
-    if not out_dir.is_absolute():
-        out_dir = (repo_root / out_dir).resolve()
     ensure_out_dir(out_dir)
     _debug_print(f"[合并] 输出目录：{out_dir}", '36')
-
-    out_json = out_dir / f"{script_stem}.json"  # 精简版（逐项摘要）
-    out_md = out_dir / f"{script_stem}.md"      # 逐项摘要 Markdown
-    out_json_all = out_dir / f"{script_stem}_all.json"  # 完整合并（含全文）
+    metrics_cfg = cfg.get('metrics') if isinstance(cfg.get('metrics'), dict) else {}
+    if bool(metrics_cfg.get('enabled', True)):
+        METRICS.path = out_dir / f"{out_stem}.metrics.json"
+    if args.trace is not None or bool(metrics_cfg.get('trace', False)):
+        METRICS.trace_enabled = True
+        METRICS.trace_path = Path(args.trace) if args.trace else out_dir / f"{out_stem}.trace.json"
 
     # 读取压缩设置
     compression_cfg = cfg.get('compression', {}) if isinstance(cfg.get('compression', {}), dict) else {}
@@ -656,10 +1571,69 @@ def main(argv: Optional[List[str]] = None) -> int:
     env_model = os.environ.get('GEMINI_MODEL')
     if env_model:
         comp_model_alias = env_model.strip()
+    # LLM 提供方：gemini（默认）/ fake（进程内离线替身）/ http（本地替身服务）；环境变量 LLM_PROVIDER 优先
+    provider_opts = compression_cfg.get('provider_options') if isinstance(compression_cfg.get('provider_options'), dict) else {}
+    try:
+        llm = get_provider(str(compression_cfg.get('provider') or 'gemini'), **provider_opts)
+    except ValueError as e:
+        print(f"配置错误：{e}")
+        return 1
     comp_max_chars = int(compression_cfg.get('max_chars', 500))
+    # 无模型摘要时的本地替代：extractive（抽取式摘要，默认）/ truncate（截断前 max_chars 字）
+    comp_fallback = str(compression_cfg.get('fallback') or 'extractive').strip().lower()
+    if comp_fallback not in FALLBACK_MODES:
+        print(f"配置错误：compression.fallback 仅支持 {'/'.join(FALLBACK_MODES)}，当前为 {comp_fallback!r}")
+        return 1
     comp_interval = float(compression_cfg.get('request_interval_seconds', 0) or 0)
     # 新增：每次运行的请求上限（>0 时，本次运行处理到达到上限即正常退出，便于分批执行）
     comp_max_requests_per_run = int(compression_cfg.get('max_requests_per_run', 0) or 0)
+    # 并发与限速：rate_limit 未配置时，按 request_interval_seconds 折算为 requests/minute
+    comp_concurrency = max(1, int(compression_cfg.get('concurrency', 1) or 1))
+    rate_cfg = compression_cfg.get('rate_limit') if isinstance(compression_cfg.get('rate_limit'), dict) else {}
+    comp_rpm = float(rate_cfg.get('requests_per_minute', 0) or 0)
+    if comp_rpm <= 0 and comp_interval > 0:
+        comp_rpm = 60.0 / comp_interval
+    comp_tpm = float(rate_cfg.get('tokens_per_minute', 0) or 0)
+    comp_burst = float(rate_cfg.get('burst', 0) or 0) or None
+    comp_chunk_tokens = int(compression_cfg.get('chunk_tokens', DEFAULT_CHUNK_TOKENS) or DEFAULT_CHUNK_TOKENS)
+    comp_fan_in = max(2, int(compression_cfg.get('reduce_fan_in', 8) or 8))
+    comp_map_workers = max(1, int(compression_cfg.get('map_workers', 4) or 4))
+    # 重试与熔断：单次请求按全抖动指数退避重试；连续失败时熔断，状态跨运行持久化
+    retry_cfg = compression_cfg.get('retry') if isinstance(compression_cfg.get('retry'), dict) else {}
+    breaker_cfg = compression_cfg.get('circuit_breaker') if isinstance(compression_cfg.get('circuit_breaker'), dict) else {}
+
+    def _on_breaker_event(event: str, info: Dict[str, Any]) -> None:
+        if event == 'waited':
+            METRICS.add_time('breaker.wait', time.perf_counter() - info['seconds'], cat='wait')
+            return
+        METRICS.count(f'breaker.{event}')
+        if event == 'opened':
+            _debug_print(f"[熔断] 已打开，冷却 {info['cooldown']:.0f}s；最近错误：{info.get('error')}", '31')
+        elif event == 'half_open':
+            _debug_print("[熔断] 冷却结束，发起探测请求…", '33')
+        elif event == 'closed':
+            _debug_print("[熔断] 探测成功，已恢复", '32')
+
+    # 每次运行请求上限按实际发出的调用计数（见 retry_policy.RequestBudget）
+    retry_policy = RetryPolicy.from_config(
+        retry_cfg, breaker_cfg, out_dir / f"{script_stem}.breaker.json", on_event=_on_breaker_event,
+        max_requests=comp_max_requests_per_run,
+    )
+    # 打包：多篇短文档合并为一次请求（按离线 token 估算装箱）
+    pack_cfg = compression_cfg.get('packing') or {}
+    pack_enabled = bool(pack_cfg.get('enabled', False))
+    pack_doc_tokens = int(pack_cfg.get('max_doc_tokens', 2000) or 2000)
+    pack_budget = int(pack_cfg.get('max_pack_tokens', 16000) or 16000)
+    pack_max_docs = max(2, int(pack_cfg.get('max_docs', 10) or 10))
+    # 增量重摘要：长文档小幅修改时只发送变化章节 + 上次摘要（见 delta_summary.py）
+    inc_cfg = compression_cfg.get('incremental') if isinstance(compression_cfg.get('incremental'), dict) else {}
+    inc_enabled = bool(inc_cfg.get('enabled', False))
+    inc_max_ratio = float(inc_cfg.get('max_diff_ratio', 0.3))
+    inc_min_tokens = int(inc_cfg.get('min_tokens', 2000) or 0)
+    inc_max_chain = int(inc_cfg.get('max_chain', 5) or 0)
+    # 对冲请求：超过近期延迟分位仍未返回时追加一份重复请求（见 request_hedger.py）
+    hedge_cfg = compression_cfg.get('hedging') if isinstance(compression_cfg.get('hedging'), dict) else {}
+    hedge_enabled = bool(hedge_cfg.get('enabled', False))
     comp_principles = compression_cfg.get('principles')
     if isinstance(comp_principles, list):
         comp_principles = [str(x) for x in comp_principles]
@@ -684,28 +1658,113 @@ def main(argv: Optional[List[str]] = None) -> int:
     else:
         guard_blocked_topics = [str(x).strip() for x in guard_blocked_topics if str(x).strip()]
 
+    # 本地预分类（content_guard.local）：关键词自动机 + 打分，仅不确定的条目交由模型判断
+    local_cfg = guard_cfg.get('local') if isinstance(guard_cfg.get('local'), dict) else {}
+    topic_guard: Optional[TopicGuard] = None
+    if guard_enabled and guard_blocked_topics and bool(local_cfg.get('enabled', False)):
+        topic_guard = TopicGuard(
+            guard_blocked_topics,
+            synonyms=local_cfg.get('synonyms') if isinstance(local_cfg.get('synonyms'), dict) else None,
+            exclude_threshold=float(local_cfg.get('exclude_threshold', 0.95)),
+            clear_threshold=float(local_cfg.get('clear_threshold', 0.15)),
+            weights=local_cfg.get('weights') if isinstance(local_cfg.get('weights'), dict) else None,
+        )
+
+    # 摘要缓存（内容寻址）：命中则不发起请求；未配置时默认启用
+    cache_cfg = compression_cfg.get('cache') if isinstance(compression_cfg.get('cache'), dict) else {}
+    cache: Optional[SummaryCache] = None
+    digest_cache: Optional[SummaryCache] = None  # 长文档分块/归并树的节点摘要
+    guard_cache: Optional[SummaryCache] = None   # 本地预分类判定
+    if bool(cache_cfg.get('enabled', True)):
+        cache = SummaryCache(
+            out_dir / f"{script_stem}.summary_cache.json",
+            max_entries=int(cache_cfg.get('max_entries', 0) or 0),
+            max_bytes=int(cache_cfg.get('max_bytes', 0) or 0),
+        )
+        digest_cache = SummaryCache(
+            out_dir / f"{script_stem}.digest_cache.json",
+            max_entries=int(cache_cfg.get('max_entries', 0) or 0),
+            max_bytes=int(cache_cfg.get('max_bytes', 0) or 0),
+        )
+        if topic_guard is not None:
+            guard_cache = SummaryCache(
+                out_dir / f"{script_stem}.guard_cache.json",
+                max_entries=int(cache_cfg.get('max_entries', 0) or 0),
+            )
+    if args.cache_stats:
+        stats = {'summary': cache.stats(), 'digest': digest_cache.stats()} if cache is not None else {'enabled': False}
+        if guard_cache is not None:
+            stats['guard'] = guard_cache.stats()
+        print(json.dumps(stats, ensure_ascii=False, indent=2))
+        return 0
+
     # 1) 先输出完整合并 JSON（含全文）
-    write_json(out_json_all, entries, source_dirs_raw, compression={
+    all_compression = {
         'enabled': comp_enabled,
-        'provider': 'gemini',
+        'provider': llm.name,
         'model_alias': comp_model_alias,
         'model_resolved': _gemini_model_from_alias(comp_model_alias),
         'max_chars': comp_max_chars,
         'principles': comp_principles,
-    })
-    _debug_print(f"[合并] 已写入完整 JSON（含全文）：{out_json_all}", '32')
+    }
+    # 无增量且头部一致时沿用上次文件；否则逐篇读取正文流式重写
+    all_header = {
+        'source_dirs': source_dirs_raw, 'compression': all_compression,
+        'total_files': len(entries), 'format': args.all_format,
+    }
+    all_unchanged = (
+        manifest is not None and manifest.loaded and delta is not None
+        and not any(delta.values()) and n_reused == len(entries)
+        and prev_all_header is not None
+        and all(prev_all_header.get(k) == v for k, v in all_header.items())
+        and out_json_all.exists()
+        # 旧版本输出没有旁路索引时重写一次（压缩格式不带索引）
+        and (args.all_format not in INDEXED_FORMATS or index_path_for(out_json_all).exists())
+    )
+    t_write = time.perf_counter()
+    all_complete = True  # 完整 JSON 是否包含全部条目（有条目在写出时被跳过则下次必定重写）
+    if sharder is not None:
+        # 分片输出：仅重写内容变化的分片（并行），清单记录各分片的时间范围、条目数与哈希
+        by_rel = {e.rel.as_posix(): e for e in entries}
+        st = sharder.write(
+            [_all_stub(e) for e in entries], source_dirs_raw, compression=all_compression,
+            load=lambda rec: _load_all_record(by_rel[rec['path']]),
+        )
+        _debug_print(
+            f"[分片] 共 {st['shards']} 片（{sharder.by}）：重写 {st['written']}，复用 {st['reused']}，删除 {st['removed']}；清单：{out_json_all}",
+            '32',
+        )
+    elif all_unchanged:
+        _debug_print(f"[增量] 完整 JSON 无变化，跳过重写：{out_json_all}", '32')
+    else:
+        all_complete = write_json(out_json_all, entries, source_dirs_raw, compression=all_compression,
+                                  fmt=args.all_format) == len(entries)
+        _debug_print(f"[合并] 已写入完整 JSON（含全文）：{out_json_all}", '32')
+    if manifest is not None:
+        manifest.output = all_header if sharder is None and all_complete else None
+        manifest.save()
+    METRICS.add_time('write_all', t_write)
+    if hot is not None:
+        hot.all_header = all_header
+        hot.all_written_at = time.perf_counter()
 
     # 2) 逐项压缩并写入 Markdown（摘要）+ 失败重试 + 断点续跑
-    md_title = f"{script_stem} 逐项摘要合并"
+    md_title = f"{out_stem} 逐项摘要合并"
 
     # 如存在先前输出，尝试断点续跑（覆盖失败项）
+    # 优先读取追加日志；无日志时兼容旧版本输出的格式化 JSON
+    t_resume = time.perf_counter()
     existing_files: Optional[List[Dict[str, Any]]] = None
-    if out_md.exists() and out_json.exists():
+    if out_md.exists() and journal.exists():
+        _, existing_files = journal.read()
+    elif out_md.exists() and out_json.exists():
         existing_files = _load_existing_summaries(out_json)
-        if existing_files:
-            _debug_print("[恢复] 检测到先前摘要输出，尝试从上次失败处续跑…", '33')
+    if existing_files:
+        _debug_print("[恢复] 检测到先前摘要输出，尝试从上次失败处续跑…", '33')
 
     # 计算恢复起点：按顺序比对 `path`/`filename` 与当前 entries 对齐段
+    # 增量清单中“变更”的条目其旧摘要已过期，同样从该项开始覆盖
+    changed_rels = set(delta['changed']) if delta else set()
     start_idx = 0
     if existing_files:
         n_align = min(len(existing_files), len(entries))
@@ -716,16 +1775,39 @@ def main(argv: Optional[List[str]] = None) -> int:
                 ef = existing_files[i]
                 if ef.get('path') != rel_posix or ef.get('filename') != e.name:
                     break
+                if rel_posix in changed_rels:
+                    break
                 comp_meta = ef.get('compression') or {}
-                # 若该项为上次失败（特定错误），从该项开始覆盖
-                if comp_meta.get('requested') and (comp_meta.get('ok') is False) and (comp_meta.get('error') == 'Gemini 无返回文本'):
+                # 若该项上次以可重试的错误失败（无返回文本、限流、服务端/网络错误等），从该项开始覆盖
+                if comp_meta.get('requested') and (comp_meta.get('ok') is False) \
+                        and error_kind(comp_meta.get('error')) in RETRYABLE_KINDS:
+                    break
+                # 上次运行中源文件被删除或修改而跳过的条目：重新处理
+                if error_kind(comp_meta.get('error')) == 'source':
+                    break
+                # 近似重复分组与上次不同（成员关系或代表篇变化）时，从该项开始重算
+                prev_dup = (ef.get('duplicate_of') or {}).get('path') if isinstance(ef.get('duplicate_of'), dict) else None
+                cur_dup = dup_of[rel_posix][0] if rel_posix in dup_of else None
+                if prev_dup != cur_dup:
+                    break
+                if [d.get('path') for d in ef.get('duplicates') or []] != [d['path'] for d in dup_members.get(rel_posix, [])]:
                     break
                 start_idx = i + 1
             except Exception:
                 break
 
     # 重写 Markdown 到 start_idx（覆盖失败项；start_idx=0 时仅写头）
-    _rewrite_md_upto(out_md, entries, start_idx, len(entries), existing_files or [], md_title)
+    _rewrite_md_upto(out_md, entries, start_idx, len(entries), existing_files or [], md_title, collapse_dups)
+
+    comp_info = {
+        'enabled': comp_enabled,
+        'provider': llm.name,
+        'model_alias': comp_model_alias,
+        'model_resolved': _gemini_model_from_alias(comp_model_alias),
+        'max_chars': comp_max_chars,
+        'principles': comp_principles,
+        'fallback': comp_fallback,
+    }
 
     # 初始化 summaries 为已完成部分（用于继续写 JSON）
     summaries: List[Dict[str, Any]] = []
@@ -733,7 +1815,7 @@ def main(argv: Optional[List[str]] = None) -> int:
         for i in range(start_idx):
             e = entries[i]
             ef = existing_files[i]
-            summaries.append({
+            prev = {
                 'path': e.rel.as_posix(),
                 'filename': e.name,
                 'timestamp': e.ts,
@@ -742,201 +1824,563 @@ def main(argv: Optional[List[str]] = None) -> int:
                 'compression': ef.get('compression') or None,
                 'content_guard': ef.get('content_guard') or None,
                 'skipped': bool(ef.get('skipped', False)),
+            }
+            for k in ('duplicate_of', 'duplicates'):
+                if ef.get(k):
+                    prev[k] = ef[k]
+            summaries.append(prev)
+    # 日志以已确认前缀重写，其后每提交一项只追加一行；格式化 JSON 在结束时一次性生成
+    journal.reset({'source_dirs': source_dirs_raw, 'compression': comp_info}, summaries)
+    METRICS.add_time('resume', t_resume)
+    METRICS.gauge('resumed_entries', start_idx)
+
+    def _compact() -> None:
+        with METRICS.stage('compact'):
+            journal.close()
+            write_json_summaries(out_json, summaries, source_dirs_raw, compression=comp_info)
+
+    guard_requested = bool(comp_enabled and guard_enabled and guard_blocked_topics)
+    blocked = guard_blocked_topics if guard_requested else None
+    model_resolved = _gemini_model_from_alias(comp_model_alias)
+    if llm.name != 'gemini':
+        # 替身提供方的结果不得与真实摘要共用缓存键
+        model_resolved = f"{llm.name}/{model_resolved}"
+    limiter = TokenBucket(comp_rpm, comp_tpm, comp_burst)
+    hedger: Optional[HedgedProvider] = None
+    if comp_enabled and hedge_enabled:
+
+        def _may_hedge(prompt: str) -> bool:
+            # 对冲与主请求共用每次运行的请求额度（放行即占用一次）；熔断期间不对冲；限速额度不足时放弃对冲而不是等待
+            if retry_policy.budget.exhausted() or retry_policy.breaker.is_open():
+                return False
+            return limiter.try_acquire(estimate_tokens(prompt)) and retry_policy.budget.try_take()
+
+        hedger = HedgedProvider(
+            llm,
+            percentile=float(hedge_cfg.get('percentile', 95)),
+            max_extra_percent=float(hedge_cfg.get('max_extra_percent', 10)),
+            min_samples=int(hedge_cfg.get('min_samples', 50) or 1),
+            min_delay=float(hedge_cfg.get('min_delay_seconds', 0) or 0),
+            workers=2 * comp_concurrency * comp_map_workers,
+            may_hedge=_may_hedge,
+            metrics=METRICS,
+        )
+        llm = hedger
+    delta_base: Optional[DeltaBase] = None
+    inc_params = ''
+    if comp_enabled and inc_enabled:
+        delta_base = DeltaBase(out_dir / f"{script_stem}.delta_base.json")
+        # 摘要参数指纹：模型、principles、max_chars 或排除主题变化时基线失效
+        inc_params = make_summary_key('', model_resolved, comp_principles, comp_max_chars, blocked)
+        if not windowed:
+            delta_base.retain(e.rel.as_posix() for e in entries)
+    if comp_enabled:
+        _debug_print(
+            f"[Gemini] 提供方：{llm.name}；并发：{comp_concurrency}；限速：{comp_rpm:g} 请求/分钟，{comp_tpm:g} 令牌/分钟（0 表示不限）",
+            '36',
+        )
+        # 预热共享会话：导入/鉴权只在此处发生一次，耗时单独报告，不计入逐项请求
+        try:
+            _quiet_gemini_logs()
+            llm.ensure_ready()
+            if llm.setup_seconds is not None:
+                _debug_print(f"[Gemini] 客户端初始化耗时 {llm.setup_seconds:.2f}s（每进程一次）", '36')
+        except ProviderUnavailable as ex:
+            _debug_print(f"[Gemini] 提供方不可用：{ex}", '31')
+
+    def _local_verdict(pure: str) -> GuardVerdict:
+        gkey = sha256_text(topic_guard.fingerprint() + '\n' + sha256_text(pure))
+        rec = guard_cache.get(gkey) if guard_cache is not None else None
+        if rec is not None:
+            return GuardVerdict.from_dict(rec)
+        verdict = topic_guard.classify(pure)
+        if guard_cache is not None:
+            guard_cache.put(gkey, verdict.to_dict())
+        return verdict
+
+    def _job(pure: str, blk: Optional[List[str]]) -> SummaryOutcome:
+        start = time.perf_counter()
+        try:
+            return summarize_with_retry(
+                pure, comp_model_alias, comp_max_chars, comp_principles, blk, limiter,
+                chunk_tokens=comp_chunk_tokens,
+                reduce_fan_in=comp_fan_in,
+                map_workers=comp_map_workers,
+                digest_cache=digest_cache,
+                provider=llm,
+                retry=retry_policy,
+            )
+        finally:
+            METRICS.observe('doc_summary_latency_s', METRICS.add_time('summary.doc', start, cat='llm'))
+
+    def _delta_job(pure: str, blk: Optional[List[str]], prev_summary: str, diff: SectionDiff, chain: int) -> SummaryOutcome:
+        # 增量更新；失败（非致命）时补请求完整摘要
+        info = dict(diff.info(), chain=chain + 1, applied=True)
+        start = time.perf_counter()
+        try:
+            ok, res, err = run_gemini_update_summary(
+                prev_summary, diff, comp_model_alias, comp_max_chars,
+                principles=comp_principles, blocked_topics=blk,
+                rate_limiter=limiter, provider=llm, retry=retry_policy,
+            )
+        finally:
+            METRICS.observe('incremental_latency_s', METRICS.add_time('summary.incremental', start, cat='llm'))
+        if ok and isinstance(res, dict):
+            return SummaryOutcome(requested=True, ok=True, excluded=res, attempts=1, incremental=info)
+        if ok and isinstance(res, str) and res:
+            return SummaryOutcome(requested=True, ok=True, text=res, attempts=1, incremental=info)
+        if error_kind(err) in FATAL_KINDS:
+            return SummaryOutcome(requested=True, ok=False, error=err, attempts=1, fatal=True,
+                                  incremental=dict(info, applied=False))
+        outcome = _fallback_job(pure, blk)
+        outcome.incremental = dict(info, applied=False, chain=0)
+        return outcome
+
+    def _fallback_job(pure: str, blk: Optional[List[str]]) -> SummaryOutcome:
+        # 打包遗漏 / 增量更新失败后的逐篇补请求：发出前核对请求额度，发出时由 _request 计数
+        if retry_policy.budget.exhausted():
+            return SummaryOutcome(requested=True, ok=False, attempts=0, fallback=True,
+                                  error=f"[{CAP_KIND}] 已达到每次运行请求上限：{retry_policy.budget.limit}")
+        outcome = _job(pure, blk)
+        outcome.fallback = True
+        return outcome
+
+    def _single_job(pure: str, fut: Future, blk: Optional[List[str]]) -> None:
+        try:
+            fut.set_result(_job(pure, blk))
+        except BaseException as ex:
+            fut.set_exception(ex)
+
+    def _pack_job(items: List[Tuple[str, Future, Optional[List[str]]]]) -> None:
+        # 一次请求摘要多篇；模型遗漏或整包失败的条目逐篇补请求。各条目的 Future 在此逐一完成。
+        # 包内任一条目仍需模型做主题检测时，整包附带排除规则。
+        try:
+            with METRICS.stage('summary.pack', cat='llm', docs=len(items)):
+                ok, results, _err = run_gemini_pack_summary(
+                    [pure for pure, _, _ in items], comp_model_alias, comp_max_chars,
+                    principles=comp_principles, blocked_topics=blocked if any(b for _, _, b in items) else None,
+                    rate_limiter=limiter, provider=llm, retry=retry_policy,
+                )
+            if not ok or results is None:
+                results = [None] * len(items)
+            for (pure, fut, blk), res in zip(items, results):
+                if isinstance(res, dict):
+                    fut.set_result(SummaryOutcome(requested=True, ok=True, excluded=res, attempts=1, packed=True))
+                elif isinstance(res, str):
+                    fut.set_result(SummaryOutcome(requested=True, ok=True, text=res, attempts=1, packed=True))
+                else:
+                    fut.set_result(_fallback_job(pure, blk))
+        except BaseException as ex:
+            for _, fut, _ in items:
+                if not fut.done():
+                    fut.set_exception(ex)
+
+    # 从 start_idx 开始继续处理：
+    # - 生产者按时间戳顺序预读条目、准备正文并提交到线程池（在途数量有上限）；
+    # - 短文档（启用打包时）先攒入当前包，达到 token 预算或篇数上限时作为一次请求提交；
+    # - 提交阶段始终等待队首结果，保证 Markdown/JSON 按时间戳顺序落盘，可确定、可续跑。
+    pending: deque = deque()
+    entry_pos = {e.rel.as_posix(): i for i, e in enumerate(entries)} if dup_of else {}
+    budget = retry_policy.budget
+    cap_reached = False
+
+    def hedges_made() -> int:
+        return hedger.hedges if hedger is not None else 0
+
+    next_idx = start_idx
+    window = comp_concurrency * 2 * (pack_max_docs if pack_enabled else 1)
+    pack: List[Tuple[str, Future, Optional[List[str]]]] = []
+    pack_tokens = 0
+
+    def _flush_pack() -> None:
+        nonlocal pack, pack_tokens
+        if len(pack) == 1:
+            pool.submit(_single_job, *pack[0])
+        elif pack:
+            pool.submit(_pack_job, pack)
+        pack, pack_tokens = [], 0
+
+    def _count_outcome(outcome: SummaryOutcome, local: Optional[GuardVerdict]) -> None:
+        if outcome.cached:
+            METRICS.count('summary.cache_hits')
+        elif outcome.requested:
+            METRICS.count('summary.requested')
+            if outcome.ok is False:
+                METRICS.count('summary.failed')
+        if outcome.source_error is not None:
+            METRICS.count('summary.source_skipped')
+        if outcome.packed:
+            METRICS.count('summary.packed')
+        if outcome.incremental is not None:
+            METRICS.count('summary.incremental' if outcome.incremental.get('applied') else 'summary.incremental_fallback')
+        elif outcome.fallback:
+            METRICS.count('summary.pack_missed')
+        if outcome.excluded is not None:
+            by_local = local is not None and local.verdict == GUARD_EXCLUDE
+            METRICS.count('summary.excluded_local' if by_local else 'summary.excluded_model')
+
+    last_flush = time.monotonic()
+    unflushed = 0
+
+    def _save_caches(force: bool = False) -> None:
+        # 缓存只在有改动时写出（SummaryCache 自带脏标记）；未到批量阈值时仅计数。
+        # 中途落盘只为保护新取得的结果：全部命中缓存时仅在退出时检查一次（LRU 顺序未变则不写）
+        nonlocal last_flush, unflushed
+        if not force and (unflushed == 0 or (
+                unflushed < CACHE_FLUSH_ENTRIES and time.monotonic() - last_flush < CACHE_FLUSH_SECONDS)):
+            return
+        with METRICS.stage('cache.save'):
+            for c in (cache, digest_cache, guard_cache):
+                if c is not None:
+                    c.save()
+        last_flush, unflushed = time.monotonic(), 0
+
+    @contextlib.contextmanager
+    def _caches_saved_on_exit() -> Iterator[None]:
+        # 异常或中断（含 KeyboardInterrupt）退出提交循环时同样落盘，避免丢失已付费的请求结果
+        try:
+            yield
+        finally:
+            _save_caches(force=True)
+
+    def _remember(key: Optional[str], outcome: SummaryOutcome) -> None:
+        if cache is not None and key and outcome.ok and not outcome.cached:
+            cache.put(key, {
+                'model': model_resolved,
+                'summary': outcome.text if outcome.excluded is None else None,
+                'excluded': outcome.excluded,
             })
-        comp_info_step = {
-            'enabled': comp_enabled,
-            'provider': 'gemini',
-            'model_alias': comp_model_alias,
-            'model_resolved': _gemini_model_from_alias(comp_model_alias),
-            'max_chars': comp_max_chars,
-            'principles': comp_principles,
-        }
-        write_json_summaries(out_json, summaries, source_dirs_raw, compression=comp_info_step)
-
-    MAX_RETRY = 5
-    RETRY_SLEEP = 3.0
-
-    # 从 start_idx 开始继续处理
-    requests_made_this_run = 0
-    for idx in range(start_idx, len(entries)):
-        e = entries[idx]
-        _debug_print(f"[进度] {idx+1}/{len(entries)}：{e.name}", '36')
-        dt_utc = datetime.fromtimestamp(e.ts, tz=timezone.utc).isoformat()
-        rel_posix = e.rel.as_posix()
 
-        # 内容检测状态（用于记录到 JSON）
-        guard_requested: bool = False
-        guard_hit: Optional[bool] = None
-        guard_err: Optional[str] = None
-        guard_matched: List[str] = []
-
-        summary_requested: bool = False
-        summary_ok: Optional[bool] = None
-        summary_err: Optional[str] = None
-        summary_text: Optional[str] = None
-
-        pure = (e.content or '').strip()
-        # 排除逻辑在提交 LLM 压缩请求时顺便判断
-        if comp_enabled and pure:
-            summary_requested = True
-            if guard_enabled and guard_blocked_topics:
-                guard_requested = True
-            attempt = 0
-            while True:
-                # 首次尝试前按配置等待；后续重试不再二次等待，避免与重试睡眠叠加
-                if attempt == 0 and comp_interval and comp_interval > 0:
-                    _debug_print(f"[Gemini] 等待 {comp_interval}s 后发起请求…", '33')
-                    time.sleep(comp_interval)
-                ok, res, err = run_gemini_summary(
-                    pure, comp_model_alias, comp_max_chars, 0.0, on_progress=None,
-                    principles=comp_principles,
-                    blocked_topics=(guard_blocked_topics if guard_enabled and guard_blocked_topics else None)
+    def _finish_run() -> None:
+        retry_policy.breaker.save()
+        if delta_base is not None:
+            delta_base.save()
+        METRICS.gauge('circuit_breaker', retry_policy.breaker.snapshot())
+        METRICS.gauge('requests_made', budget.used)
+        if hedger is not None:
+            hedger.close()
+            st = hedger.stats()
+            METRICS.gauge('hedging', st)
+            if st.get('helping') is False:
+                _debug_print(
+                    f"[对冲] 本次运行 p99 未改善（{st['p99_improvement_s']:+.3f}s，对冲 {st['hedges']} 次）：对冲只增加了请求量，"
+                    "可调高 percentile 或关闭 compression.hedging",
+                    '33',
                 )
-                # 统计本次运行已发起的请求次数（包含排除/失败/成功）
-                requests_made_this_run += 1
-                if ok and res is not None:
-                    # 若返回为排除 JSON，则仅写入逐项 JSON，并进入下一项（不写 Markdown）
-                    if isinstance(res, dict) and res.get('excluded'):
-                        guard_hit = True
-                        guard_matched = list(res.get('matched') or [])
-
-                        summaries.append({
-                            'path': rel_posix,
-                            'filename': e.name,
-                            'timestamp': e.ts,
-                            'datetime_utc': dt_utc,
-                            'summary': '',
-                            'compression': {
-                                'enabled': comp_enabled,
-                                'requested': True,
-                                'ok': True,
-                                'error': None,
-                            },
-                            'content_guard': {
-                                'enabled': guard_enabled,
-                                'provider': 'gemini',
-                                'requested': guard_requested,
-                                'hit': True,
-                                'matched_topics': sorted(set(guard_matched)),
-                                'error': None,
-                            },
-                            'skipped': True,
-                        })
-
-                        comp_info_step_guard2 = {
-                            'enabled': comp_enabled,
-                            'provider': 'gemini',
-                            'model_alias': comp_model_alias,
-                            'model_resolved': _gemini_model_from_alias(comp_model_alias),
-                            'max_chars': comp_max_chars,
-                            'principles': comp_principles,
-                        }
-                        write_json_summaries(out_json, summaries, source_dirs_raw, compression=comp_info_step_guard2)
-
-                        # 达到请求上限则正常结束
-                        if comp_enabled and comp_max_requests_per_run > 0 and requests_made_this_run >= comp_max_requests_per_run:
-                            remaining = len(entries) - (idx + 1)
-                            print(
-                                f"已按配置处理 {requests_made_this_run} 篇（达到每次运行请求上限：{comp_max_requests_per_run}）。"
-                            )
-                            print(f"已输出中间结果：{out_md} 与 {out_json}。剩余待处理：{remaining} 篇；下次运行将从断点继续。")
-                            return 0
-                        # 跳过当前条目
-                        break
-                    # 正常摘要文本
-                    if isinstance(res, str):
-                        summary_ok, summary_text, summary_err = True, res, None
-                        break
-                if (not ok) and (err == 'Gemini 无返回文本') and (attempt < MAX_RETRY):
-                    attempt += 1
-                    _debug_print(f"[Gemini] 无返回文本，{RETRY_SLEEP}s 后重试（{attempt}/{MAX_RETRY}）…", '33')
-                    time.sleep(RETRY_SLEEP)
+        METRICS.gauge('cap_reached', cap_reached)
+        METRICS.gauge('committed_entries', len(summaries))
+        METRICS.gauge('rate_limit_total_wait_s', round(limiter.total_wait, 6))
+        if cache is not None:
+            METRICS.gauge('summary_cache', cache.stats())
+
+    fmd = out_md.open('a', encoding='utf-8', newline='\n')
+    with fmd, _caches_saved_on_exit(), ThreadPoolExecutor(max_workers=comp_concurrency) as pool, METRICS.stage('summarize'):
+        while pending or (next_idx < len(entries) and not cap_reached):
+            while next_idx < len(entries) and not cap_reached and len(pending) < window:
+                if entries[next_idx].rel.as_posix() in dup_of:
+                    # 近似重复成员：不发请求，提交时沿用代表篇（顺序在前，必已提交）的结果
+                    fut = Future()
+                    fut.set_result(SummaryOutcome())
+                    pending.append((next_idx, fut, None, None, None))
+                    next_idx += 1
                     continue
-                summary_ok, summary_text, summary_err = False, None, err
-                if err == 'Gemini 无返回文本' and attempt >= MAX_RETRY:
-                    print(f"达到最大重试次数（{MAX_RETRY}），在第 {idx+1} 项失败：{e.name}。中断退出以便稍后重试。")
-                    comp_info_step2 = {
-                        'enabled': comp_enabled,
-                        'provider': 'gemini',
-                        'model_alias': comp_model_alias,
-                        'model_resolved': _gemini_model_from_alias(comp_model_alias),
-                        'max_chars': comp_max_chars,
-                        'principles': comp_principles,
-                    }
-                    write_json_summaries(out_json, summaries, source_dirs_raw, compression=comp_info_step2)
-                    return 2
+                content = _read_entry(entries[next_idx], '摘要')
+                if content is None:
+                    fut = Future()
+                    fut.set_result(SummaryOutcome(ok=False, source_error='[source] 源文件已被删除或修改'))
+                    pending.append((next_idx, fut, None, None, None))
+                    next_idx += 1
+                    continue
+                pure = content.strip()
+                key: Optional[str] = None
+                hit: Optional[Dict[str, Any]] = None
+                # 本地预分类：高置信命中直接排除；明确未命中则请求时不再附带排除规则；其余交由模型判断
+                local: Optional[GuardVerdict] = None
+                entry_blocked = blocked
+                if comp_enabled and pure and blocked and topic_guard is not None:
+                    local = _local_verdict(pure)
+                    if local.verdict == GUARD_CLEAR:
+                        entry_blocked = None
+                if comp_enabled and pure and cache is not None and not (local and local.verdict == GUARD_EXCLUDE):
+                    key = make_summary_key(pure, model_resolved, comp_principles, comp_max_chars, entry_blocked)
+                    hit = cache.get(key)
+                tok = estimate_tokens(pure) if comp_enabled and pure and (pack_enabled or delta_base is not None) else 0
+                # 增量基线：足够长的文档记录章节指纹，成功摘要后写入基线；与基线差异足够小时只请求更新
+                inc: Optional[Tuple[str, List[Any]]] = None
+                diff: Optional[SectionDiff] = None
+                base: Optional[Dict[str, Any]] = None
+                if delta_base is not None and tok >= inc_min_tokens and not (local and local.verdict == GUARD_EXCLUDE):
+                    secs = split_sections(pure)
+                    inc = (sha256_text(pure), secs)
+                    if hit is None:
+                        base = delta_base.get(entries[next_idx].rel.as_posix())
+                        diff = plan_update(base, secs, inc_params, inc_max_ratio, inc_max_chain, comp_chunk_tokens)
+                if local is not None and local.verdict == GUARD_EXCLUDE:
+                    fut = Future()
+                    fut.set_result(SummaryOutcome(ok=True, excluded={
+                        'excluded': True, 'matched': local.matched,
+                        'reason': f'本地预分类（得分 {local.score:.2f}）',
+                    }))
+                elif hit is not None:
+                    fut = Future()
+                    fut.set_result(SummaryOutcome(
+                        requested=True, ok=True,
+                        text=hit.get('summary'), excluded=hit.get('excluded'), cached=True,
+                    ))
+                elif diff is not None and diff.empty:
+                    # 章节与基线完全一致（摘要缓存未命中，如已被淘汰）：直接沿用基线摘要
+                    fut = Future()
+                    fut.set_result(SummaryOutcome(
+                        requested=True, ok=True, text=base['summary'], cached=True,
+                        incremental=dict(diff.info(), chain=int(base.get('chain') or 0), applied=True),
+                    ))
+                elif comp_enabled and pure:
+                    packable = pack_enabled and tok <= pack_doc_tokens and diff is None
+                    if pack and not (packable and len(pack) < pack_max_docs and pack_tokens + tok <= pack_budget):
+                        _flush_pack()
+                    if not pack and budget.exhausted():
+                        # 需要发起新请求但已达上限：本项留待下次运行
+                        cap_reached = True
+                        break
+                    if packable:
+                        fut = Future()
+                        pack.append((pure, fut, entry_blocked))
+                        pack_tokens += tok
+                    elif diff is not None:
+                        fut = pool.submit(_delta_job, pure, entry_blocked, base['summary'], diff, int(base.get('chain') or 0))
+                        METRICS.count('incremental.tokens_sent', diff.changed_tokens)
+                        METRICS.count('incremental.tokens_full', tok)
+                    else:
+                        fut = pool.submit(_job, pure, entry_blocked)
+                else:
+                    fut = Future()
+                    fut.set_result(SummaryOutcome())
+                pending.append((next_idx, fut, key, local, inc))
+                next_idx += 1
+            # 队首仍在未发出的包中时先提交该包（否则继续攒包，等待已发出的队首）
+            if pack and any(f is pending[0][1] for _, f, _ in pack):
+                _flush_pack()
+
+            idx, fut, key, local, inc = pending.popleft()
+            if not fut.done():
+                # 提交阶段阻塞等待队首结果的时间（其余条目仍在并发处理）
+                with METRICS.stage('summarize.wait_head', cat='wait'):
+                    outcome: SummaryOutcome = fut.result()
+            else:
+                outcome = fut.result()
+            if error_kind(outcome.error) == CAP_KIND:
+                # 本项的请求因达到上限未能发出：不提交，本项及之后的条目留待下次运行
+                cap_reached = True
                 break
+            _count_outcome(outcome, local)
+            _remember(key, outcome)
+            if outcome.requested and not outcome.cached:
+                unflushed += 1
+            _save_caches()
+            e = entries[idx]
+            _debug_print(f"[进度] {idx+1}/{len(entries)}：{e.name}", '36')
+            dt_utc = datetime.fromtimestamp(e.ts, tz=timezone.utc).isoformat()
+            rel_posix = e.rel.as_posix()
+
+            if rel_posix in dup_of:
+                rep_path, sim = dup_of[rel_posix]
+                rep_rec = summaries[entry_pos[rep_path]]  # summaries 与 entries 按下标一一对应
+                rec = {
+                    'path': rel_posix,
+                    'filename': e.name,
+                    'timestamp': e.ts,
+                    'datetime_utc': dt_utc,
+                    'summary': rep_rec.get('summary') or '',
+                    'compression': {
+                        'enabled': comp_enabled,
+                        'requested': False,
+                        'ok': None,
+                        'error': None,
+                        'cached': False,
+                        'packed': False,
+                        'fallback': None,
+                    },
+                    'content_guard': rep_rec.get('content_guard'),
+                    'skipped': bool(rep_rec.get('skipped')),
+                    'duplicate_of': {'path': rep_path, 'similarity': sim},
+                }
+                if not rec['skipped'] and not collapse_dups:
+                    fmd.write('---\n\n')
+                    fmd.write(f"## [{idx+1}/{len(entries)}] {e.name}\n\n")
+                    fmd.write(f"- 源路径：`{rel_posix}`\n")
+                    fmd.write(f"- 时间戳：`{e.ts}`；UTC：`{dt_utc}`\n")
+                    fmd.write(_md_dup_lines(rec))
+                    fmd.write("\n" + rec['summary'].strip() + "\n\n")
+                    fmd.flush()
+                summaries.append(rec)
+                journal.append(rec)
+                METRICS.count('summary.duplicates')
+                continue
 
-            # 如被判定排除，则跳过摘要写入逻辑
-            if guard_hit is True:
+            if outcome.source_error is not None:
+                # 不写 Markdown；逐项 JSON 记为跳过，续跑时从该项重新处理
+                rec = {
+                    'path': rel_posix,
+                    'filename': e.name,
+                    'timestamp': e.ts,
+                    'datetime_utc': dt_utc,
+                    'summary': '',
+                    'compression': {
+                        'enabled': comp_enabled,
+                        'requested': False,
+                        'ok': False,
+                        'error': outcome.source_error,
+                        'cached': False,
+                        'packed': False,
+                        'fallback': None,
+                    },
+                    'content_guard': None,
+                    'skipped': True,
+                }
+                if rel_posix in dup_members:
+                    rec['duplicates'] = dup_members[rel_posix]
+                if delta_base is not None:
+                    delta_base.discard(rel_posix)
+                summaries.append(rec)
+                journal.append(rec)
                 continue
 
-            if not summary_text:
-                summary_text = (pure[:comp_max_chars] + ('……' if len(pure) > comp_max_chars else ''))
-        else:
-            summary_text = (pure[:comp_max_chars] + ('……' if len(pure) > comp_max_chars else '')) if pure else ''
+            if outcome.fatal:
+                print(f"请求失败（{outcome.error}），在第 {idx+1} 项中断：{e.name}。已保存进度，稍后重新运行将从该项继续。")
+                _compact()
+                _save_caches(force=True)
+                pool.shutdown(wait=False, cancel_futures=True)
+                _finish_run()
+                return 2
+
+            # 若返回为排除 JSON，则仅写入逐项 JSON，并进入下一项（不写 Markdown）
+            if outcome.excluded is not None:
+                # 本地预分类直接排除时未发起请求；content_guard.provider 记为 local
+                by_local = local is not None and local.verdict == GUARD_EXCLUDE
+                rec = {
+                    'path': rel_posix,
+                    'filename': e.name,
+                    'timestamp': e.ts,
+                    'datetime_utc': dt_utc,
+                    'summary': '',
+                    'compression': {
+                        'enabled': comp_enabled,
+                        'requested': not by_local,
+                        'ok': True,
+                        'error': None,
+                        'cached': outcome.cached,
+                        'packed': outcome.packed,
+                    },
+                    'content_guard': {
+                        'enabled': guard_enabled,
+                        'provider': 'local' if by_local else llm.name,
+                        'requested': guard_requested,
+                        'hit': True,
+                        'matched_topics': sorted(set(outcome.excluded.get('matched') or [])),
+                        'error': None,
+                    },
+                    'skipped': True,
+                }
+                if local is not None:
+                    rec['content_guard']['local_score'] = local.score
+                if outcome.incremental is not None:
+                    rec['compression']['incremental'] = outcome.incremental
+                if rel_posix in dup_members:
+                    rec['duplicates'] = dup_members[rel_posix]
+                if delta_base is not None:
+                    delta_base.discard(rel_posix)
+                summaries.append(rec)
+                journal.append(rec)
+                continue
+
+            summary_text = outcome.text
+            fallback_used: Optional[str] = None
+            # 正文只在需要本地回退时再读一次；提交阶段不持有正文
+            pure = '' if summary_text else (_read_entry(e, '本地替代摘要') or '').strip()
+            if not summary_text and pure:
+                with METRICS.stage(f'fallback.{comp_fallback}'):
+                    summary_text = _fallback_summary(pure, comp_max_chars, comp_fallback)
+                fallback_used = comp_fallback
+                METRICS.count(f'summary.fallback_{comp_fallback}')
 
-        with out_md.open('a', encoding='utf-8', newline='\n') as fmd:
             fmd.write('---\n\n')
             fmd.write(f"## [{idx+1}/{len(entries)}] {e.name}\n\n")
             fmd.write(f"- 源路径：`{rel_posix}`\n")
-            fmd.write(f"- 时间戳：`{e.ts}`；UTC：`{dt_utc}`\n\n")
-            fmd.write((summary_text or '').strip() + "\n\n")
-
-        summaries.append({
-            'path': rel_posix,
-            'filename': e.name,
-            'timestamp': e.ts,
-            'datetime_utc': dt_utc,
-            'summary': summary_text,
-            'compression': {
-                'enabled': comp_enabled,
-                'requested': summary_requested,
-                'ok': summary_ok if summary_requested else None,
-                'error': summary_err if summary_requested else None,
-            },
-            'content_guard': {
-                'enabled': guard_enabled,
-                'provider': 'gemini',
-                'requested': guard_requested,
-                'hit': guard_hit if guard_hit is not None else False,
-                'matched_topics': sorted(set(guard_matched)) if guard_matched else [],
-                'error': guard_err,
-            },
-            'skipped': False,
-        })
-
-        comp_info_step = {
-            'enabled': comp_enabled,
-            'provider': 'gemini',
-            'model_alias': comp_model_alias,
-            'model_resolved': _gemini_model_from_alias(comp_model_alias),
-            'max_chars': comp_max_chars,
-            'principles': comp_principles,
-        }
-        write_json_summaries(out_json, summaries, source_dirs_raw, compression=comp_info_step)
-
-        # 若配置了“每次运行请求上限”，达到后立即正常结束（便于分批执行与限速）
-        if comp_enabled and comp_max_requests_per_run > 0 and requests_made_this_run >= comp_max_requests_per_run:
-            remaining = len(entries) - (idx + 1)
-            print(
-                f"已按配置处理 {requests_made_this_run} 篇（达到每次运行请求上限：{comp_max_requests_per_run}）。"
-            )
-            print(f"已输出中间结果：{out_md} 与 {out_json}。剩余待处理：{remaining} 篇；下次运行将从断点继续。")
-            return 0
+            fmd.write(f"- 时间戳：`{e.ts}`；UTC：`{dt_utc}`\n")
+            fmd.write(_md_dup_lines({'duplicates': dup_members.get(rel_posix)}))
+            fmd.write("\n" + (summary_text or '').strip() + "\n\n")
+            fmd.flush()
+
+            rec = {
+                'path': rel_posix,
+                'filename': e.name,
+                'timestamp': e.ts,
+                'datetime_utc': dt_utc,
+                'summary': summary_text,
+                'compression': {
+                    'enabled': comp_enabled,
+                    'requested': outcome.requested,
+                    'ok': outcome.ok if outcome.requested else None,
+                    'error': outcome.error if outcome.requested else None,
+                    'cached': outcome.cached,
+                    'packed': outcome.packed,
+                    'fallback': fallback_used,
+                },
+                'content_guard': {
+                    'enabled': guard_enabled,
+                    # 本地预分类明确放行时请求不附带排除规则
+                    'provider': 'local' if (local is not None and local.verdict == GUARD_CLEAR) else llm.name,
+                    'requested': guard_requested and outcome.requested,
+                    'hit': False,
+                    'matched_topics': [],
+                    'error': None,
+                },
+                'skipped': False,
+            }
+            if local is not None:
+                rec['content_guard']['local_score'] = local.score
+            if outcome.incremental is not None:
+                rec['compression']['incremental'] = outcome.incremental
+            if rel_posix in dup_members:
+                rec['duplicates'] = dup_members[rel_posix]
+            if delta_base is not None and inc is not None and outcome.ok and outcome.text:
+                # 只以模型摘要作为基线（本地替代摘要不作为增量更新的起点）
+                applied = outcome.incremental is not None and outcome.incremental.get('applied')
+                delta_base.put(rel_posix, inc[0], inc_params, inc[1], outcome.text,
+                               chain=outcome.incremental['chain'] if applied else 0)
+            summaries.append(rec)
+            journal.append(rec)
+
+        if cap_reached:
+            # 未发出的包直接丢弃；在途条目等其结束（额度已用尽，不再发出新请求），
+            # 已取得的结果写入摘要缓存，下次运行直接命中，不重复付费
+            unsent = {id(f) for _, f, _ in pack}
+            pack = []
+            for _, f, k, _, _ in pending:
+                if id(f) not in unsent and f.exception() is None:
+                    _remember(k, f.result())
+
+    if cache is not None and comp_enabled:
+        st = cache.stats()
+        _debug_print(f"[缓存] 命中 {st['hits']}，未命中 {st['misses']}，淘汰 {st['evictions']}；现有 {st['entries']} 条", '36')
+
+    _finish_run()
+    # 若配置了“每次运行请求上限”，达到后正常结束（便于分批执行与限速）
+    if cap_reached:
+        remaining = len(entries) - len(summaries)
+        print(
+            f"已按配置发起 {budget.used} 次请求（"
+            + (f"含对冲 {hedges_made()} 次；" if hedges_made() else '')
+            + f"达到每次运行请求上限：{comp_max_requests_per_run}）。"
+        )
+        _compact()
+        print(f"已输出中间结果：{out_md} 与 {out_json}。剩余待处理：{remaining} 篇；下次运行将从断点继续。")
+        return 0
 
     _debug_print(f"[合并] 已写入 Markdown：{out_md}", '32')
 
-    # 3) 写入精简 JSON（仅包含逐项摘要）
-    comp_info = {
-        'enabled': comp_enabled,
-        'provider': 'gemini',
-        'model_alias': comp_model_alias,
-        'model_resolved': _gemini_model_from_alias(comp_model_alias),
-        'max_chars': comp_max_chars,
-        'principles': comp_principles,
-    }
-    write_json_summaries(out_json, summaries, source_dirs_raw, compression=comp_info)
+    # 3) 由日志压缩生成精简 JSON（仅包含逐项摘要）
+    _compact()
     _debug_print(f"[合并] 已写入 JSON（摘要）：{out_json}", '32')
 
     print(f"完成：JSON（全文） -> {out_json_all}")
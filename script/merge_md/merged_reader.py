@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: GPL-3.0-only
+# Copyright (C) 2025 GaoZheng
+
+"""
+完整合并结果（`out/merge_md_by_timestamp_all.json|.jsonl` 或分片目录）的随机读取。
+
+- 旁路索引：写出合并文件时同时生成 `<数据文件名>.idx.json`，
+  内容为 `{"version", "data", "data_bytes", "entries": [[path, ts, offset, length], ...]}`（按时间戳升序），
+  offset/length 为该条记录在数据文件中的字节区间；`encoding` 为记录编码（json 或 msgpack，缺省 json）。
+- 仅未压缩格式（json/jsonl/msgpack）带索引；jsonl.gz/jsonl.zst 只能经 `record_formats.load_records` 顺序读取。
+- 读取：数据文件经 mmap 映射，`get(path)` / `range(ts_from, ts_to)` / 迭代只切片并解码所需记录，
+  不解析整个文件；时间范围以 bisect 定位。
+- 分片输出（`<stem>_all/manifest.json`）按清单逐片加载索引，对外表现为一个整体。
+- 数据文件大小与索引记录不符时视为过期，抛出 ValueError（重新运行合并脚本即可重建）。
+
+示例：
+    from merged_reader import MergedReader
+    with MergedReader('out/merge_md_by_timestamp_all.json') as r:
+        doc = r.get('src/kernel_reference/1751598299_xxx.md')
+        for rec in r.range(1751328000, 1754006399):
+            ...
+"""
+
+from __future__ import annotations
+
+import json
+import mmap
+import os
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from record_formats import decode_record
+
+
+INDEX_VERSION = 1
+INDEX_SUFFIX = '.idx.json'
+
+
+def index_path_for(data_path: Path) -> Path:
+    return data_path.with_name(data_path.name + INDEX_SUFFIX)
+
+
+def write_index(
+    data_path: Path,
+    keys: Sequence[Tuple[str, int]],
+    spans: Sequence[Tuple[int, int]],
+    data_bytes: int,
+    encoding: str = 'json',
+) -> Path:
+    """写出 `data_path` 的旁路索引；keys（path, ts）与 spans 按写出顺序一一对应。"""
+    rows = [[path, int(ts), off, length] for (path, ts), (off, length) in zip(keys, spans)]
+    payload = {'version': INDEX_VERSION, 'data': data_path.name, 'data_bytes': int(data_bytes),
+               'encoding': encoding, 'entries': rows}
+    out = index_path_for(data_path)
+    tmp = out.with_name(out.name + '.tmp')
+    with tmp.open('w', encoding='utf-8', newline='\n') as f:
+        json.dump(payload, f, ensure_ascii=False, separators=(',', ':'))
+        f.write('\n')
+    os.replace(tmp, out)
+    return out
+
+
+class _Segment:
+    """单个数据文件及其索引；mmap 在首次读取时建立。"""
+
+    def __init__(self, data_path: Path) -> None:
+        self.data_path = data_path
+        idx_path = index_path_for(data_path)
+        if not idx_path.exists():
+            raise ValueError(f"缺少旁路索引（压缩格式 jsonl.gz/jsonl.zst 不支持随机读取）：{idx_path}")
+        with idx_path.open('r', encoding='utf-8') as f:
+            idx = json.load(f)
+        if not isinstance(idx, dict) or idx.get('version') != INDEX_VERSION:
+            raise ValueError(f"不支持的索引：{idx_path}")
+        size = data_path.stat().st_size
+        if int(idx.get('data_bytes', -1)) != size:
+            raise ValueError(f"索引已过期（数据文件 {size} 字节，索引记录 {idx.get('data_bytes')} 字节）：{idx_path}")
+        self.encoding = str(idx.get('encoding') or 'json')
+        self.entries: List[Tuple[str, int, int, int]] = [(str(p), int(ts), int(o), int(n)) for p, ts, o, n in idx['entries']]
+        self._f = None
+        self._mm: Optional[mmap.mmap] = None
+
+    def read(self, offset: int, length: int) -> Dict[str, Any]:
+        if self._mm is None:
+            self._f = self.data_path.open('rb')
+            self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+        return decode_record(self._mm[offset:offset + length], self.encoding)
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+
+class MergedReader:
+    """按路径/时间范围随机读取完整合并结果的记录（含 content）。"""
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        p = Path(path)
+        if p.is_dir():
+            p = p / 'manifest.json'
+        if p.name == 'manifest.json':
+            with p.open('r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            self.segments = [_Segment(p.parent / str(s['file'])) for s in manifest.get('shards') or []]
+        else:
+            self.segments = [_Segment(p)]
+        # (ts, path, 分片序号, offset, length)，全局按时间戳升序
+        rows: List[Tuple[int, str, int, int, int]] = []
+        for si, seg in enumerate(self.segments):
+            rows.extend((ts, path_, si, off, n) for path_, ts, off, n in seg.entries)
+        rows.sort()
+        self._rows = rows
+        self._ts = [r[0] for r in rows]
+        self._by_path: Dict[str, int] = {r[1]: i for i, r in enumerate(rows)}
+
+    def __enter__(self) -> 'MergedReader':
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        for seg in self.segments:
+            seg.close()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, path: str) -> bool:
+        return path in self._by_path
+
+    def _load(self, i: int) -> Dict[str, Any]:
+        _, _, si, off, n = self._rows[i]
+        return self.segments[si].read(off, n)
+
+    def paths(self) -> List[str]:
+        return [r[1] for r in self._rows]
+
+    def get(self, path: str) -> Optional[Dict[str, Any]]:
+        i = self._by_path.get(path)
+        return None if i is None else self._load(i)
+
+    def range(self, ts_from: Optional[int] = None, ts_to: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """时间戳落在闭区间 [ts_from, ts_to] 内的记录（按时间戳升序）。"""
+        lo = bisect_left(self._ts, ts_from) if ts_from is not None else 0
+        hi = bisect_right(self._ts, ts_to) if ts_to is not None else len(self._ts)
+        for i in range(lo, hi):
+            yield self._load(i)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return self.range()
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: GPL-3.0-only
+# Copyright (C) 2025 GaoZheng
+
+"""
+跨来源目录的近似重复检测（供 `merge_md_by_timestamp.py` 使用）。
+
+- 特征：去空白、小写后的字符 k-gram（默认 5 元）；每个 k-gram 以多项式哈希 + splitmix64 混合得到 64 位值。
+- 签名：单排列 MinHash（one-permutation hashing）——每个 k-gram 只哈希一次，按哈希值分入 num_perm 个桶取桶内最小值，
+  空桶按环形就近借值（densification）；签名相同位置的比例即 Jaccard 相似度的估计。
+- 候选：LSH 分带（bands × rows 按阈值选取），同一带内签名完全相同的文档互为候选，再以签名估计值核验。
+- 分组：按给定顺序（时间戳升序）逐篇处理，与已有代表篇的估计相似度 >= threshold 时并入该组，否则自成代表；
+  不做传递合并，组内每篇与代表篇的相似度都不低于阈值。
+- 索引：`out/<script_stem>.dedupe_index.json` 按路径记录正文 sha256 与签名；正文未变时复用签名，参数变化时整体失效。
+- 依赖：NumPy 可用时向量化计算签名；否则使用纯 Python 实现（结果一致）。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+try:  # 可选依赖：未安装时使用纯 Python 实现
+    import numpy as np  # type: ignore
+except Exception:  # pragma: no cover - 取决于环境
+    np = None  # type: ignore
+
+
+INDEX_VERSION = 1
+MASK64 = (1 << 64) - 1
+_POLY_BASE = 0x100000001B3  # FNV-64 素数，作为 k-gram 多项式哈希的底
+_WS_RE = re.compile(r"\s+")
+
+
+def _splitmix64(x: int) -> int:
+    x = (x ^ (x >> 30)) * 0xBF58476D1CE4E5B9 & MASK64
+    x = (x ^ (x >> 27)) * 0x94D049BB133111EB & MASK64
+    return x ^ (x >> 31)
+
+
+def normalize(text: str) -> str:
+    return _WS_RE.sub('', text or '').lower()
+
+
+def _shingle_hashes_py(s: str, k: int) -> List[int]:
+    cps = [ord(c) for c in s]
+    pw = [pow(_POLY_BASE, j, 1 << 64) for j in range(k)]
+    out: List[int] = []
+    for i in range(len(cps) - k + 1):
+        h = 0
+        for j in range(k):
+            h += cps[i + j] * pw[j]
+        out.append(_splitmix64(h & MASK64))
+    return out
+
+
+def _densify(sig: List[int], num_perm: int) -> Optional[List[int]]:
+    """空桶（None）按环形向右就近借值，偏移量计入以区分来源桶。"""
+    if all(v is None for v in sig):
+        return None
+    step = MASK64 // num_perm + 1
+    out: List[int] = []
+    for j in range(num_perm):
+        t = 0
+        while sig[(j + t) % num_perm] is None:
+            t += 1
+        out.append((sig[(j + t) % num_perm] + t * step) & MASK64)
+    return out
+
+
+def signature(text: str, num_perm: int = 128, k: int = 5) -> Optional[List[int]]:
+    """单排列 MinHash 签名；正文不足 k 个字符时返回 None。"""
+    s = normalize(text)
+    if len(s) < k:
+        return None
+    if np is not None:
+        cps = np.frombuffer(s.encode('utf-32-le'), dtype='<u4').astype(np.uint64)
+        n = len(cps) - k + 1
+        h = np.zeros(n, dtype=np.uint64)
+        for j in range(k):
+            h += cps[j:j + n] * np.uint64(pow(_POLY_BASE, j, 1 << 64))
+        h ^= h >> np.uint64(30)
+        h *= np.uint64(0xBF58476D1CE4E5B9)
+        h ^= h >> np.uint64(27)
+        h *= np.uint64(0x94D049BB133111EB)
+        h ^= h >> np.uint64(31)
+        bins = (h % np.uint64(num_perm)).astype(np.int64)
+        vals = h // np.uint64(num_perm)
+        mins = np.full(num_perm, np.iinfo(np.uint64).max, dtype=np.uint64)
+        np.minimum.at(mins, bins, vals)
+        filled = np.zeros(num_perm, dtype=bool)
+        filled[bins] = True
+        raw: List[Optional[int]] = [int(v) if f else None for v, f in zip(mins.tolist(), filled.tolist())]
+    else:
+        raw = [None] * num_perm
+        for h in _shingle_hashes_py(s, k):
+            b, v = h % num_perm, h // num_perm
+            cur = raw[b]
+            if cur is None or v < cur:
+                raw[b] = v
+    return _densify(raw, num_perm)
+
+
+def similarity(a: List[int], b: List[int]) -> float:
+    if not a or not b or len(a) != len(b):
+        return 0.0
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+
+def lsh_params(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """选取 (bands, rows)：使阈值两侧的漏检与误检概率积分之和最小。"""
+
+    def _integral(f, lo: float, hi: float, steps: int = 50) -> float:
+        if hi <= lo:
+            return 0.0
+        w = (hi - lo) / steps
+        return sum(f(lo + (i + 0.5) * w) for i in range(steps)) * w
+
+    best = (1, num_perm)
+    best_err = float('inf')
+    for r in range(1, num_perm + 1):
+        b = num_perm // r
+        fp = _integral(lambda s: 1.0 - (1.0 - s ** r) ** b, 0.0, threshold)
+        fn = _integral(lambda s: (1.0 - s ** r) ** b, threshold, 1.0)
+        if fp + fn < best_err:
+            best, best_err = (b, r), fp + fn
+    return best
+
+
+class NearDupIndex:
+    """按路径持久化签名的近似重复索引；`update` 之后 `groups` 给出分组。"""
+
+    def __init__(self, path: Optional[Path], threshold: float = 0.85, num_perm: int = 128, shingle_chars: int = 5) -> None:
+        self.path = path
+        self.threshold = float(threshold)
+        self.num_perm = max(8, int(num_perm))
+        self.k = max(1, int(shingle_chars))
+        self.bands, self.rows = lsh_params(self.threshold, self.num_perm)
+        self.sigs: Dict[str, Optional[List[int]]] = {}
+        self._hashes: Dict[str, str] = {}
+        self._old: Dict[str, Tuple[str, Optional[List[int]]]] = {}
+        self.computed = 0
+        self.reused = 0
+        self._load()
+
+    def _params(self) -> Dict[str, int]:
+        return {'num_perm': self.num_perm, 'shingle_chars': self.k}
+
+    def _load(self) -> None:
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            with self.path.open('r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception:
+            return
+        if not isinstance(data, dict) or data.get('version') != INDEX_VERSION or data.get('params') != self._params():
+            return
+        for p, rec in (data.get('docs') or {}).items():
+            if isinstance(rec, dict) and isinstance(rec.get('sha256'), str):
+                self._old[p] = (rec['sha256'], rec.get('signature'))
+
+    def update(self, docs: Iterable[Tuple[str, str]]) -> None:
+        """以 (路径, 正文) 更新索引；正文哈希未变时复用签名，不在 docs 中的路径被移除。"""
+        self.update_hashed(
+            (rel, hashlib.sha256((text or '').encode('utf-8')).hexdigest(), (lambda t=text: t))
+            for rel, text in docs
+        )
+
+    def update_hashed(self, docs: Iterable[Tuple[str, str, Callable[[], str]]]) -> None:
+        """同 update，但由调用方给出 (路径, 内容哈希, 取正文的回调)：哈希未变时复用签名且不取正文。
+
+        合并脚本以源文件原始字节的 sha256 为哈希（UTF-8 且换行为 LF 的文件与正文哈希相同），
+        未变文件因此无需读取。
+        """
+        self.sigs, self._hashes = {}, {}
+        for rel, sha, load in docs:
+            old = self._old.get(rel)
+            if old is not None and old[0] == sha:
+                sig = old[1]
+                self.reused += 1
+            else:
+                sig = signature(load(), self.num_perm, self.k)
+                self.computed += 1
+            self.sigs[rel] = sig
+            self._hashes[rel] = sha
+
+    def groups(self, order: List[str]) -> Dict[str, Tuple[str, float]]:
+        """按 order 顺序分组；返回 成员路径 -> (代表路径, 估计相似度)，代表篇本身不出现在键中。"""
+        buckets: Dict[Tuple[int, Tuple[int, ...]], List[str]] = {}
+        out: Dict[str, Tuple[str, float]] = {}
+        for rel in order:
+            sig = self.sigs.get(rel)
+            if not sig:
+                continue
+            keys = [(b, tuple(sig[b * self.rows:(b + 1) * self.rows])) for b in range(self.bands)]
+            best: Optional[Tuple[float, str]] = None
+            seen = set()
+            for key in keys:
+                for rep in buckets.get(key, ()):
+                    if rep in seen:
+                        continue
+                    seen.add(rep)
+                    sim = similarity(sig, self.sigs[rep])
+                    if sim >= self.threshold and (best is None or sim > best[0]):
+                        best = (sim, rep)
+            if best is not None:
+                out[rel] = (best[1], round(best[0], 4))
+                continue
+            # 只有代表篇进入分桶，成员不再作为后续文档的候选
+            for key in keys:
+                buckets.setdefault(key, []).append(rel)
+        return out
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        data = {
+            'version': INDEX_VERSION,
+            'params': self._params(),
+            'docs': {p: {'sha256': self._hashes[p], 'signature': self.sigs[p]} for p in sorted(self.sigs)},
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        with tmp.open('w', encoding='utf-8', newline='\n') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+            f.write('\n')
+        os.replace(tmp, self.path)
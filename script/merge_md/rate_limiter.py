@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: GPL-3.0-only
+# Copyright (C) 2025 GaoZheng
+
+"""
+令牌桶限速器（供 `merge_md_by_timestamp.py` 的并发摘要阶段使用）。
+
+- 同时按“请求数/分钟”与“令牌数/分钟”两个维度限速；任一维度 <= 0 表示不限制。
+- 线程安全：多个工作线程可共享同一个实例；`acquire` 会阻塞直至两个桶均有余量。
+- 令牌数为离线估算值（见 `estimate_tokens`），仅用于配额控制，不追求精确。
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+import time
+from typing import Optional
+
+
+_CJK = r"\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef"
+_TOKEN_PIECE_RE = re.compile(rf"[{_CJK}]|\\[A-Za-z]+|[A-Za-z]+|\d+|[^\s{_CJK}A-Za-z\d]")
+
+
+def estimate_tokens(text: str) -> int:
+    """离线估算中英混排 + LaTeX 文本的 token 数（偏保守，仅用于限速与分块）。
+
+    规则：CJK 字符 1/字；LaTeX 控制序列（如 `\\alpha`）1/个；英文单词约 4 字母/token；
+    数字约 3 位/token；其余非空白符号 1/个。
+    """
+    if not text:
+        return 0
+    n = 0
+    for piece in _TOKEN_PIECE_RE.findall(text):
+        c = piece[0]
+        if c.isascii() and c.isalpha():
+            n += (len(piece) + 3) // 4
+        elif c.isdigit() and c.isascii():
+            n += (len(piece) + 2) // 3
+        else:
+            n += 1
+    return n
+
+
+class TokenBucket:
+    """双令牌桶：requests/minute 与 tokens/minute。
+
+    `burst` 为请求桶容量（默认 1，即请求均匀间隔发出）；令牌桶容量等于每分钟令牌数，
+    单次需求超过容量时按容量截断，避免永久阻塞。
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float = 0.0,
+        tokens_per_minute: float = 0.0,
+        burst: Optional[float] = None,
+    ) -> None:
+        self.rpm = max(0.0, float(requests_per_minute or 0))
+        self.tpm = max(0.0, float(tokens_per_minute or 0))
+        self.req_capacity = max(1.0, float(burst)) if burst else 1.0
+        self.tok_capacity = self.tpm
+        self._req = self.req_capacity
+        self._tok = self.tok_capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+        self.total_wait = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.rpm > 0 or self.tpm > 0
+
+    def _refill(self, now: float) -> None:
+        elapsed = max(0.0, now - self._last)
+        self._last = now
+        if self.rpm > 0:
+            self._req = min(self.req_capacity, self._req + elapsed * self.rpm / 60.0)
+        if self.tpm > 0:
+            self._tok = min(self.tok_capacity, self._tok + elapsed * self.tpm / 60.0)
+
+    def try_acquire(self, tokens: int = 0) -> bool:
+        """不等待：额度足够时立即扣除并返回 True，否则返回 False（不扣除）。"""
+        if not self.enabled:
+            return True
+        need_tok = min(float(max(0, tokens)), self.tok_capacity) if self.tpm > 0 else 0.0
+        with self._lock:
+            self._refill(time.monotonic())
+            if (self.rpm > 0 and self._req < 1.0) or (self.tpm > 0 and self._tok < need_tok):
+                return False
+            if self.rpm > 0:
+                self._req -= 1.0
+            if self.tpm > 0:
+                self._tok -= need_tok
+            return True
+
+    def acquire(self, tokens: int = 0) -> float:
+        """阻塞直至可发出一次请求（消耗 1 个请求额度与 `tokens` 个令牌）；返回累计等待秒数。"""
+        if not self.enabled:
+            return 0.0
+        need_tok = min(float(max(0, tokens)), self.tok_capacity) if self.tpm > 0 else 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                wait = 0.0
+                if self.rpm > 0 and self._req < 1.0:
+                    wait = max(wait, (1.0 - self._req) * 60.0 / self.rpm)
+                if self.tpm > 0 and self._tok < need_tok:
+                    wait = max(wait, (need_tok - self._tok) * 60.0 / self.tpm)
+                if wait <= 0:
+                    if self.rpm > 0:
+                        self._req -= 1.0
+                    if self.tpm > 0:
+                        self._tok -= need_tok
+                    self.total_wait += waited
+                    return waited
+            time.sleep(wait)
+            waited += wait
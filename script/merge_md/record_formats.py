@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: GPL-3.0-only
+# Copyright (C) 2025 GaoZheng
+
+"""
+完整合并结果的输出格式与加载器（供 `merge_md_by_timestamp.py --format` 使用）。
+
+| 格式        | 扩展名          | 说明                                                         | 依赖         |
+|-------------|-----------------|--------------------------------------------------------------|--------------|
+| `json`      | `.json`         | 既往格式：`indent=2` 的单个 JSON 对象（头部 + `files` 列表）   | —            |
+| `jsonl`     | `.jsonl`        | 首行为头部（`"kind": "header"`），其后每行一条紧凑 JSON         | —            |
+| `jsonl.gz`  | `.jsonl.gz`     | gzip 压缩的 jsonl（mtime 置 0，输出可复现）                    | —            |
+| `jsonl.zst` | `.jsonl.zst`    | zstd 压缩的 jsonl                                             | `zstandard`  |
+| `msgpack`   | `.msgpack`      | 长度前缀帧：每帧为 4 字节大端长度 + MessagePack 对象；首帧为头部 | `msgpack`    |
+
+- 未压缩的格式（json/jsonl/msgpack）写出时可记录每条记录的字节区间，供旁路索引随机读取；
+  压缩格式只能顺序读取。
+- 可选依赖按需导入；缺失时 `missing_dependency(fmt)` 给出提示，不影响其他格式。
+- `load_records(path)` 按扩展名识别格式，返回 (头部, 记录迭代器)。
+"""
+
+from __future__ import annotations
+
+import gzip
+import io
+import json
+import struct
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from stream_writers import ByteCountingWriter, write_json_streaming, write_jsonl
+
+
+FORMATS = ('json', 'jsonl', 'jsonl.gz', 'jsonl.zst', 'msgpack')
+INDEXED_FORMATS = ('json', 'jsonl', 'msgpack')  # 支持字节偏移旁路索引
+_DEPS = {'jsonl.zst': 'zstandard', 'msgpack': 'msgpack'}
+_FRAME = struct.Struct('>I')
+
+
+def _import(name: str) -> Any:
+    return __import__(name)
+
+
+def missing_dependency(fmt: str) -> Optional[str]:
+    """格式所需的可选依赖缺失时返回提示文本，否则返回 None。"""
+    mod = _DEPS.get(fmt)
+    if not mod:
+        return None
+    try:
+        _import(mod)
+    except Exception:
+        return f"--format {fmt} 需要安装 `{mod}`（pip install {mod}）"
+    return None
+
+
+def format_from_path(path: Path) -> str:
+    name = path.name
+    for fmt in sorted(FORMATS, key=len, reverse=True):
+        if name.endswith('.' + fmt):
+            return fmt
+    raise ValueError(f"无法从文件名识别格式：{path}")
+
+
+def record_encoding(fmt: str) -> str:
+    """旁路索引中单条记录的编码：msgpack 或 json。"""
+    return 'msgpack' if fmt == 'msgpack' else 'json'
+
+
+def write_records(
+    raw: BinaryIO,
+    fmt: str,
+    head: List[Tuple[str, Any]],
+    records: Iterator[Dict[str, Any]],
+    tail: Optional[List[Tuple[str, Any]]] = None,
+    spans: Optional[List[Tuple[int, int]]] = None,
+) -> int:
+    """以 fmt 写出头部与记录到二进制句柄 raw（须从文件开头写起）。
+
+    返回未压缩格式写出的字节数（压缩格式返回 -1，以文件大小为准）；
+    spans 仅对 INDEXED_FORMATS 有效，逐条追加 (字节偏移, 字节长度)。
+    """
+    tail = tail or []
+    header = dict(head + tail)
+    if fmt == 'json':
+        w = ByteCountingWriter(raw)
+        write_json_streaming(w, head, 'files', records, tail, spans=spans)
+        w.write('\n')
+        return w.pos
+    if fmt == 'jsonl':
+        w = ByteCountingWriter(raw)
+        write_jsonl(w, header, records, spans=spans)
+        return w.pos
+    if fmt == 'jsonl.gz':
+        with gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6, mtime=0) as gz:
+            write_jsonl(ByteCountingWriter(gz), header, records)  # type: ignore[arg-type]
+        return -1
+    if fmt == 'jsonl.zst':
+        zstd = _import('zstandard')
+        cctx = zstd.ZstdCompressor(level=3)
+        with cctx.stream_writer(raw, closefd=False) as zw:
+            # 攒成较大的块再送入压缩器，避免逐行调用的开销
+            buf = io.BufferedWriter(zw, buffer_size=1 << 20)  # type: ignore[arg-type]
+            write_jsonl(ByteCountingWriter(buf), header, records)  # type: ignore[arg-type]
+            buf.flush()
+        return -1
+    if fmt == 'msgpack':
+        msgpack = _import('msgpack')
+        packer = msgpack.Packer(use_bin_type=True)
+        pos = 0
+
+        def _frame(obj: Dict[str, Any]) -> Tuple[int, int]:
+            nonlocal pos
+            b = packer.pack(obj)
+            raw.write(_FRAME.pack(len(b)))
+            raw.write(b)
+            start = pos + _FRAME.size
+            pos = start + len(b)
+            return start, len(b)
+
+        _frame({'kind': 'header', **header})
+        for rec in records:
+            span = _frame(rec)
+            if spans is not None:
+                spans.append(span)
+        return pos
+    raise ValueError(f"不支持的格式：{fmt}")
+
+
+def decode_record(data: bytes, encoding: str) -> Dict[str, Any]:
+    if encoding == 'msgpack':
+        return _import('msgpack').unpackb(data, raw=False)
+    return json.loads(data.decode('utf-8'))
+
+
+def _iter_jsonl(f: Any) -> Tuple[Optional[Dict[str, Any]], Iterator[Dict[str, Any]]]:
+    first = f.readline()
+    header = json.loads(first) if first.strip() else None
+    if isinstance(header, dict):
+        header.pop('kind', None)
+
+    def _gen() -> Iterator[Dict[str, Any]]:
+        with f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    return header, _gen()
+
+
+def load_records(path: Path, fmt: Optional[str] = None) -> Tuple[Optional[Dict[str, Any]], Iterator[Dict[str, Any]]]:
+    """加载任一格式的完整合并结果：返回 (头部（不含记录）, 按写出顺序的记录迭代器)。"""
+    fmt = fmt or format_from_path(path)
+    if fmt == 'json':
+        with path.open('r', encoding='utf-8') as f:
+            data = json.load(f)
+        files = data.pop('files', []) if isinstance(data, dict) else []
+        return data, iter(files)
+    if fmt == 'jsonl':
+        return _iter_jsonl(path.open('r', encoding='utf-8'))
+    if fmt == 'jsonl.gz':
+        return _iter_jsonl(gzip.open(path, 'rt', encoding='utf-8'))
+    if fmt == 'jsonl.zst':
+        zstd = _import('zstandard')
+        stream = zstd.ZstdDecompressor().stream_reader(path.open('rb'), closefd=True)
+        return _iter_jsonl(io.TextIOWrapper(io.BufferedReader(stream, buffer_size=1 << 20), encoding='utf-8'))
+    if fmt == 'msgpack':
+        msgpack = _import('msgpack')
+        f = path.open('rb')
+
+        def _frames() -> Iterator[Dict[str, Any]]:
+            with f:
+                while True:
+                    n = f.read(_FRAME.size)
+                    if len(n) < _FRAME.size:
+                        return
+                    yield msgpack.unpackb(f.read(_FRAME.unpack(n)[0]), raw=False)
+
+        it = _frames()
+        header = next(it, None)
+        if isinstance(header, dict):
+            header.pop('kind', None)
+        return header, it
+    raise ValueError(f"不支持的格式：{fmt}")
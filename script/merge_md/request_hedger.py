@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: GPL-3.0-only
+# Copyright (C) 2025 GaoZheng
+
+"""
+对冲请求（供 `merge_md_by_timestamp.py` 的 `compression.hedging` 使用）。
+
+- `HedgedProvider` 包装任一 LLM 提供方：请求在后台线程发出，若超过近期延迟的 `percentile` 分位
+  （至少 `min_delay` 秒）仍未返回，则再发一份相同请求，先返回有效文本者胜出；另一份的结果丢弃
+  （同步 HTTP 无法取消，落后的请求在后台自然结束）。
+- 阈值：最近 `WINDOW` 次成功请求取得结果的实际延迟（对冲后的延迟；落后者的延迟不计入，
+  否则被对冲的慢请求会抬高分位、使之后的慢请求不再被对冲）；样本不足 `min_samples` 时不对冲。
+- 预算：对冲数始终不超过主请求数的 `max_extra_percent`%；另由调用方的 `may_hedge()` 决定是否放行
+  （每次运行请求上限、熔断状态、限速额度），放行即占用一次每次运行的请求额度。
+- 指标：`unhedged_latency_s` 为各主请求自身的延迟（即不对冲时的延迟），`hedged_latency_s` 为取得结果的实际延迟；
+  `stats()` 汇总对冲率、对冲胜出次数与两者 p99 之差。
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+from llm_providers import LLMProvider
+from run_metrics import RunMetrics, percentile as sample_percentile
+
+
+WINDOW = 256  # 计算对冲阈值的最近延迟样本数
+
+_Result = Tuple[Optional[str], Optional[BaseException]]
+
+
+class HedgedProvider(LLMProvider):
+    """在慢请求上追加一份重复请求的提供方包装；接口与被包装的提供方一致。"""
+
+    def __init__(
+        self,
+        inner: LLMProvider,
+        percentile: float = 95.0,
+        max_extra_percent: float = 10.0,
+        min_samples: int = 50,
+        min_delay: float = 0.0,
+        workers: int = 8,
+        may_hedge: Optional[Callable[[str], bool]] = None,
+        metrics: Optional[RunMetrics] = None,
+    ) -> None:
+        self.inner = inner
+        self.name = inner.name
+        self.percentile = min(100.0, max(1.0, float(percentile)))
+        self.max_extra = max(0.0, float(max_extra_percent)) / 100.0
+        self.min_samples = max(1, int(min_samples))
+        self.min_delay = max(0.0, float(min_delay))
+        self.may_hedge = may_hedge
+        self.metrics = metrics
+        self._pool = ThreadPoolExecutor(max_workers=max(2, int(workers)), thread_name_prefix='hedge')
+        self._lock = threading.Lock()
+        self._latencies: Deque[float] = deque(maxlen=WINDOW)
+        self._inflight: Dict[int, float] = {}  # 未返回的主请求：序号 -> 开始时刻
+        self._seq = 0
+        self.primaries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.denied = 0
+
+    @property
+    def setup_seconds(self) -> Optional[float]:  # type: ignore[override]
+        return self.inner.setup_seconds
+
+    def ensure_ready(self) -> None:
+        self.inner.ensure_ready()
+
+    def threshold(self) -> Optional[float]:
+        """当前对冲等待秒数；样本不足时为 None（不对冲）。"""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            xs = sorted(self._latencies)
+        return max(self.min_delay, sample_percentile(xs, self.percentile) or 0.0)
+
+    def _call(self, prompt: str, model: str, generation_config: Optional[Dict[str, Any]], primary: bool) -> _Result:
+        start = time.perf_counter()
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+            if primary:
+                self._inflight[seq] = start
+        try:
+            out = self.inner.generate(prompt, model, generation_config)
+            err: Optional[BaseException] = None
+        except Exception as ex:
+            out, err = None, ex
+        dur = time.perf_counter() - start
+        with self._lock:
+            self._inflight.pop(seq, None)
+        if primary and self.metrics is not None:
+            self.metrics.observe('unhedged_latency_s', dur)
+        return out, err
+
+    def _reserve(self, prompt: str) -> bool:
+        with self._lock:
+            if self.hedges + 1 > self.max_extra * self.primaries:
+                self.denied += 1
+                return False
+            if self.may_hedge is not None and not self.may_hedge(prompt):
+                self.denied += 1
+                return False
+            self.hedges += 1
+            return True
+
+    def generate(self, prompt: str, model: str, generation_config: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        start = time.perf_counter()
+        with self._lock:
+            self.primaries += 1
+        try:
+            delay = self.threshold()
+            if delay is None:
+                out, err = self._call(prompt, model, generation_config, True)
+            else:
+                out, err = self._race(prompt, model, generation_config, delay)
+        finally:
+            dur = time.perf_counter() - start
+            if self.metrics is not None:
+                self.metrics.observe('hedged_latency_s', dur)
+        if out:
+            with self._lock:
+                self._latencies.append(dur)
+        if err is not None:
+            raise err
+        return out
+
+    def _race(self, prompt: str, model: str, generation_config: Optional[Dict[str, Any]], delay: float) -> _Result:
+        primary: Future = self._pool.submit(self._call, prompt, model, generation_config, True)
+        done, _ = wait([primary], timeout=delay)
+        if done or not self._reserve(prompt):
+            return primary.result()
+        if self.metrics is not None:
+            self.metrics.count('llm.hedges')
+        hedge: Future = self._pool.submit(self._call, prompt, model, generation_config, False)
+        running = {primary, hedge}
+        while running:
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            # 同时完成时优先取主请求，便于统计“对冲胜出”
+            for f in sorted(done, key=lambda f: f is not primary):
+                out, err = f.result()
+                if out:
+                    if f is hedge:
+                        with self._lock:
+                            self.hedge_wins += 1
+                        if self.metrics is not None:
+                            self.metrics.count('llm.hedge_wins')
+                    return out, None
+        # 两份均无有效文本：以主请求的结果为准（错误分类与重试由调用方处理）
+        return primary.result()
+
+    def stats(self) -> Dict[str, Any]:
+        """对冲率与 p99 改善（需要 metrics 中的两组延迟样本）。
+
+        仍未返回的主请求（多为对冲后落后者）以已耗时计入不对冲延迟，作为其下界。
+        发生过对冲时 `helping` 表示 p99 是否确有改善（`p99_improvement_s` 为负即对冲没有帮助）。
+        """
+        now = time.perf_counter()
+        with self._lock:
+            running = [now - t for t in self._inflight.values()]
+            info: Dict[str, Any] = {
+                'primaries': self.primaries,
+                'hedges': self.hedges,
+                'hedge_wins': self.hedge_wins,
+                'denied': self.denied,
+                'hedge_rate': round(self.hedges / self.primaries, 4) if self.primaries else 0.0,
+            }
+        if self.metrics is not None:
+            unhedged = sorted(self.metrics.values('unhedged_latency_s') + running)
+            hedged = sorted(self.metrics.values('hedged_latency_s'))
+            p_u, p_h = sample_percentile(unhedged, 99), sample_percentile(hedged, 99)
+            if p_u is not None and p_h is not None:
+                info.update(p99_unhedged_s=round(p_u, 6), p99_hedged_s=round(p_h, 6), p99_improvement_s=round(p_u - p_h, 6))
+                if self.hedges:
+                    # 差值不为正：对冲的等待与额外请求（限速、服务端排队）抵消了收益，对冲没有帮助
+                    info['helping'] = p_u - p_h > 0
+        return info
+
+    def close(self) -> None:
+        # 不等待落后的请求：其结果已无用，后台线程自然结束
+        self._pool.shutdown(wait=False)
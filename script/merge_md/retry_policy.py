@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: GPL-3.0-only
+# Copyright (C) 2025 GaoZheng
+
+"""
+LLM 请求的错误分类、指数退避与熔断器（供 `merge_md_by_timestamp.py` 使用）。
+
+- 分类：`classify_error(exc)` 把异常（或空返回）归为
+  `empty`（无返回文本）/`rate_limit`（429、限流）/`quota`（配额耗尽）/`server`（5xx、超时）/
+  `network`（连接错误）/`auth`（401/403、密钥无效）/`bad_request`（400、参数无效）/`unknown`，
+  并提取服务端给出的重试等待（HTTP `Retry-After`、Gemini 的 `retry_delay`/“retry in Ns”）。
+- 退避：`RetryPolicy.delay(attempt, err)` 为“全抖动”指数退避 `uniform(0, min(max_delay, base·2^attempt))`；
+  有 retry-after 时以其为下限再加不超过 base 的抖动，避免多个线程同时醒来重试。
+- 熔断：`CircuitBreaker` 在滑动窗口内服务端类错误（rate_limit/quota/server/network）占比达到阈值时打开，
+  所有工作线程在 `before_request` 处暂停至冷却结束；随后半开，仅放行一个探测请求，成功则关闭，失败则冷却时间翻倍。
+  限流错误附带 retry-after 时全局暂停至该时刻。需等待超过 `max_wait` 秒时抛出 `CircuitOpenError`，由调用方中断本次运行。
+- 持久化：熔断状态（打开截止时刻、当前冷却时长、最近错误）写入 `out/<script_stem>.breaker.json`，
+  下次运行从该状态继续：仍在冷却期则先等待（或超出 `max_wait` 直接中断），冷却期已过则以半开状态探测。
+- 错误文本：`error_text(err)` 对 `empty` 返回既往的 `Gemini 无返回文本`，其余为 `[kind] 消息`；`error_kind(text)` 反解。
+- 请求上限：`RequestBudget` 按实际发出的调用计数（分块/归并请求、重试与补请求各计一次），
+  额度用尽后 `_request` 不再发出请求，返回 `request_cap` 错误，由调用方结束本次运行。
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Optional
+
+
+BREAKER_VERSION = 1
+NO_TEXT_MESSAGE = 'Gemini 无返回文本'
+
+RETRYABLE_KINDS = ('empty', 'rate_limit', 'quota', 'server', 'network', 'unknown')
+BREAKER_KINDS = ('rate_limit', 'quota', 'server', 'network')  # 计入熔断窗口的错误类型
+FATAL_KINDS = RETRYABLE_KINDS + ('auth', 'circuit_open')      # 重试耗尽后应中断本次运行的类型
+CAP_KIND = 'request_cap'  # 达到每次运行请求上限，请求未发出
+
+_KIND_RE = re.compile(r"^\[(?P<kind>[a-z_]+)\] ")
+_RETRY_IN_RE = re.compile(r"retry in ([\d.]+)\s*(ms|s)\b", re.I)
+_RETRY_DELAY_RE = re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)", re.I)
+_STATUS_RE = re.compile(r"\b(400|401|403|404|408|429|500|502|503|504)\b")
+
+
+@dataclass
+class ErrorInfo:
+    kind: str
+    message: str
+    retry_after: Optional[float] = None
+    status: Optional[int] = None
+
+    @property
+    def retryable(self) -> bool:
+        return self.kind in RETRYABLE_KINDS
+
+
+def error_text(err: ErrorInfo) -> str:
+    if err.kind == 'empty':
+        return NO_TEXT_MESSAGE
+    return f"[{err.kind}] {err.message}"
+
+
+def error_kind(text: Optional[str]) -> Optional[str]:
+    """由 `error_text` 的结果反解错误类型；无法识别时返回 None。"""
+    if not text:
+        return None
+    if text == NO_TEXT_MESSAGE:
+        return 'empty'
+    m = _KIND_RE.match(text)
+    return m.group('kind') if m else None
+
+
+def _retry_after_from(exc: BaseException, msg: str) -> Optional[float]:
+    ra = getattr(exc, 'retry_after', None)
+    if isinstance(ra, (int, float)) and ra >= 0:
+        return float(ra)
+    m = _RETRY_DELAY_RE.search(msg)
+    if m:
+        return float(m.group(1))
+    m = _RETRY_IN_RE.search(msg)
+    if m:
+        v = float(m.group(1))
+        return v / 1000.0 if m.group(2).lower() == 'ms' else v
+    return None
+
+
+def classify_error(exc: Optional[BaseException]) -> ErrorInfo:
+    """将请求异常归类；exc 为 None 表示请求成功但没有返回文本。"""
+    if exc is None:
+        return ErrorInfo('empty', NO_TEXT_MESSAGE)
+    name = type(exc).__name__
+    msg = str(exc) or name
+    status = getattr(exc, 'status', None)
+    if not isinstance(status, int):
+        code = getattr(exc, 'code', None)  # google.api_core.exceptions.*.code 为 HTTP 状态码
+        status = code if isinstance(code, int) else None
+    if status is None:
+        m = _STATUS_RE.search(msg)
+        status = int(m.group(1)) if m else None
+    low = msg.lower()
+    retry_after = _retry_after_from(exc, msg)
+
+    def _info(kind: str) -> ErrorInfo:
+        return ErrorInfo(kind, msg, retry_after, status)
+
+    if name in ('ProviderUnavailable', 'Unauthenticated', 'PermissionDenied') or status in (401, 403) \
+            or 'api key' in low or 'api_key' in low:
+        return _info('auth')
+    if 'quota' in low and ('per day' in low or 'perday' in low or 'daily' in low):
+        return _info('quota')
+    if name in ('ResourceExhausted', 'TooManyRequests') or status == 429 or 'rate limit' in low \
+            or 'quota' in low or 'resource exhausted' in low or 'resource_exhausted' in low:
+        return _info('rate_limit')
+    if name in ('InvalidArgument', 'BadRequest', 'FailedPrecondition', 'NotFound') or status in (400, 404):
+        return _info('bad_request')
+    if name in ('ServiceUnavailable', 'InternalServerError', 'DeadlineExceeded', 'GatewayTimeout', 'BadGateway') \
+            or (status is not None and 500 <= status < 600) or status == 408:
+        return _info('server')
+    if isinstance(exc, (ConnectionError, TimeoutError, OSError)) or name in (
+        'RemoteDisconnected', 'IncompleteRead', 'URLError', 'SSLError', 'ReadTimeout', 'ConnectTimeout',
+    ):
+        return _info('network')
+    return _info('unknown')
+
+
+class CircuitOpenError(RuntimeError):
+    """熔断器打开且剩余冷却时间超过允许的等待上限。"""
+
+    def __init__(self, wait: float, last_error: Optional[str]) -> None:
+        super().__init__(f"熔断中：还需等待 {wait:.0f}s（最近错误：{last_error or '-'}）")
+        self.wait = wait
+
+
+class CircuitBreaker:
+    """跨工作线程共享的熔断器；时刻使用墙钟（time.time），以便跨进程持久化。"""
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        enabled: bool = True,
+        window: int = 20,
+        min_calls: int = 5,
+        failure_ratio: float = 0.5,
+        cooldown: float = 30.0,
+        max_cooldown: float = 600.0,
+        max_wait: float = 900.0,
+        clock: Callable[[], float] = time.time,
+        on_event: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+    ) -> None:
+        self.path = path
+        self.enabled = bool(enabled)
+        self.window: Deque[bool] = deque(maxlen=max(1, int(window)))
+        self.min_calls = max(1, int(min_calls))
+        self.failure_ratio = min(1.0, max(0.0, float(failure_ratio)))
+        self.base_cooldown = max(0.0, float(cooldown))
+        self.max_cooldown = max(self.base_cooldown, float(max_cooldown))
+        self.max_wait = max(0.0, float(max_wait))
+        self.clock = clock
+        self.on_event = on_event
+        self.state = 'closed'
+        self.open_until = 0.0
+        self.paused_until = 0.0  # 限流 retry-after 带来的全局暂停（不改变状态）
+        self.cooldown = self.base_cooldown
+        self.opens = 0
+        self.last_error: Optional[str] = None
+        self.waited = 0.0
+        self._probe_inflight = False
+        self._cond = threading.Condition()
+        self._load()
+
+    # ---- 持久化 ----
+
+    def _load(self) -> None:
+        if self.path is None or not self.enabled or not self.path.exists():
+            return
+        try:
+            with self.path.open('r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception:
+            return
+        if not isinstance(data, dict) or data.get('version') != BREAKER_VERSION:
+            return
+        now = self.clock()
+        self.cooldown = min(self.max_cooldown, max(self.base_cooldown, float(data.get('cooldown') or 0)))
+        self.opens = int(data.get('opens') or 0)
+        self.last_error = data.get('last_error')
+        self.paused_until = float(data.get('paused_until') or 0)
+        if data.get('state') in ('open', 'half_open'):
+            self.open_until = float(data.get('open_until') or 0)
+            # 冷却未结束则保持打开；已结束则先以半开状态探测
+            self.state = 'open' if self.open_until > now else 'half_open'
+
+    def save(self) -> None:
+        if self.path is None or not self.enabled:
+            return
+        with self._cond:
+            payload = {
+                'version': BREAKER_VERSION,
+                'updated_at': datetime.now(timezone.utc).isoformat(),
+                'state': self.state,
+                'open_until': self.open_until,
+                'paused_until': self.paused_until,
+                'cooldown': self.cooldown,
+                'opens': self.opens,
+                'last_error': self.last_error,
+            }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        with tmp.open('w', encoding='utf-8', newline='\n') as f:
+            json.dump(payload, f, ensure_ascii=False, indent=2)
+            f.write('\n')
+        os.replace(tmp, self.path)
+
+    def _emit(self, event: str, **info: Any) -> None:
+        if self.on_event is not None:
+            try:
+                self.on_event(event, info)
+            except Exception:
+                pass
+
+    # ---- 状态机 ----
+
+    def is_open(self) -> bool:
+        with self._cond:
+            return self.enabled and (self.state != 'closed' or self.paused_until > self.clock())
+
+    def before_request(self) -> None:
+        """阻塞至允许发起请求；剩余等待超过 max_wait 时抛出 CircuitOpenError。"""
+        if not self.enabled:
+            return
+        start = time.monotonic()
+        with self._cond:
+            while True:
+                now = self.clock()
+                if self.state == 'open' and now >= self.open_until:
+                    self.state = 'half_open'
+                    self._probe_inflight = False
+                    self._emit('half_open')
+                if self.state == 'closed' and now >= self.paused_until:
+                    break
+                if self.state == 'half_open' and not self._probe_inflight and now >= self.paused_until:
+                    self._probe_inflight = True
+                    break
+                if self.state == 'open':
+                    wait = self.open_until - now
+                elif self.state == 'closed':
+                    wait = self.paused_until - now
+                else:  # 半开且探测请求在途：等待其结果
+                    wait = max(self.paused_until - now, 1.0)
+                if wait > self.max_wait:
+                    raise CircuitOpenError(wait, self.last_error)
+                self._cond.wait(timeout=max(0.01, min(wait, 5.0)))
+            waited = time.monotonic() - start
+            self.waited += waited
+        if waited > 0.01:
+            self._emit('waited', seconds=waited)
+
+    def record_success(self) -> None:
+        if not self.enabled:
+            return
+        changed = False
+        with self._cond:
+            if self.state != 'closed':
+                self.state = 'closed'
+                self.cooldown = self.base_cooldown
+                self.window.clear()
+                self._probe_inflight = False
+                changed = True
+                self._cond.notify_all()
+            else:
+                self.window.append(True)
+        if changed:
+            self._emit('closed')
+            self.save()
+
+    def record_failure(self, err: ErrorInfo) -> None:
+        if not self.enabled:
+            return
+        if err.kind not in BREAKER_KINDS:
+            # 空返回、参数/鉴权错误说明服务可达：半开探测以此结束并关闭熔断
+            with self._cond:
+                probing = self.state == 'half_open'
+            if probing:
+                self.record_success()
+            return
+        opened = False
+        with self._cond:
+            now = self.clock()
+            self.last_error = error_text(err)[:300]
+            if err.retry_after:
+                # 服务端明确要求等待：全体暂停至该时刻，避免各线程同时重试
+                self.paused_until = max(self.paused_until, now + err.retry_after)
+            if self.state == 'half_open':
+                opened = True
+            else:
+                self.window.append(False)
+                fails = sum(1 for ok in self.window if not ok)
+                opened = self.state == 'closed' and (err.kind == 'quota' or (
+                    len(self.window) >= self.min_calls and fails / len(self.window) >= self.failure_ratio
+                ))
+            if opened:
+                cool = max(self.cooldown, err.retry_after or 0.0)
+                if err.kind == 'quota' and not err.retry_after:
+                    cool = self.max_cooldown
+                self.state = 'open'
+                self.open_until = now + cool
+                self.opens += 1
+                self._probe_inflight = False
+                self.window.clear()
+                # 连续打开（半开探测仍失败）时冷却翻倍，成功后复位
+                self.cooldown = min(self.max_cooldown, max(self.base_cooldown, self.cooldown * 2))
+                self._cond.notify_all()
+        if opened:
+            self._emit('opened', cooldown=cool, error=self.last_error)
+            self.save()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                'enabled': self.enabled,
+                'state': self.state,
+                'opens': self.opens,
+                'cooldown_s': self.cooldown,
+                'open_remaining_s': max(0.0, round(self.open_until - self.clock(), 3)) if self.state == 'open' else 0.0,
+                'waited_s': round(self.waited, 6),
+                'last_error': self.last_error,
+            }
+
+
+class RequestBudget:
+    """每次运行的实际请求额度（线程安全）；limit<=0 表示不限。"""
+
+    def __init__(self, limit: int = 0) -> None:
+        self.limit = max(0, int(limit))
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def try_take(self) -> bool:
+        """占用一次请求额度；已用尽时返回 False（请求不应发出）。"""
+        with self._lock:
+            if self.limit and self.used >= self.limit:
+                return False
+            self.used += 1
+            return True
+
+    def exhausted(self) -> bool:
+        with self._lock:
+            return bool(self.limit) and self.used >= self.limit
+
+
+class RetryPolicy:
+    """单次逻辑请求的重试参数：最多 max_retries 次重试，全抖动指数退避，并共享一个熔断器与请求额度。"""
+
+    def __init__(
+        self,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        breaker: Optional[CircuitBreaker] = None,
+        seed: Optional[int] = None,
+        budget: Optional[RequestBudget] = None,
+    ) -> None:
+        self.max_retries = max(0, int(max_retries))
+        self.base_delay = max(0.0, float(base_delay))
+        self.max_delay = max(self.base_delay, float(max_delay))
+        self.breaker = breaker or CircuitBreaker(enabled=False)
+        self.budget = budget or RequestBudget()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay(self, attempt: int, err: ErrorInfo) -> float:
+        """第 attempt 次重试（从 0 计）前的等待秒数。"""
+        with self._lock:
+            ceiling = min(self.max_delay, self.base_delay * (2 ** max(0, attempt)))
+            d = self._rng.uniform(0.0, ceiling)
+            if err.retry_after:
+                d = err.retry_after + self._rng.uniform(0.0, self.base_delay)
+        return d
+
+    @classmethod
+    def from_config(
+        cls,
+        retry_cfg: Optional[Dict[str, Any]],
+        breaker_cfg: Optional[Dict[str, Any]],
+        state_path: Optional[Path],
+        on_event: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+        max_requests: int = 0,
+    ) -> 'RetryPolicy':
+        rc = retry_cfg or {}
+        bc = breaker_cfg or {}
+        breaker = CircuitBreaker(
+            state_path,
+            enabled=bool(bc.get('enabled', True)),
+            window=int(bc.get('window', 20) or 20),
+            min_calls=int(bc.get('min_calls', 5) or 5),
+            failure_ratio=float(bc.get('failure_ratio', 0.5)),
+            cooldown=float(bc.get('cooldown_seconds', 30) or 0),
+            max_cooldown=float(bc.get('max_cooldown_seconds', 600) or 0),
+            max_wait=float(bc.get('max_wait_seconds', 900) or 0),
+            on_event=on_event,
+        )
+        return cls(
+            max_retries=int(rc.get('max_retries', 5)),
+            base_delay=float(rc.get('base_delay_seconds', 1.0)),
+            max_delay=float(rc.get('max_delay_seconds', 60.0)),
+            breaker=breaker,
+            budget=RequestBudget(max_requests),
+        )
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: GPL-3.0-only
+# Copyright (C) 2025 GaoZheng
+
+"""
+合并流水线的运行指标（供 `merge_md_by_timestamp.py` 使用）。
+
+- 阶段计时：`with metrics.stage('scan'):` 以 `time.perf_counter`（单调时钟）累计各阶段的次数、总耗时与最大耗时；
+  工作线程中的请求/限速等待同样以 `stage`/`span` 计时，可与主线程阶段重叠。
+- 计数器：`count(name, n)`；数值快照：`gauge(name, value)`。
+- 直方图：`observe(name, seconds)` 记录样本，报告 count/sum/min/max/mean 与 p50/p95/p99（最近秩），
+  另按固定的秒级上界分桶（`HISTOGRAM_BOUNDS`）。
+- 输出：`write(path)` 写出 JSON 报告；启用 trace 时 `write_trace(path)` 写出 Chrome trace-event 文件
+  （`chrome://tracing` 或 Perfetto 打开，按线程展示各阶段与请求的火焰图）。
+- 线程安全：所有记录操作持锁，开销为微秒级；未启用 trace 时不保留逐次事件。
+"""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import math
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+
+METRICS_VERSION = 1
+HISTOGRAM_BOUNDS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def percentile(sorted_samples: List[float], q: float) -> Optional[float]:
+    """最近秩百分位（q 取 0~100）；样本为空时返回 None。"""
+    if not sorted_samples:
+        return None
+    rank = max(1, math.ceil(q / 100.0 * len(sorted_samples)))
+    return sorted_samples[min(rank, len(sorted_samples)) - 1]
+
+
+def summarize_samples(samples: List[float]) -> Dict[str, Any]:
+    xs = sorted(samples)
+    if not xs:
+        return {'count': 0}
+    buckets: List[List[Any]] = []
+    i = 0
+    for le in HISTOGRAM_BOUNDS:
+        n = 0
+        while i < len(xs) and xs[i] <= le:
+            n += 1
+            i += 1
+        buckets.append([le, n])
+    buckets.append(['+Inf', len(xs) - i])
+    return {
+        'count': len(xs),
+        'sum': round(sum(xs), 6),
+        'min': round(xs[0], 6),
+        'max': round(xs[-1], 6),
+        'mean': round(sum(xs) / len(xs), 6),
+        'p50': round(percentile(xs, 50), 6),
+        'p95': round(percentile(xs, 95), 6),
+        'p99': round(percentile(xs, 99), 6),
+        'buckets': buckets,
+    }
+
+
+class RunMetrics:
+    """一次运行的阶段计时、计数器与延迟直方图；`reset` 后可复用同一实例。"""
+
+    def __init__(self, trace: bool = False) -> None:
+        self._lock = threading.Lock()
+        self.reset(trace)
+
+    def reset(self, trace: bool = False) -> None:
+        with self._lock:
+            self.trace_enabled = bool(trace)
+            self.path: Optional[Path] = None
+            self.trace_path: Optional[Path] = None
+            self._t0 = time.perf_counter()
+            self._started_at = datetime.now(timezone.utc).isoformat()
+            self.stages: Dict[str, Dict[str, float]] = {}
+            self.counters: Dict[str, int] = {}
+            self.gauges: Dict[str, Any] = {}
+            self.samples: Dict[str, List[float]] = {}
+            self._events: List[Dict[str, Any]] = []
+            self._threads: Dict[int, str] = {}
+
+    # ---- 记录 ----
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + int(n)
+
+    def gauge(self, name: str, value: Any) -> None:
+        with self._lock:
+            self.gauges[name] = value
+
+    def observe(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.samples.setdefault(name, []).append(float(seconds))
+
+    def values(self, name: str) -> List[float]:
+        """直方图 name 的样本副本（按记录顺序）。"""
+        with self._lock:
+            return list(self.samples.get(name, ()))
+
+    def _add_stage(self, name: str, cat: str, start: float, dur: float, args: Optional[Dict[str, Any]]) -> None:
+        with self._lock:
+            st = self.stages.setdefault(name, {'count': 0, 'total_s': 0.0, 'max_s': 0.0})
+            st['count'] += 1
+            st['total_s'] += dur
+            st['max_s'] = max(st['max_s'], dur)
+            if self.trace_enabled:
+                t = threading.current_thread()
+                self._threads.setdefault(t.ident or 0, t.name)
+                ev: Dict[str, Any] = {
+                    'name': name, 'cat': cat, 'ph': 'X', 'pid': os.getpid(), 'tid': t.ident or 0,
+                    'ts': round((start - self._t0) * 1e6, 1), 'dur': round(dur * 1e6, 1),
+                }
+                if args:
+                    ev['args'] = args
+                self._events.append(ev)
+
+    def add_time(self, name: str, start: float, end: Optional[float] = None, cat: str = 'stage',
+                 args: Optional[Dict[str, Any]] = None) -> float:
+        """以 perf_counter 起止时刻记入一次阶段耗时（无法用 with 包裹的代码段）；返回耗时秒数。"""
+        dur = max(0.0, (time.perf_counter() if end is None else end) - start)
+        self._add_stage(name, cat, start, dur, args)
+        return dur
+
+    @contextlib.contextmanager
+    def stage(self, name: str, cat: str = 'stage', **args: Any) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._add_stage(name, cat, start, time.perf_counter() - start, args or None)
+
+    # ---- 输出 ----
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            stages = {
+                k: {'count': int(v['count']), 'total_s': round(v['total_s'], 6), 'max_s': round(v['max_s'], 6)}
+                for k, v in self.stages.items()
+            }
+            return {
+                'version': METRICS_VERSION,
+                'started_at': self._started_at,
+                'wall_s': round(time.perf_counter() - self._t0, 6),
+                'stages': stages,
+                'counters': dict(sorted(self.counters.items())),
+                'gauges': dict(sorted(self.gauges.items())),
+                'histograms': {k: summarize_samples(v) for k, v in sorted(self.samples.items())},
+            }
+
+    def write(self, path: Optional[Path] = None) -> Optional[Path]:
+        out = path or self.path
+        if out is None:
+            return None
+        _write_json(out, self.to_dict(), indent=2)
+        return out
+
+    def write_trace(self, path: Optional[Path] = None) -> Optional[Path]:
+        out = path or self.trace_path
+        if out is None or not self.trace_enabled:
+            return None
+        with self._lock:
+            pid = os.getpid()
+            meta = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0, 'args': {'name': 'merge_md_by_timestamp'}}]
+            meta += [
+                {'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+                for tid, name in self._threads.items()
+            ]
+            payload = {'traceEvents': meta + sorted(self._events, key=lambda e: e['ts']), 'displayTimeUnit': 'ms'}
+        _write_json(out, payload, indent=None)
+        return out
+
+    def flush(self) -> List[Path]:
+        """写出已设置路径的报告与 trace；返回实际写出的文件。"""
+        return [p for p in (self.write(), self.write_trace()) if p is not None]
+
+
+def _write_json(path: Path, data: Any, indent: Optional[int]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + '.tmp')
+    with tmp.open('w', encoding='utf-8', newline='\n') as f:
+        if indent is None:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+        else:
+            json.dump(data, f, ensure_ascii=False, indent=indent)
+        f.write('\n')
+    os.replace(tmp, path)
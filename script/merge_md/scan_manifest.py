@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: GPL-3.0-only
+# Copyright (C) 2025 GaoZheng
+
+"""
+增量扫描清单（供 `merge_md_by_timestamp.py` 使用）。
+
+- 清单文件：`out/<script_stem>.manifest.json`，记录每个匹配文件的
+  (path, size, mtime_ns, sha256, ts) 以及每个目录的 mtime_ns 与直接子项列表。
+- 目录 mtime 未变时复用上次的子项列表，不再枚举该目录（仍会 stat 子目录与文件）；
+  文件 size 与 mtime_ns 均未变时视为未变，调用方可跳过读取。
+- 与上次清单比较得到 added/changed/removed 增量，写入清单的 `delta` 字段并打印，
+  供下游步骤只处理变更部分。
+- `output` 字段记录上次写出的完整合并结果的头部（source_dirs/compression/total_files/format），
+  调用方据此判断能否沿用该文件，无需再解析它。
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Pattern, Set
+
+
+MANIFEST_VERSION = 1
+
+
+@dataclass
+class FileRecord:
+    path: str      # 相对仓库根的 POSIX 路径
+    size: int
+    mtime_ns: int
+    ts: int
+    sha256: Optional[str] = None
+
+
+class ScanManifest:
+    """目录/文件元数据清单；`scan` 之后调用 `record_hashes` 补全哈希，再 `save`。"""
+
+    def __init__(self, path: Path, repo_root: Path, pattern: Pattern[str]) -> None:
+        self.path = path
+        self.repo_root = repo_root.resolve()
+        self.pattern = pattern
+        self.old_files: Dict[str, FileRecord] = {}
+        self.old_dirs: Dict[str, Dict] = {}
+        self.files: Dict[str, FileRecord] = {}
+        self.dirs: Dict[str, Dict] = {}
+        self.old_output: Optional[Dict] = None
+        self.output: Optional[Dict] = None
+        self.dirs_reused = 0
+        self.dirs_listed = 0
+        self.loaded = False
+        self._load()
+
+    def _key(self, p: Path) -> str:
+        try:
+            return p.relative_to(self.repo_root).as_posix()
+        except ValueError:
+            return p.as_posix()
+
+    def _load(self) -> None:
+        try:
+            if not self.path.exists():
+                return
+            with self.path.open('r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception:
+            return
+        if not isinstance(data, dict) or data.get('version') != MANIFEST_VERSION:
+            return
+        for rec in data.get('files') or []:
+            try:
+                fr = FileRecord(
+                    path=str(rec['path']), size=int(rec['size']), mtime_ns=int(rec['mtime_ns']),
+                    ts=int(rec['ts']), sha256=rec.get('sha256'),
+                )
+            except Exception:
+                continue
+            self.old_files[fr.path] = fr
+        dirs = data.get('dirs')
+        if isinstance(dirs, dict):
+            self.old_dirs = {k: v for k, v in dirs.items() if isinstance(v, dict)}
+        if isinstance(data.get('output'), dict):
+            self.old_output = data['output']
+        self.loaded = True
+
+    def _walk(self, d: Path) -> Iterable[Path]:
+        try:
+            st = d.stat()
+        except OSError:
+            return
+        key = self._key(d)
+        cached = self.old_dirs.get(key)
+        if cached and cached.get('mtime_ns') == st.st_mtime_ns:
+            md_names = list(cached.get('files') or [])
+            subdirs = list(cached.get('subdirs') or [])
+            self.dirs_reused += 1
+        else:
+            md_names, subdirs = [], []
+            with os.scandir(d) as it:
+                for de in it:
+                    try:
+                        # 与 Path.rglob 一致：不递归进入符号链接目录
+                        if de.is_dir(follow_symlinks=False):
+                            subdirs.append(de.name)
+                        elif de.name.endswith('.md') and de.is_file():
+                            md_names.append(de.name)
+                    except OSError:
+                        continue
+            md_names.sort()
+            subdirs.sort()
+            self.dirs_listed += 1
+        self.dirs[key] = {'mtime_ns': st.st_mtime_ns, 'files': md_names, 'subdirs': subdirs}
+        for name in md_names:
+            yield d / name
+        for name in subdirs:
+            yield from self._walk(d / name)
+
+    def scan(self, dirs: Iterable[Path]) -> List[Path]:
+        """枚举 `dirs` 下的 `*.md` 文件并记录匹配文件的 stat 信息；返回全部 `.md` 路径。"""
+        out: List[Path] = []
+        for d in dirs:
+            if not d.exists():
+                continue
+            for p in self._walk(d):
+                out.append(p)
+                m = self.pattern.match(p.name)
+                if not m:
+                    continue
+                try:
+                    st = p.stat()
+                except OSError:
+                    continue
+                key = self._key(p.resolve())
+                old = self.old_files.get(key)
+                sha = old.sha256 if (old and old.size == st.st_size and old.mtime_ns == st.st_mtime_ns) else None
+                self.files[key] = FileRecord(
+                    path=key, size=st.st_size, mtime_ns=st.st_mtime_ns, ts=int(m.group('ts')), sha256=sha,
+                )
+        return out
+
+    def unchanged(self) -> Set[str]:
+        """size 与 mtime_ns 均与上次一致的文件（可跳过读取）。"""
+        return {k for k, r in self.files.items() if r.sha256 is not None}
+
+    def record_hashes(self, hashes: Dict[str, str]) -> None:
+        """补全本次实际读取的文件的 sha256（键为相对路径）。"""
+        for k, h in hashes.items():
+            rec = self.files.get(k)
+            if rec is not None:
+                rec.sha256 = h
+
+    def delta(self) -> Dict[str, List[str]]:
+        added = sorted(k for k in self.files if k not in self.old_files)
+        removed = sorted(k for k in self.old_files if k not in self.files)
+        changed = sorted(
+            k for k, r in self.files.items()
+            if k in self.old_files and r.sha256 != self.old_files[k].sha256
+        )
+        return {'added': added, 'changed': changed, 'removed': removed}
+
+    def save(self) -> None:
+        payload = {
+            'version': MANIFEST_VERSION,
+            'generated_at': datetime.now(timezone.utc).isoformat(),
+            'delta': self.delta(),
+            'output': self.output,
+            'dirs': self.dirs,
+            'files': [
+                {'path': r.path, 'size': r.size, 'mtime_ns': r.mtime_ns, 'sha256': r.sha256, 'ts': r.ts}
+                for r in sorted(self.files.values(), key=lambda r: (r.ts, r.path))
+            ],
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        with tmp.open('w', encoding='utf-8', newline='\n') as f:
+            json.dump(payload, f, ensure_ascii=False, indent=2)
+            f.write('\n')
+        os.replace(tmp, self.path)
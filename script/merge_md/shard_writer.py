@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: GPL-3.0-only
+# Copyright (C) 2025 GaoZheng
+
+"""
+按时间分片写出完整合并结果（供 `merge_md_by_timestamp.py` 使用）。
+
+- 目录：`out/<script_stem>_all/`，每个分片一个文件（与单文件输出同构，格式同 `--format`，见 record_formats.py），
+  另有 `manifest.json` 记录每个分片的 (文件名, 时间戳范围, 条目数, 字节数, sha256, 内容指纹)。
+- 分片方式：`month` 按 UTC 年月（`2025-07.json`）；`bytes` 按单片字节上限，分片以起始时间戳命名（`ts-1751598299.json`），
+  边界沿用上次清单，仅超出上限的分片再切分，插入/修改一篇不会让后续分片整体移位。
+- 内容指纹为分片内 (path, ts, 正文 sha256) 序列的哈希；指纹与文件均未变的分片不重写，
+  其余分片由线程池并行序列化并原子替换；不再出现在清单中的分片文件被删除。
+- 划分与指纹只需轻量记录（不含正文）；正文在写出对应分片时才逐条取回。
+- 未压缩格式的分片同时写出字节偏移旁路索引 `<分片文件名>.idx.json`（见 `merged_reader.py`）。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import os
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from merged_reader import index_path_for, write_index
+from record_formats import INDEXED_FORMATS, record_encoding, write_records
+
+
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+SHARD_MODES = ('month', 'bytes')
+
+
+def month_key(ts: int) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).strftime('%Y-%m')
+
+
+def _record_bytes(rec: Dict[str, Any]) -> int:
+    # 估算序列化后的字节数（content 占绝大部分，其余字段按固定开销计）；轻量记录取其 bytes 字段
+    if 'content' not in rec:
+        return int(rec.get('bytes') or 0) + 256
+    return len((rec.get('content') or '').encode('utf-8')) + 256
+
+
+class ShardedWriter:
+    def __init__(
+        self,
+        shard_dir: Path,
+        by: str = 'month',
+        max_bytes: int = 8 * 1024 * 1024,
+        fmt: str = 'json',
+        workers: int = 0,
+    ) -> None:
+        if by not in SHARD_MODES:
+            raise ValueError(f"sharding.by 仅支持 {'/'.join(SHARD_MODES)}，当前为 {by!r}")
+        self.dir = shard_dir
+        self.by = by
+        self.max_bytes = max(1, int(max_bytes))
+        self.fmt = fmt
+        self.workers = workers if workers > 0 else min(8, (os.cpu_count() or 1) + 2)
+        self.manifest_path = shard_dir / MANIFEST_NAME
+        self.prev: Dict[str, Any] = self._load_manifest()
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        try:
+            with self.manifest_path.open('r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception:
+            return {}
+        if not isinstance(data, dict) or data.get('version') != MANIFEST_VERSION:
+            return {}
+        return data
+
+    def _prev_shards(self) -> List[Dict[str, Any]]:
+        if self.prev.get('by') != self.by or self.prev.get('format') != self.fmt:
+            return []
+        return [s for s in self.prev.get('shards') or [] if isinstance(s, dict)]
+
+    def header(self) -> Optional[Dict[str, Any]]:
+        """上次清单的头部（不含分片列表）；无可用清单时为 None。"""
+        if not self._prev_shards():
+            return None
+        return {k: v for k, v in self.prev.items() if k != 'shards'}
+
+    # ---- 分片划分 ----
+
+    def _assign(self, records: List[Dict[str, Any]]) -> List[Tuple[str, List[Dict[str, Any]]]]:
+        if self.by == 'month':
+            groups: Dict[str, List[Dict[str, Any]]] = {}
+            for rec in records:
+                groups.setdefault(month_key(int(rec['timestamp'])), []).append(rec)
+            return sorted(groups.items())
+        # bytes：沿用上次的分片起点，落入同一区间的条目归入同一分片；超出上限的分片再切分
+        prev_starts = sorted({int(s['start']) for s in self._prev_shards() if 'start' in s})
+        if not prev_starts and records:
+            prev_starts = [int(records[0]['timestamp'])]
+        buckets: Dict[int, List[Dict[str, Any]]] = {}
+        for rec in records:
+            i = bisect_right(prev_starts, int(rec['timestamp'])) - 1
+            start = prev_starts[max(0, i)]
+            buckets.setdefault(start, []).append(rec)
+        out: List[Tuple[str, List[Dict[str, Any]]]] = []
+        for start in sorted(buckets):
+            cur: List[Dict[str, Any]] = []
+            cur_start, size = start, 0
+            for rec in buckets[start]:
+                b = _record_bytes(rec)
+                if cur and size + b > self.max_bytes:
+                    out.append((f"ts-{cur_start}", cur))
+                    cur, cur_start, size = [], int(rec['timestamp']), 0
+                cur.append(rec)
+                size += b
+            if cur:
+                out.append((f"ts-{cur_start}", cur))
+        return out
+
+    # ---- 写出 ----
+
+    @staticmethod
+    def _fingerprint(recs: List[Dict[str, Any]]) -> str:
+        h = hashlib.sha256()
+        for rec in recs:
+            h.update(f"{rec['path']}\0{rec['timestamp']}\0".encode('utf-8'))
+            if 'content' not in rec:
+                h.update(bytes.fromhex(rec['sha256']))
+            else:
+                h.update(hashlib.sha256((rec.get('content') or '').encode('utf-8')).digest())
+        return h.hexdigest()
+
+    def _write_shard(
+        self, name: str, recs: List[Dict[str, Any]], source_dirs: List[str], compression: Optional[dict],
+        load: Optional[Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]] = None,
+    ) -> Tuple[int, str, List[Dict[str, Any]]]:
+        tail: List[Tuple[str, Any]] = [('compression', compression)] if compression is not None else []
+        todo = recs
+        while True:
+            head: List[Tuple[str, Any]] = [
+                ('generated_at', datetime.now(timezone.utc).isoformat()),
+                ('source_dirs', source_dirs),
+                ('shard', name),
+                ('total_files', len(todo)),
+            ]
+            buf = io.BytesIO()
+            spans: List[Tuple[int, int]] = []
+            written: List[Dict[str, Any]] = []  # 实际写出的记录（load 返回 None 的跳过），与 spans 一一对应
+
+            def _full() -> Iterator[Dict[str, Any]]:
+                for r in todo:
+                    rec = load(r) if load is not None else r
+                    if rec is not None:
+                        written.append(r)
+                        yield rec
+
+            write_records(buf, self.fmt, head, _full(), tail, spans=spans)
+            if len(written) == len(todo):
+                break
+            # 头部先于记录写出：有记录被跳过时按实际写出的记录重写，使头部 total_files 与内容一致
+            todo = written
+        data = buf.getvalue()
+        path = self.dir / f"{name}.{self.fmt}"
+        tmp = path.with_name(path.name + '.tmp')
+        with tmp.open('wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+        if self.fmt in INDEXED_FORMATS:
+            write_index(path, [(r['path'], int(r['timestamp'])) for r in written], spans, len(data),
+                        encoding=record_encoding(self.fmt))
+        return len(data), hashlib.sha256(data).hexdigest(), written
+
+    def write(
+        self,
+        records: List[Dict[str, Any]],
+        source_dirs: List[str],
+        compression: Optional[dict] = None,
+        on_shard: Optional[Callable[[str, bool], None]] = None,
+        load: Optional[Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]] = None,
+    ) -> Dict[str, int]:
+        """按时间分片写出 records（已按时间戳升序），仅重写内容变化的分片；返回统计。
+
+        records 可为不含 content 的轻量记录（path、timestamp、正文 sha256、字节数 bytes），
+        此时仅在写出某一分片时经 load(记录) 逐条取回完整记录，内存只随并行写出的分片大小增长；
+        load 返回 None（源文件已不可读）的记录不写出。
+        """
+        self.dir.mkdir(parents=True, exist_ok=True)
+        prev_by_name = {str(s.get('name')): s for s in self._prev_shards()}
+        # 头部（来源目录、压缩配置）变化时全部重写
+        same_header = self.prev.get('source_dirs') == source_dirs and self.prev.get('compression') == compression
+        plan = self._assign(records)
+        shards: List[Dict[str, Any]] = []
+        todo: List[Tuple[int, str, List[Dict[str, Any]]]] = []
+        for name, recs in plan:
+            fp = self._fingerprint(recs)
+            meta = {
+                'name': name,
+                'file': f"{name}.{self.fmt}",
+                'start': int(name[3:]) if name.startswith('ts-') else None,
+                'ts_min': int(recs[0]['timestamp']),
+                'ts_max': int(recs[-1]['timestamp']),
+                'count': len(recs),
+                'content_hash': fp,
+            }
+            old = prev_by_name.get(name)
+            # 上次写出时有记录被跳过（源文件已不可读）的分片不复用
+            if (same_header and old is not None and old.get('content_hash') == fp and not old.get('skipped')
+                    and (self.fmt not in INDEXED_FORMATS or index_path_for(self.dir / meta['file']).exists())):
+                meta['bytes'], meta['sha256'] = old.get('bytes'), old.get('sha256')
+                if 'count' in old:
+                    meta['count'] = old['count']
+                if on_shard:
+                    on_shard(name, False)
+            else:
+                todo.append((len(shards), name, recs))
+            shards.append(meta)
+        if todo:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(todo))) as pool:
+                futs = [(i, name, pool.submit(self._write_shard, name, recs, source_dirs, compression, load)) for i, name, recs in todo]
+                for i, name, fut in futs:
+                    shards[i]['bytes'], shards[i]['sha256'], written = fut.result()
+                    # count 与时间范围按实际写出的记录（load 返回 None 的记录跳过）
+                    meta = shards[i]
+                    skipped = meta['count'] - len(written)
+                    if skipped:
+                        meta['count'], meta['skipped'] = len(written), skipped
+                        if written:
+                            meta['ts_min'], meta['ts_max'] = int(written[0]['timestamp']), int(written[-1]['timestamp'])
+                    if on_shard:
+                        on_shard(name, True)
+        keep = {s['file'] for s in shards}
+        removed = 0
+        for p in self.dir.glob(f"*.{self.fmt}"):
+            if p.name not in keep and p.name != MANIFEST_NAME and not p.name.endswith('.idx.json'):
+                p.unlink()
+                index_path_for(p).unlink(missing_ok=True)
+                removed += 1
+        manifest = {
+            'version': MANIFEST_VERSION,
+            'generated_at': datetime.now(timezone.utc).isoformat(),
+            'source_dirs': source_dirs,
+            'by': self.by,
+            'max_bytes': self.max_bytes if self.by == 'bytes' else None,
+            'format': self.fmt,
+            'total_files': sum(int(s['count']) for s in shards),
+            'compression': compression,
+            'shards': shards,
+        }
+        tmp = self.manifest_path.with_name(self.manifest_path.name + '.tmp')
+        with tmp.open('w', encoding='utf-8', newline='\n') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+            f.write('\n')
+        os.replace(tmp, self.manifest_path)
+        self.prev = manifest
+        return {'shards': len(shards), 'written': len(todo), 'reused': len(shards) - len(todo), 'removed': removed}
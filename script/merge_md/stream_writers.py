@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: GPL-3.0-only
+# Copyright (C) 2025 GaoZheng
+
+"""
+流式写出工具（供 `merge_md_by_timestamp.py` 使用）。
+
+- `write_json_streaming`：逐条写出对象中的一个列表字段，其余字段照常写出；
+  输出与 `json.dump(obj, f, ensure_ascii=False, indent=2)` 逐字节一致，
+  但不需要先在内存中构造包含全部条目的大对象。
+- `write_jsonl`：JSON Lines，首行为头部对象，其后每行一条记录。
+- `write_lines`：等价于 `f.write('\\n'.join(lines))`，逐行写出。
+- `ByteCountingWriter`：以 UTF-8 写入二进制句柄并累计字节位置；配合 `spans` 参数
+  记录每条记录在文件中的 (字节偏移, 字节长度)，供随机读取的旁路索引使用。
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any, BinaryIO, Dict, Iterable, List, Optional, TextIO, Tuple
+
+
+class ByteCountingWriter:
+    """文本写入接口：编码为 UTF-8 写入二进制句柄，`pos` 为已写出的字节数。"""
+
+    def __init__(self, raw: BinaryIO) -> None:
+        self.raw = raw
+        self.pos = 0
+
+    def write(self, s: str) -> int:
+        b = s.encode('utf-8')
+        self.raw.write(b)
+        self.pos += len(b)
+        return len(s)
+
+
+def _dumps_nested(value: Any, level: int) -> str:
+    """按 indent=2 序列化，并将续行缩进到第 `level` 层（与 json.dump 的嵌套缩进一致）。"""
+    s = json.dumps(value, ensure_ascii=False, indent=2)
+    if level and '\n' in s:
+        s = s.replace('\n', '\n' + '  ' * level)
+    return s
+
+
+def write_json_streaming(
+    f: TextIO,
+    head: List[Tuple[str, Any]],
+    list_key: str,
+    items: Iterable[Dict[str, Any]],
+    tail: Optional[List[Tuple[str, Any]]] = None,
+    spans: Optional[List[Tuple[int, int]]] = None,
+) -> int:
+    """写出 `{**head, list_key: [*items], **tail}`；返回写出的条目数。
+
+    spans 若提供（f 须为 ByteCountingWriter），逐条追加该条记录 JSON 文本的 (字节偏移, 字节长度)。
+    """
+    f.write('{')
+    first_key = True
+
+    def _key(k: str) -> None:
+        nonlocal first_key
+        f.write('\n  ' if first_key else ',\n  ')
+        first_key = False
+        f.write(json.dumps(k, ensure_ascii=False))
+        f.write(': ')
+
+    for k, v in head:
+        _key(k)
+        f.write(_dumps_nested(v, 1))
+    _key(list_key)
+    f.write('[')
+    n = 0
+    for item in items:
+        f.write('\n    ' if n == 0 else ',\n    ')
+        if spans is not None:
+            start = f.pos  # type: ignore[attr-defined]
+            f.write(_dumps_nested(item, 2))
+            spans.append((start, f.pos - start))  # type: ignore[attr-defined]
+        else:
+            f.write(_dumps_nested(item, 2))
+        n += 1
+    f.write('\n  ]' if n else ']')
+    for k, v in tail or []:
+        _key(k)
+        f.write(_dumps_nested(v, 1))
+    f.write('\n}')
+    return n
+
+
+def write_jsonl(
+    f: TextIO, header: Dict[str, Any], items: Iterable[Dict[str, Any]], spans: Optional[List[Tuple[int, int]]] = None,
+) -> int:
+    """JSON Lines：首行写头部（含 `"kind": "header"`），其后每行一条记录；返回条目数。
+
+    spans 同 `write_json_streaming`（长度不含行尾换行）。
+    """
+    f.write(json.dumps({'kind': 'header', **header}, ensure_ascii=False, separators=(',', ':')))
+    f.write('\n')
+    n = 0
+    for item in items:
+        if spans is not None:
+            start = f.pos  # type: ignore[attr-defined]
+            f.write(json.dumps(item, ensure_ascii=False, separators=(',', ':')))
+            spans.append((start, f.pos - start))  # type: ignore[attr-defined]
+        else:
+            f.write(json.dumps(item, ensure_ascii=False, separators=(',', ':')))
+        f.write('\n')
+        n += 1
+    return n
+
+
+def write_lines(f: TextIO, lines: Iterable[str]) -> None:
+    """逐行写出，行间以 LF 分隔（末行后不追加换行）。"""
+    first = True
+    for line in lines:
+        if not first:
+            f.write('\n')
+        f.write(line)
+        first = False
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: GPL-3.0-only
+# Copyright (C) 2025 GaoZheng
+
+"""
+内容寻址的摘要缓存（供 `merge_md_by_timestamp.py` 使用）。
+
+- 键：sha256(正文) + 解析后的模型名 + principles + max_chars + blocked_topics 的 sha256；
+  与文件路径、时间戳及在列表中的位置无关，因此插入/重排文档不会导致重复请求。
+- 存储：`out/<script_stem>.summary_cache.json`（UTF-8 + LF），写入采用临时文件 + 原子替换。
+- 淘汰：按最近使用顺序（LRU），超过 `max_entries` 条或 `max_bytes` 字节时淘汰最久未用项；
+  取值 <= 0 表示该维度不限。
+- 落盘：只在有新增/淘汰，或命中使有界缓存的 LRU 顺序与文件中的不同时重写；
+  全部命中且顺序未变（如语料未变时重跑）不写文件。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+CACHE_VERSION = 1
+
+
+def sha256_text(text: str) -> str:
+    return hashlib.sha256((text or '').encode('utf-8')).hexdigest()
+
+
+def make_summary_key(
+    content: str,
+    model_resolved: str,
+    principles: Optional[List[str]],
+    max_chars: int,
+    blocked_topics: Optional[List[str]],
+) -> str:
+    """计算摘要缓存键；任一影响输出的参数变化都会得到不同的键。"""
+    parts = [
+        sha256_text(content),
+        str(model_resolved or ''),
+        list(principles or []),
+        int(max_chars),
+        list(blocked_topics or []),
+    ]
+    return sha256_text(json.dumps(parts, ensure_ascii=False, separators=(',', ':')))
+
+
+def _record_size(rec: Dict[str, Any]) -> int:
+    return len(json.dumps(rec, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+
+class SummaryCache:
+    """持久化 LRU 缓存；线程安全。值为可 JSON 序列化的 dict。"""
+
+    def __init__(self, path: Path, max_entries: int = 0, max_bytes: int = 0) -> None:
+        self.path = path
+        self.max_entries = max(0, int(max_entries or 0))
+        self.max_bytes = max(0, int(max_bytes or 0))
+        self._items: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._touched = False  # 有命中（仅调整了 LRU 顺序）
+        self._saved_order: List[str] = []  # 文件中的键顺序
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            if not self.path.exists():
+                return
+            with self.path.open('r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception:
+            return
+        if not isinstance(data, dict) or data.get('version') != CACHE_VERSION:
+            return
+        items = data.get('items')
+        if not isinstance(items, dict):
+            return
+        # 文件内顺序即 LRU 顺序（最久未用在前）
+        for k, v in items.items():
+            if isinstance(v, dict):
+                self._items[k] = v
+                size = _record_size(v)
+                self._sizes[k] = size
+                self._bytes += size
+        self._saved_order = list(self._items)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            rec = self._items.get(key)
+            if rec is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            self._touched = True
+            return rec
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        rec = dict(value)
+        rec.setdefault('created_at', datetime.now(timezone.utc).isoformat())
+        size = _record_size(rec)
+        with self._lock:
+            if key in self._items:
+                self._bytes -= self._sizes.get(key, 0)
+            self._items[key] = rec
+            self._items.move_to_end(key)
+            self._sizes[key] = size
+            self._bytes += size
+            self._dirty = True
+            self._evict_locked()
+
+    def _evict_locked(self) -> None:
+        while self._items and (
+            (self.max_entries and len(self._items) > self.max_entries)
+            or (self.max_bytes and self._bytes > self.max_bytes)
+        ):
+            k, _ = self._items.popitem(last=False)
+            self._bytes -= self._sizes.pop(k, 0)
+            self.evictions += 1
+
+    def _order_changed_locked(self) -> bool:
+        # 不限容量时从不淘汰，LRU 顺序无需持久化
+        if not self._touched or not (self.max_entries or self.max_bytes):
+            return False
+        return list(self._items) != self._saved_order
+
+    def save(self, force: bool = False) -> None:
+        with self._lock:
+            if not (self._dirty or force or self._order_changed_locked()):
+                self._touched = False
+                return
+            payload = {
+                'version': CACHE_VERSION,
+                'saved_at': datetime.now(timezone.utc).isoformat(),
+                'items': dict(self._items),
+            }
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(self.path.name + '.tmp')
+            with tmp.open('w', encoding='utf-8', newline='\n') as f:
+                json.dump(payload, f, ensure_ascii=False, separators=(',', ':'))
+                f.write('\n')
+            os.replace(tmp, self.path)
+            self._dirty = self._touched = False
+            self._saved_order = list(self._items)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            models: Dict[str, int] = {}
+            excluded = 0
+            for rec in self._items.values():
+                m = str(rec.get('model') or '')
+                models[m] = models.get(m, 0) + 1
+                if rec.get('excluded'):
+                    excluded += 1
+            lookups = self.hits + self.misses
+            return {
+                'path': str(self.path),
+                'entries': len(self._items),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'excluded_entries': excluded,
+                'by_model': models,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits / lookups) if lookups else None,
+                'evictions': self.evictions,
+            }
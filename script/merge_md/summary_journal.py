@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: GPL-3.0-only
+# Copyright (C) 2025 GaoZheng
+
+"""
+逐项摘要的追加式日志（供 `merge_md_by_timestamp.py` 使用）。
+
+- 文件：`out/<script_stem>.journal.jsonl`，UTF-8 + LF；首行为头部
+  （`{"kind": "header", "source_dirs": [...], "compression": {...}}`），其后每行一条逐项记录。
+- 每次提交仅追加一行并 flush + fsync，崩溃后最多丢失正在写的那一行；
+  读取时跳过无法解析的残行。
+- 运行开始时以“已确认的前缀”原子重写日志（临时文件 + 替换），之后只追加；
+  格式化的 `out/<script_stem>.json` 由压缩（compaction）步骤一次性生成。
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, TextIO, Tuple
+
+
+def _dump_line(obj: Dict[str, Any]) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+class SummaryJournal:
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._f: Optional[TextIO] = None
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def read(self) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        """返回 (头部, 记录列表)；文件不存在时返回 (None, [])。"""
+        header: Optional[Dict[str, Any]] = None
+        records: List[Dict[str, Any]] = []
+        if not self.path.exists():
+            return None, records
+        with self.path.open('r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    obj = json.loads(line)
+                except Exception:
+                    continue  # 崩溃时可能残留的半行
+                if not isinstance(obj, dict):
+                    continue
+                if obj.get('kind') == 'header':
+                    header = {k: v for k, v in obj.items() if k != 'kind'}
+                else:
+                    records.append(obj)
+        return header, records
+
+    def reset(self, header: Dict[str, Any], records: Iterable[Dict[str, Any]]) -> None:
+        """以头部 + 给定记录原子重写日志，并保持追加句柄打开。"""
+        self.close()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        with tmp.open('w', encoding='utf-8', newline='\n') as f:
+            f.write(_dump_line({'kind': 'header', **header}))
+            for rec in records:
+                f.write(_dump_line(rec))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self._f = self.path.open('a', encoding='utf-8', newline='\n')
+
+    def append(self, record: Dict[str, Any]) -> None:
+        """追加一条记录并 fsync（每次提交一次）。"""
+        if self._f is None:
+            self._f = self.path.open('a', encoding='utf-8', newline='\n')
+        self._f.write(_dump_line(record))
+        self._f.flush()
+        os.fsync(self._f.fileno())
+
+    def close(self) -> None:
+        if self._f is not None:
+            try:
+                self._f.close()
+            finally:
+                self._f = None
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: GPL-3.0-only
+# Copyright (C) 2025 GaoZheng
+
+"""
+`content_guard.blocked_topics` 的本地预分类（供 `merge_md_by_timestamp.py` 使用）。
+
+- 关键词/同义词以 Aho-Corasick 自动机一次扫描全文匹配（大小写不敏感，取最左最长的不重叠匹配）；
+  每个主题的关键词带权重，主题原词本身权重最高。
+- 每个主题按 (加权命中数, 每千字密度, 标题命中, 不同关键词数) 计算逻辑回归式得分 p∈(0,1)，
+  取最高分主题：p >= exclude_threshold → 直接排除；p <= clear_threshold → 直接放行；
+  其余为“不确定”，交由模型判断。
+- 判定结果按“正文 sha256 + 词表/阈值指纹”缓存（`out/<script_stem>.guard_cache.json`）。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+EXCLUDE = 'exclude'
+CLEAR = 'clear'
+AMBIGUOUS = 'ambiguous'
+
+# 默认同义词表（权重：主题原词 3.0；强相关 2.0~2.5；弱相关 0.5~1.5）；配置中的 synonyms 会合并覆盖
+DEFAULT_SYNONYMS: Dict[str, Dict[str, float]] = {
+    '地缘政治': {
+        '地缘': 2.0, '国际关系': 1.5, '大国博弈': 2.0, '霸权': 1.5, '制裁': 1.5,
+        '外交': 1.0, '战争': 1.0, '国家安全': 1.0, 'geopolitic': 2.0,
+    },
+    '金融市场': {
+        '股市': 2.0, '股票': 2.0, '证券': 1.5, '债券': 1.5, '汇率': 1.5, '期货': 2.0,
+        '资产定价': 2.0, '金融': 1.0, '基金': 1.0, '投资': 0.5, 'financial market': 2.5,
+    },
+    '量化交易': {
+        '量化投资': 3.0, '高频交易': 2.5, '交易策略': 2.0, '交易系统': 2.0, '回测': 2.0,
+        '止损': 1.5, '仓位': 1.5, '阿尔法': 1.0, 'quant': 1.5, 'backtest': 2.0,
+    },
+    '法律工程': {
+        '知识产权': 2.0, '著作权': 2.0, '侵权': 2.0, '诉讼': 2.0, '商业独占': 2.0,
+        '专利': 1.5, '版权': 1.5, '许可证': 1.5, '双轨制': 1.0, '合规': 1.0, '法律': 1.0,
+    },
+}
+
+# 逻辑回归式打分的默认系数：z = bias + log_hits·ln(1+加权命中) + density·min(每千字密度,10)
+#                                  + title·标题命中 + distinct·min(不同关键词数,5)
+DEFAULT_WEIGHTS: Dict[str, float] = {
+    'bias': -4.0, 'log_hits': 1.0, 'density': 0.6, 'title': 2.0, 'distinct': 0.5,
+}
+MAX_COUNT_PER_KEYWORD = 5  # 同一关键词计数上限，避免单词重复刷分
+
+
+class KeywordAutomaton:
+    """Aho-Corasick 多模式匹配；`iter_matches` 产出 (结束位置, 关键词)。"""
+
+    def __init__(self, keywords: List[str]) -> None:
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[str]] = [[]]
+        for kw in keywords:
+            if kw:
+                self._add(kw)
+        self._build()
+
+    def _add(self, kw: str) -> None:
+        node = 0
+        for ch in kw:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        if kw not in self._out[node]:
+            self._out[node].append(kw)
+
+    def _build(self) -> None:
+        q: deque = deque(self._goto[0].values())
+        while q:
+            node = q.popleft()
+            for ch, nxt in self._goto[node].items():
+                q.append(nxt)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                cand = self._goto[f].get(ch, 0)
+                self._fail[nxt] = cand if cand != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, str]]:
+        node = 0
+        goto, fail, out = self._goto, self._fail, self._out
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for kw in out[node]:
+                yield i, kw
+
+
+@dataclass
+class GuardVerdict:
+    verdict: str                 # exclude / clear / ambiguous
+    score: float                 # 最高分主题的得分
+    matched: List[str] = field(default_factory=list)  # 得分达到排除阈值的主题（exclude 时）
+    scores: Dict[str, float] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'verdict': self.verdict, 'score': self.score, 'matched': self.matched, 'scores': self.scores}
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> 'GuardVerdict':
+        return cls(
+            verdict=str(d.get('verdict') or AMBIGUOUS), score=float(d.get('score') or 0.0),
+            matched=list(d.get('matched') or []), scores=dict(d.get('scores') or {}),
+        )
+
+
+class TopicGuard:
+    """按主题词表对正文打分并给出 exclude/clear/ambiguous 判定。"""
+
+    def __init__(
+        self,
+        topics: List[str],
+        synonyms: Optional[Dict[str, Any]] = None,
+        exclude_threshold: float = 0.95,
+        clear_threshold: float = 0.15,
+        weights: Optional[Dict[str, float]] = None,
+    ) -> None:
+        self.topics = list(topics)
+        self.exclude_threshold = float(exclude_threshold)
+        self.clear_threshold = float(clear_threshold)
+        self.weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        # 关键词（小写）→ [(主题, 权重)]
+        self.lexicon: Dict[str, List[Tuple[str, float]]] = {}
+        extra = synonyms or {}
+        for t in self.topics:
+            words: Dict[str, float] = {t: 3.0}
+            words.update(DEFAULT_SYNONYMS.get(t, {}))
+            cfg_words = extra.get(t)
+            if isinstance(cfg_words, dict):
+                words.update({str(k): float(v) for k, v in cfg_words.items()})
+            elif isinstance(cfg_words, list):
+                words.update({str(k): 1.5 for k in cfg_words})
+            for w, wt in words.items():
+                w = w.strip().lower()
+                if w and wt > 0:
+                    self.lexicon.setdefault(w, []).append((t, wt))
+        self._ac = KeywordAutomaton(sorted(self.lexicon))
+
+    def fingerprint(self) -> str:
+        """词表、系数与阈值的指纹；用于缓存键，任一变化即失效。"""
+        payload = [
+            sorted((k, sorted(v)) for k, v in self.lexicon.items()),
+            sorted(self.weights.items()), self.exclude_threshold, self.clear_threshold,
+        ]
+        return hashlib.sha256(json.dumps(payload, ensure_ascii=False).encode('utf-8')).hexdigest()[:16]
+
+    def classify(self, text: str) -> GuardVerdict:
+        low = (text or '').lower()
+        title_end = 0
+        for line in low.splitlines(keepends=True):
+            title_end += len(line)
+            if line.strip():
+                break
+        # 取最左最长且互不重叠的匹配：“地缘政治”命中时不再重复计入其中的“地缘”
+        spans = sorted(((end - len(kw) + 1, -len(kw), kw) for end, kw in self._ac.iter_matches(low)))
+        counts: Dict[str, int] = {}
+        title_hits: Dict[str, bool] = {}
+        covered = 0
+        for start, neg_len, kw in spans:
+            if start < covered:
+                continue
+            covered = start - neg_len
+            counts[kw] = counts.get(kw, 0) + 1
+            if start < title_end:
+                for t, _ in self.lexicon[kw]:
+                    title_hits[t] = True
+        per_topic: Dict[str, Tuple[float, int]] = {}
+        for kw, n in counts.items():
+            n = min(n, MAX_COUNT_PER_KEYWORD)
+            for t, wt in self.lexicon[kw]:
+                s, d = per_topic.get(t, (0.0, 0))
+                per_topic[t] = (s + wt * n, d + 1)
+        kchars = max(1.0, len(low) / 1000.0)
+        w = self.weights
+        scores: Dict[str, float] = {}
+        for t in self.topics:
+            s, d = per_topic.get(t, (0.0, 0))
+            z = (
+                w['bias'] + w['log_hits'] * math.log1p(s) + w['density'] * min(s / kchars, 10.0)
+                + w['title'] * (1.0 if title_hits.get(t) else 0.0) + w['distinct'] * min(d, 5)
+            )
+            scores[t] = round(1.0 / (1.0 + math.exp(-z)), 4)
+        top = max(scores.values()) if scores else 0.0
+        if top >= self.exclude_threshold:
+            matched = [t for t in self.topics if scores[t] >= self.exclude_threshold]
+            return GuardVerdict(EXCLUDE, top, matched, scores)
+        if top <= self.clear_threshold:
+            return GuardVerdict(CLEAR, top, [], scores)
+        return GuardVerdict(AMBIGUOUS, top, [], scores)
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: GPL-3.0-only
+# Copyright (C) 2025 GaoZheng
+
+"""
+按文件名时间戳（`<UNIX秒>_*.md`）选取文档的有序索引（可复用的小模块）。
+
+- 时间戳只取自文件名，建立/查询索引不打开、不解码任何文件。
+- 索引文件（JSON）记录各目录的 mtime_ns 与直接子项，以及按 (ts, path) 升序排列的条目；
+  `refresh` 时目录 mtime 未变则复用上次的子项列表，不再枚举。
+- `select(since, until)` 以 bisect 在有序时间戳上二分定位闭区间 [since, until]。
+- `parse_time_bound` 接受 UNIX 秒或 ISO 日期/时间（无时区按 UTC）；仅日期作为上界时取当天 23:59:59。
+
+使用方：
+- `script/merge_md/merge_md_by_timestamp.py --since/--until`
+- `script/md_to_pdf/batch_convert*.py --since/--until`
+- 命令行：`python3 script/ts_index.py src/kernel_reference --since 2025-01-01 --until 2025-01-31`
+  逐行输出相对仓库根的路径（供 `build_index_*.ps1` 等脚本按日期范围选取文档）。
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+from bisect import bisect_left, bisect_right
+from datetime import datetime, time as dtime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Pattern, Tuple
+
+
+INDEX_VERSION = 1
+TIMESTAMP_BASENAME_RE = re.compile(r"^(?P<ts>\d{10})_.+\.md$")
+_DATE_ONLY_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+def parse_time_bound(value: str, upper: bool = False) -> int:
+    """解析 UNIX 秒或 ISO 日期/时间为 UNIX 秒；无法解析时抛出 ValueError。"""
+    s = str(value).strip()
+    if re.fullmatch(r"\d+", s):
+        return int(s)
+    if _DATE_ONLY_RE.match(s):
+        d = datetime.strptime(s, '%Y-%m-%d').date()
+        t = dtime(23, 59, 59) if upper else dtime(0, 0, 0)
+        return int(datetime.combine(d, t, tzinfo=timezone.utc).timestamp())
+    try:
+        dt = datetime.fromisoformat(s.replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f"无法解析的时间：{value!r}（应为 UNIX 秒或 ISO 日期/时间）") from None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
+class TimestampIndex:
+    """`refresh(dirs)` 更新索引，`select(since, until)` 返回区间内的相对路径（按时间戳升序）。"""
+
+    def __init__(self, path: Optional[Path], root: Path, pattern: Pattern[str] = TIMESTAMP_BASENAME_RE) -> None:
+        self.path = path
+        self.root = root.resolve()
+        self.pattern = pattern
+        self.dirs: Dict[str, Dict] = {}
+        self.entries: List[Tuple[int, str]] = []
+        self._ts: List[int] = []
+        self.dirs_reused = 0
+        self.dirs_listed = 0
+        self._load()
+
+    def _key(self, p: Path) -> str:
+        try:
+            return p.relative_to(self.root).as_posix()
+        except ValueError:
+            return p.as_posix()
+
+    def _load(self) -> None:
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            with self.path.open('r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception:
+            return
+        if not isinstance(data, dict) or data.get('version') != INDEX_VERSION:
+            return
+        dirs = data.get('dirs')
+        if isinstance(dirs, dict):
+            self.dirs = {k: v for k, v in dirs.items() if isinstance(v, dict)}
+        try:
+            self.entries = [(int(ts), str(p)) for ts, p in data.get('entries') or []]
+        except Exception:
+            self.entries = []
+        self.entries.sort()
+        self._ts = [ts for ts, _ in self.entries]
+
+    def _walk(self, d: Path, old: Dict[str, Dict], out: List[Tuple[int, str]]) -> None:
+        try:
+            st = d.stat()
+        except OSError:
+            return
+        key = self._key(d)
+        cached = old.get(key)
+        if cached and cached.get('mtime_ns') == st.st_mtime_ns:
+            names = list(cached.get('files') or [])
+            subdirs = list(cached.get('subdirs') or [])
+            self.dirs_reused += 1
+        else:
+            names, subdirs = [], []
+            with os.scandir(d) as it:
+                for de in it:
+                    try:
+                        if de.is_dir(follow_symlinks=False):
+                            subdirs.append(de.name)
+                        elif self.pattern.match(de.name) and de.is_file():
+                            names.append(de.name)
+                    except OSError:
+                        continue
+            names.sort()
+            subdirs.sort()
+            self.dirs_listed += 1
+        self.dirs[key] = {'mtime_ns': st.st_mtime_ns, 'files': names, 'subdirs': subdirs}
+        for name in names:
+            m = self.pattern.match(name)
+            if m:
+                out.append((int(m.group('ts')), self._key(d / name)))
+        for name in subdirs:
+            self._walk(d / name, old, out)
+
+    def refresh(self, dirs: Iterable[Path]) -> 'TimestampIndex':
+        old, self.dirs = self.dirs, {}
+        out: List[Tuple[int, str]] = []
+        for d in dirs:
+            if d.exists():
+                self._walk(d.resolve(), old, out)
+        self.entries = sorted(set(out))
+        self._ts = [ts for ts, _ in self.entries]
+        return self
+
+    def select(self, since: Optional[int] = None, until: Optional[int] = None) -> List[str]:
+        lo = bisect_left(self._ts, since) if since is not None else 0
+        hi = bisect_right(self._ts, until) if until is not None else len(self._ts)
+        return [p for _, p in self.entries[lo:hi]]
+
+    def select_paths(self, since: Optional[int] = None, until: Optional[int] = None) -> List[Path]:
+        return [self.root / p for p in self.select(since, until)]
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        payload = {
+            'version': INDEX_VERSION,
+            'generated_at': datetime.now(timezone.utc).isoformat(),
+            'dirs': self.dirs,
+            'entries': [[ts, p] for ts, p in self.entries],
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        with tmp.open('w', encoding='utf-8', newline='\n') as f:
+            json.dump(payload, f, ensure_ascii=False, separators=(',', ':'))
+            f.write('\n')
+        os.replace(tmp, self.path)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    root = Path(__file__).resolve().parents[1]
+    parser = argparse.ArgumentParser(description='按文件名时间戳选取 <UNIX秒>_*.md，逐行输出相对仓库根的路径。')
+    parser.add_argument('dirs', nargs='+', help='扫描目录（相对仓库根或绝对路径）')
+    parser.add_argument('--since', default=None, help='起始时间（含）：UNIX 秒或 ISO 日期/时间')
+    parser.add_argument('--until', default=None, help='结束时间（含）：UNIX 秒或 ISO 日期/时间')
+    parser.add_argument('--index', type=Path, default=root / 'out' / 'ts_index.json', help='索引文件（默认：out/ts_index.json）')
+    args = parser.parse_args(argv)
+    try:
+        since = parse_time_bound(args.since) if args.since else None
+        until = parse_time_bound(args.until, upper=True) if args.until else None
+    except ValueError as e:
+        parser.error(str(e))
+    dirs = [(root / d) if not Path(d).is_absolute() else Path(d) for d in args.dirs]
+    idx = TimestampIndex(args.index, root).refresh(dirs)
+    idx.save()
+    for p in idx.select(since, until):
+        print(p)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())